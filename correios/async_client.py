@@ -0,0 +1,687 @@
+# Copyright 2016 Osvaldo Santana Neto
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import asyncio
+import logging
+import threading
+import time
+from decimal import Decimal
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union  # noqa: F401
+
+import httpcore
+import httpx
+from requests.exceptions import Timeout
+from zeep import AsyncClient, Settings
+from zeep.exceptions import Fault
+from zeep.transports import AsyncTransport
+
+from .cache import BaseCache, FreightQuoteNormalizer
+from .client import TRACKING_EVENTS_HEADERS, Correios
+from .delivery_time import DeliveryTimeMatrix
+from .exceptions import ClientError, ConnectTimeoutError, ZipCodeNotFoundError
+from .instrumentation import Instrument, current_metrics, instrumented, measure, record_request
+from .models.address import ZipAddress, ZipCode
+from .models.posting import (
+    FreightRequest,
+    FreightResponse,
+    Package,
+    PostInfo,
+    PostingList,
+    TrackingCode,
+    TrackingCodeRange,
+)
+from .models.user import ExtraService, PostingCard, Service, User
+from .retry import DEFAULT_CIRCUIT_BREAKER_TIMEOUT, RetryPolicy
+from .soap import WSDLCache
+from .throttle import UNLIMITED, Throttle
+from .utils import AsyncSingleFlight
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_CONNECTIONS = 100
+DEFAULT_MAX_KEEPALIVE_CONNECTIONS = 20
+
+
+class AsyncPoolMetrics:
+    """
+    Counts the requests sent through an httpx.AsyncClient by host, like
+    correios.soap.PoolMetricsAdapter.
+
+    httpx limits the connections of a client to max_connections for all
+    hosts, so a request is saturated when max_connections requests are
+    already in flight and it has to wait for a free connection. Saturation
+    is not counted for clients with unknown limits (max_connections=None).
+    connections is the number of connections currently open.
+    """
+
+    def __init__(self, http_client: httpx.AsyncClient, max_connections: Optional[int] = None) -> None:
+        self.http_client = http_client
+        self.max_connections = max_connections
+        self._in_flight = 0
+        self._stats = {}  # type: Dict[str, Dict[str, int]]
+        self._origins = {}  # type: Dict[str, httpcore.Origin]
+        self._lock = threading.Lock()
+
+    def start(self, address: str) -> Dict[str, int]:
+        url = httpx.URL(address)
+        host = url.host
+        with self._lock:
+            if host not in self._origins:
+                port = url.port or (443 if url.scheme == "https" else 80)
+                self._origins[host] = httpcore.Origin(url.raw_scheme, url.raw_host, port)
+
+            stats = self._stats.setdefault(host, {"requests": 0, "in_flight": 0, "max_in_flight": 0, "saturated": 0})
+            stats["requests"] += 1
+            stats["in_flight"] += 1
+            stats["max_in_flight"] = max(stats["max_in_flight"], stats["in_flight"])
+            if self.max_connections is not None and self._in_flight >= self.max_connections:
+                stats["saturated"] += 1
+            self._in_flight += 1
+        return stats
+
+    def finish(self, stats: Dict[str, int]) -> None:
+        with self._lock:
+            stats["in_flight"] -= 1
+            self._in_flight -= 1
+
+    def get_stats(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            stats = {host: dict(host_stats, connections=0) for host, host_stats in self._stats.items()}
+            origins = dict(self._origins)
+
+        # httpx does not expose its connection pool, so clients with other transports report no connections
+        pool = getattr(getattr(self.http_client, "_transport", None), "_pool", None)
+        for connection in getattr(pool, "connections", ()):
+            for host, origin in origins.items():
+                if not connection.is_closed() and connection.can_handle_request(origin):
+                    stats[host]["connections"] += 1
+        return stats
+
+
+class InstrumentedAsyncTransport(AsyncTransport):
+    def __init__(self, *args, pool_metrics: Optional[AsyncPoolMetrics] = None, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.pool_metrics = pool_metrics
+
+    async def post(self, address, message, headers):
+        stats = None if self.pool_metrics is None else self.pool_metrics.start(address)
+        started_at = time.perf_counter()
+        try:
+            response = await super().post(address, message, headers)
+        finally:
+            if stats is not None:
+                self.pool_metrics.finish(stats)
+        record_request(address, started_at, message, response.content)
+        return response
+
+
+class AsyncSoapClient(AsyncClient):
+    """
+    SOAP client for asyncio code.
+
+    Operations are sent through http_client, an httpx.AsyncClient that can be
+    shared by several clients to reuse its connection pool. WSDL documents are
+    still loaded synchronously.
+    """
+
+    def __init__(
+        self,
+        wsdl,
+        http_client=None,
+        verify=True,
+        timeout=8,
+        wsdl_cache: Optional[WSDLCache] = None,
+        pool_metrics: Optional[AsyncPoolMetrics] = None,
+        **kwargs,
+    ):
+        transport = InstrumentedAsyncTransport(
+            client=http_client,
+            verify_ssl=verify,
+            timeout=timeout,
+            operation_timeout=timeout,
+            pool_metrics=pool_metrics,
+        )
+
+        if wsdl_cache is not None:
+            settings = kwargs.setdefault("settings", Settings())
+            wsdl = wsdl_cache.load(wsdl, transport, settings)
+
+        super().__init__(wsdl=wsdl, transport=transport, **kwargs)
+
+
+async def _map_unordered(function: Callable, iterable: Iterable, max_concurrency: int) -> AsyncIterator[tuple]:
+    # asyncio version of correios.utils.imap_unordered
+    pending = {}  # type: Dict[asyncio.Future, Any]
+    try:
+        for item in iterable:
+            pending[asyncio.ensure_future(function(item))] = item
+            if len(pending) < max_concurrency:
+                continue
+
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield pending.pop(task), task
+
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield pending.pop(task), task
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+class AsyncCorreios(Correios):
+    """
+    asyncio version of the Correios client.
+
+    Every public method of Correios that calls a web service is a coroutine
+    here. The SIGEP, SRO and freight clients send their requests through
+    pooled httpx.AsyncClient instances, so one process can keep many calls in
+    flight. An existing httpx.AsyncClient can be passed to share its pool
+    across AsyncCorreios instances; it is not closed by aclose().
+    """
+
+    def __init__(
+        self,
+        username: str,
+        password: str,
+        timeout: int = 8,
+        environment: str = "production",
+        local_wsdl_path: Optional[Path] = None,
+        wsdl_cache_path: Optional[Path] = None,
+        local_verification_digit: bool = False,
+        freight_cache: Optional[BaseCache] = None,
+        freight_quote_normalizer: Optional[FreightQuoteNormalizer] = None,
+        delivery_time_matrix: Optional[DeliveryTimeMatrix] = None,
+        zip_code_cache: Optional[BaseCache] = None,
+        zip_code_negative_ttl: Optional[float] = Correios.DEFAULT_ZIP_CODE_NEGATIVE_TTL,
+        user_cache: Optional[BaseCache] = None,
+        fast_tracking: bool = False,
+        retry_policy: Optional[RetryPolicy] = None,
+        circuit_breaker_threshold: Optional[int] = None,
+        circuit_breaker_timeout: float = DEFAULT_CIRCUIT_BREAKER_TIMEOUT,
+        throttles: Optional[Dict[str, Throttle]] = None,
+        coalesce_requests: bool = False,
+        instrument: Optional[Instrument] = None,
+        http_client: Optional[httpx.AsyncClient] = None,
+        max_connections: int = DEFAULT_MAX_CONNECTIONS,
+        max_keepalive_connections: int = DEFAULT_MAX_KEEPALIVE_CONNECTIONS,
+    ) -> None:
+        super().__init__(
+            username=username,
+            password=password,
+            timeout=timeout,
+            environment=environment,
+            local_wsdl_path=local_wsdl_path,
+            wsdl_cache_path=wsdl_cache_path,
+            local_verification_digit=local_verification_digit,
+            freight_cache=freight_cache,
+            freight_quote_normalizer=freight_quote_normalizer,
+            delivery_time_matrix=delivery_time_matrix,
+            zip_code_cache=zip_code_cache,
+            zip_code_negative_ttl=zip_code_negative_ttl,
+            user_cache=user_cache,
+            fast_tracking=fast_tracking,
+            retry_policy=retry_policy,
+            circuit_breaker_threshold=circuit_breaker_threshold,
+            circuit_breaker_timeout=circuit_breaker_timeout,
+            throttles=throttles,
+            coalesce_requests=coalesce_requests,
+            instrument=instrument,
+        )
+        self.http_client = http_client
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive_connections)
+        self._http_clients = {}  # type: Dict[bool, httpx.AsyncClient]
+        self._pool_metrics = {}  # type: Dict[int, AsyncPoolMetrics]
+
+    def _get_http_client(self, verify: bool) -> httpx.AsyncClient:
+        if self.http_client is not None:
+            return self.http_client
+
+        # connection pools are shared by all services with the same SSL verification setting
+        http_client = self._http_clients.get(verify)
+        if http_client is None:
+            http_client = httpx.AsyncClient(verify=verify, timeout=self.timeout, limits=self.limits)
+            self._http_clients[verify] = http_client
+        return http_client
+
+    def _get_pool_metrics(self, http_client: httpx.AsyncClient) -> AsyncPoolMetrics:
+        # the limits of given clients are unknown
+        pool_metrics = self._pool_metrics.get(id(http_client))
+        if pool_metrics is None:
+            max_connections = None if http_client is self.http_client else self.limits.max_connections
+            pool_metrics = AsyncPoolMetrics(http_client, max_connections=max_connections)
+            self._pool_metrics[id(http_client)] = pool_metrics
+        return pool_metrics
+
+    def _create_soap_client(self, url: str, verify: bool):
+        http_client = self._get_http_client(verify)
+        return AsyncSoapClient(
+            url,
+            http_client=http_client,
+            verify=verify,
+            timeout=self.timeout,
+            wsdl_cache=self.wsdl_cache,
+            pool_metrics=self._get_pool_metrics(http_client),
+        )
+
+    def get_pool_stats(self) -> Dict[str, Dict[str, int]]:
+        """
+        Connection pool statistics by host of the requests sent by this
+        client: requests, in_flight, max_in_flight, saturated (requests that
+        waited for one of max_connections connections) and connections
+        currently open.
+        """
+        stats = {}  # type: Dict[str, Dict[str, int]]
+        for pool_metrics in list(self._pool_metrics.values()):
+            for host, host_stats in pool_metrics.get_stats().items():
+                totals = stats.setdefault(host, dict.fromkeys(host_stats, 0))
+                for name, value in host_stats.items():
+                    totals[name] = max(totals[name], value) if name == "max_in_flight" else totals[name] + value
+        return stats
+
+    async def aclose(self) -> None:
+        """
+        Close the HTTP clients used to load WSDL documents and the
+        connection pools created by this client. SOAP clients are built
+        again if the client is used afterwards.
+        """
+        with self._soap_clients_lock:
+            soap_clients = list(self._soap_clients.values())
+            self._soap_clients.clear()
+
+        for soap_client in soap_clients:
+            soap_client.transport.wsdl_client.close()
+
+        http_clients = list(self._http_clients.values())
+        self._http_clients.clear()
+        for http_client in http_clients:
+            self._pool_metrics.pop(id(http_client), None)
+            await http_client.aclose()
+
+    def close(self) -> None:
+        raise TypeError("AsyncCorreios must be closed with 'await client.aclose()'")
+
+    def __enter__(self) -> "Correios":
+        raise TypeError("Use 'async with' with AsyncCorreios")
+
+    async def __aenter__(self) -> "AsyncCorreios":
+        return self
+
+    async def __aexit__(self, exc_type=None, exc_value=None, traceback=None) -> None:
+        await self.aclose()
+
+    async def _send(self, service: str, operation: str, function: Callable, *args, **kwargs) -> Any:  # type: ignore
+        metrics = current_metrics.get()
+        if self.instrument is not None and (metrics is None or metrics.operation != operation):
+            with self._instrument(service, operation):
+                return await self._send(service, operation, function, *args, **kwargs)
+
+        circuit_breaker = self.circuit_breakers.get(service)
+        throttle = self.throttles.get(service, UNLIMITED)
+        attempt = 0
+        while True:
+            attempt += 1
+            if metrics is not None:
+                metrics.started = True
+            if circuit_breaker is not None:
+                circuit_breaker.before_call()
+
+            try:
+                async with throttle:
+                    with measure(metrics, "call_time"):
+                        if metrics is not None:
+                            metrics.attempts += 1
+                        result = await function(*args, **kwargs)
+            except Exception as exc:
+                if circuit_breaker is not None:
+                    circuit_breaker.record(exc)
+                if self.retry_policy is None or not self.retry_policy.should_retry(operation, exc, attempt):
+                    raise
+
+                delay = self.retry_policy.get_delay(attempt)
+                logger.debug("Retrying {} in {:.2f} seconds after {!r}".format(operation, delay, exc))
+                self.retry_policy.record_retry()
+                if metrics is not None:
+                    metrics.retries += 1
+                await asyncio.sleep(delay)
+            except BaseException:
+                if circuit_breaker is not None:
+                    circuit_breaker.record_interrupted()
+                raise
+            else:
+                if circuit_breaker is not None:
+                    circuit_breaker.record(None)
+                return result
+
+    def _create_single_flight(self) -> AsyncSingleFlight:  # type: ignore
+        return AsyncSingleFlight()
+
+    async def _coalesce(self, key: tuple, function: Callable, *args) -> Any:  # type: ignore
+        if self.single_flight is None:
+            return await function(*args)
+
+        metrics = current_metrics.get()
+        if metrics is not None:
+            metrics.started = True
+        return await self.single_flight.do(key, function, *args)
+
+    async def _auth_call(self, method_name, *args, **kwargs):
+        kwargs.update({"usuario": self.username, "senha": self.password})
+        return await self._call(method_name, *args, **kwargs)
+
+    async def _call(self, method_name, *args, **kwargs):
+        method = getattr(self.sigep, method_name)
+        try:
+            return await self._send("sigep", method_name, method, *args, **kwargs)
+
+        except (Timeout, httpx.TimeoutException):
+            raise ConnectTimeoutError("Timeout connection error ({} seconds)".format(self.timeout))
+
+        except Fault as exc:
+            self._handle_exception(exc)
+
+    @instrumented("sigep", "buscaCliente")
+    async def get_user(  # type: ignore
+        self, contract_number: Union[int, str], posting_card_number: Union[int, str]
+    ) -> User:
+        contract_number = str(contract_number)
+        posting_card_number = str(posting_card_number)
+        user = self._get_cached_user(contract_number, posting_card_number)
+        if user is not None:
+            return user
+
+        user_data = await self._auth_call("buscaCliente", contract_number, posting_card_number)
+        user = self._build(self.model_builder.build_user, user_data)
+        self._cache_user(contract_number, posting_card_number, user)
+        return user
+
+    @instrumented("sigep", "consultaCEP")
+    async def find_zipcode(self, zip_code: Union[ZipCode, str]) -> ZipAddress:  # type: ignore
+        zip_code = ZipCode.create(zip_code)
+        zip_address = self._get_cached_zip_address(zip_code)
+        if zip_address is not None:
+            return zip_address
+
+        try:
+            zip_address_data = await self._coalesce(
+                ("consultaCEP", zip_code.code), self._call, "consultaCEP", str(zip_code)
+            )
+        except ZipCodeNotFoundError as exc:
+            self._cache_zip_address(zip_code, exc)
+            raise
+
+        zip_address = self._build(self.model_builder.build_zip_address, zip_address_data)
+        self._cache_zip_address(zip_code, zip_address)
+        return zip_address
+
+    @instrumented("sigep", "verificaDisponibilidadeServico")
+    async def verify_service_availability(  # type: ignore
+        self,
+        posting_card: PostingCard,
+        service: Service,
+        from_zip_code: Union[ZipCode, str],
+        to_zip_code: Union[ZipCode, str],
+    ) -> bool:
+        result = await self._auth_call(
+            "verificaDisponibilidadeServico",
+            posting_card.administrative_code,
+            str(service),
+            str(ZipCode.create(from_zip_code)),
+            str(ZipCode.create(to_zip_code)),
+        )
+        return result == "0#"
+
+    @instrumented("sigep", "getStatusCartaoPostagem")
+    async def get_posting_card_status(self, posting_card: PostingCard) -> bool:  # type: ignore
+        result = await self._auth_call("getStatusCartaoPostagem", posting_card.number)
+        return self._build(self.model_builder.build_posting_card_status, result)
+
+    @instrumented("sigep", "solicitaEtiquetas")
+    async def request_tracking_codes(  # type: ignore
+        self, user: User, service: Service, quantity=1, receiver_type="C"
+    ) -> List[TrackingCode]:
+        result = await self._auth_call(
+            "solicitaEtiquetas", receiver_type, str(user.federal_tax_number), service.id, quantity
+        )
+        return self._build(self.model_builder.build_tracking_codes_list, result)
+
+    @instrumented("sigep", "solicitaEtiquetas")
+    async def request_tracking_code_range(  # type: ignore
+        self, user: User, service: Service, quantity=1, receiver_type="C"
+    ) -> TrackingCodeRange:
+        result = await self._auth_call(
+            "solicitaEtiquetas", receiver_type, str(user.federal_tax_number), service.id, quantity
+        )
+        return self._build(self.model_builder.build_tracking_code_range, result)
+
+    @instrumented("sigep", "geraDigitoVerificadorEtiquetas")
+    async def generate_verification_digit(  # type: ignore
+        self, tracking_codes: Sequence[str], local: Optional[bool] = None, cross_check: int = 0
+    ) -> List[int]:
+        if local is None:
+            local = self.local_verification_digit
+
+        if not local:
+            tracking_codes = [TrackingCode(tc).nodigit for tc in tracking_codes]
+            return await self._auth_call("geraDigitoVerificadorEtiquetas", tracking_codes)
+
+        digits = self._calculate_verification_digits(tracking_codes)
+        if cross_check:
+            sample, sample_digits = self._get_verification_digit_sample(tracking_codes, digits, cross_check)
+            remote_digits = await self._auth_call("geraDigitoVerificadorEtiquetas", sample)
+            self._check_verification_digits(sample, sample_digits, remote_digits)
+
+        return digits
+
+    @instrumented("sigep", "solicitaXmlPlp")
+    async def get_post_info(self, number: int) -> PostInfo:  # type: ignore
+        result = await self._auth_call("solicitaXmlPlp", number)
+        data, contract_number, posting_card_number = self._parse_post_info(result)
+
+        user = await self.get_user(contract_number=contract_number, posting_card_number=posting_card_number)
+
+        return self._build(self.model_builder.build_post_info, data=data, user=user)
+
+    async def get_post_infos(  # type: ignore
+        self, numbers: Iterable[int], max_workers: int = Correios.DEFAULT_POST_INFO_WORKERS
+    ) -> AsyncIterator[Tuple[int, Union[PostInfo, Exception]]]:
+        """
+        Asynchronous version of Correios.get_post_infos where max_workers
+        limits the number of requests in flight.
+        """
+        users = {}  # type: Dict[Tuple[str, str], asyncio.Future]
+
+        async def get_user(contract_number, posting_card_number):
+            key = (str(contract_number), str(posting_card_number))
+            task = users.get(key)
+            if task is None:
+                task = users[key] = asyncio.ensure_future(self.get_user(*key))
+            # a cancelled waiter must not cancel the lookup shared with the other ones
+            return await asyncio.shield(task)
+
+        async def get_post_info(number):
+            result = await self._auth_call("solicitaXmlPlp", number)
+            data, contract_number, posting_card_number = self._parse_post_info(result)
+            user = await get_user(contract_number, posting_card_number)
+            return self._build(self.model_builder.build_post_info, data=data, user=user)
+
+        numbers = self._iter_unique_post_info_numbers(numbers)
+        try:
+            async for number, task in _map_unordered(get_post_info, numbers, max_workers):
+                try:
+                    post_info = task.result()
+                except Exception as exc:
+                    yield number, exc
+                else:
+                    yield number, post_info
+        finally:
+            for task in users.values():
+                task.cancel()
+
+    @instrumented("sigep", "fechaPlpVariosServicos")
+    async def close_posting_list(  # type: ignore
+        self, posting_list: PostingList, posting_card: PostingCard
+    ) -> PostingList:
+        xml = self._generate_xml_string(posting_list)
+        tracking_codes = posting_list.get_tracking_codes()
+
+        try:
+            id_ = await self._auth_call(
+                "fechaPlpVariosServicos", xml, posting_list.custom_id, posting_card.number, tracking_codes
+            )
+        except ClientError as exc:
+            self._handle_close_posting_list_error(exc, tracking_codes)
+
+        posting_list.close_with_id(id_)
+        return posting_list
+
+    @instrumented("websro", "buscaEventosLista")
+    async def get_tracking_code_events(self, tracking_list):
+        tracking_codes = self._get_tracking_codes(tracking_list)
+        if self.fast_tracking:
+            return await self._get_tracking_code_events_xml(tracking_codes)
+
+        try:
+            response = await self._coalesce(
+                self._get_tracking_events_key(tracking_codes),
+                self._send,
+                "websro",
+                "buscaEventosLista",
+                self.websro.buscaEventosLista,
+                self.username,
+                self.password,
+                "L",
+                "T",
+                "101",
+                list(tracking_codes.keys()),
+            )
+        except (Timeout, httpx.TimeoutException):
+            raise ConnectTimeoutError("Timeout connection error ({} seconds)".format(self.timeout))
+
+        return self._build(self.model_builder.load_tracking_events, tracking_codes, response)
+
+    async def _post_tracking_events_envelope(self, envelope: bytes):  # type: ignore
+        http_client = self._get_http_client(verify=True)
+        started_at = time.perf_counter()
+        response = await http_client.post(self.websro_address, content=envelope, headers=TRACKING_EVENTS_HEADERS)
+        record_request(self.websro_address, started_at, envelope, response.content)
+        return self._get_soap_body(response)
+
+    async def _get_tracking_code_events_xml(  # type: ignore
+        self, tracking_codes: Dict[str, TrackingCode]
+    ) -> List[TrackingCode]:
+        envelope = self._get_tracking_events_envelope(tracking_codes)
+        try:
+            body = await self._coalesce(
+                self._get_tracking_events_key(tracking_codes),
+                self._send,
+                "websro",
+                "buscaEventosLista",
+                self._post_tracking_events_envelope,
+                envelope,
+            )
+        except httpx.TimeoutException:
+            raise ConnectTimeoutError("Timeout connection error ({} seconds)".format(self.timeout))
+
+        return self._build(self.model_builder.load_tracking_events_xml, tracking_codes, body)
+
+    async def iter_tracking_code_events(  # type: ignore
+        self, tracking_list: Iterable[Union[str, TrackingCode]], max_workers: int = Correios.DEFAULT_TRACKING_WORKERS
+    ) -> AsyncIterator[TrackingCode]:
+        """
+        Asynchronous version of Correios.iter_tracking_code_events where
+        max_workers limits the number of requests in flight.
+        """
+        chunks = self._iter_tracking_code_chunks(tracking_list)
+        async for _, task in _map_unordered(self.get_tracking_code_events, chunks, max_workers):
+            for tracking_code in task.result():
+                yield tracking_code
+
+    @instrumented("freight", "CalcPrecoPrazo")
+    async def calculate_freights(  # type: ignore
+        self,
+        posting_card: PostingCard,
+        services: Sequence[Union[Service, int]],
+        from_zip: Union[ZipCode, int, str],
+        to_zip: Union[ZipCode, int, str],
+        package: Package,
+        value: Union[Decimal, float] = 0.00,
+        extra_services: Optional[Sequence[Union[ExtraService, int]]] = None,
+    ) -> List[FreightResponse]:
+        arguments = self._get_freight_arguments(
+            posting_card, services, from_zip, to_zip, package, value, extra_services
+        )
+        freights = self._get_cached_freights(arguments, package)
+        if freights is None:
+            response = await self._coalesce(
+                ("CalcPrecoPrazo",) + arguments,
+                self._send,
+                "freight",
+                "CalcPrecoPrazo",
+                self.freight.CalcPrecoPrazo,
+                *arguments,
+            )
+            freights = self._build(self.model_builder.build_freights_list, response)
+            self._cache_freights(arguments, package, freights)
+        return freights
+
+    @instrumented("freight", "CalcPrazo")
+    async def calculate_delivery_time(  # type: ignore
+        self, service: Union[Service, int], from_zip: Union[ZipCode, int, str], to_zip: Union[ZipCode, int, str]
+    ) -> Optional[str]:
+        delivery_time = self._get_local_delivery_time(service, from_zip, to_zip)
+        if delivery_time is not None:
+            return str(delivery_time)
+
+        result = await self.request_delivery_time(service, from_zip, to_zip)
+        return result.PrazoEntrega
+
+    @instrumented("freight", "CalcPrazo")
+    async def request_delivery_time(  # type: ignore
+        self, service: Union[Service, int], from_zip: Union[ZipCode, int, str], to_zip: Union[ZipCode, int, str]
+    ):
+        arguments = self._get_delivery_time_arguments(service, from_zip, to_zip)
+        response = await self._send("freight", "CalcPrazo", self.freight.CalcPrazo, *arguments)
+        return response.cServico[0]
+
+    async def _calculate_grouped_freights(  # type: ignore
+        self, group: Tuple[List[Service], List[FreightRequest]]
+    ) -> List[FreightResponse]:
+        services, requests = group
+        request = requests[0]
+        return await self.calculate_freights(
+            request.posting_card,
+            services,
+            request.from_zip,
+            request.to_zip,
+            request.package,
+            request.value,
+            request.extra_services,
+        )
+
+    async def calculate_freights_bulk(  # type: ignore
+        self, requests: Iterable[FreightRequest], max_workers: int = Correios.DEFAULT_FREIGHT_WORKERS
+    ) -> AsyncIterator[Tuple[FreightRequest, List[FreightResponse]]]:
+        """
+        Asynchronous version of Correios.calculate_freights_bulk where
+        max_workers limits the number of requests in flight.
+        """
+        groups = self._group_freight_requests(requests)
+        async for (_, grouped_requests), task in _map_unordered(self._calculate_grouped_freights, groups, max_workers):
+            for result in self._split_grouped_freights(grouped_requests, task.result()):
+                yield result
@@ -0,0 +1,291 @@
+# Copyright 2016 Osvaldo Santana Neto
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import pickle
+import sqlite3
+import threading
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Hashable, Iterable, Optional, Tuple, Union  # noqa: F401
+
+from .models.address import ZipCode
+from .models.posting import Package
+
+DEFAULT_CACHE_SIZE = 1024
+
+# upper bounds of the weight ranges of Correios price tables
+DEFAULT_FREIGHT_WEIGHT_BRACKETS = (300,) + tuple(range(1000, 30001, 1000))  # g
+DEFAULT_FREIGHT_ZIP_CODE_DIGITS = 5
+
+MISSING = object()
+
+
+class BaseCache:
+    """
+    Interface of the caches used by the client.
+
+    Subclasses implement _get(), set(), delete() and clear(). _get() must
+    return MISSING for absent or expired keys. Entries expire after ttl
+    seconds (never, when ttl is None) unless set() is given another ttl.
+    Subclasses that know when their entries expire also implement
+    _get_entry(), so that TieredCache keeps their remaining TTL.
+    """
+
+    def __init__(self, ttl: Optional[float] = None) -> None:
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.RLock()
+
+    def _get(self, key: Hashable) -> Any:
+        raise NotImplementedError()
+
+    def _get_entry(self, key: Hashable) -> Tuple[Optional[float], Any]:
+        # (expires_at by _now(), value); expires_at is None when unknown or never
+        return None, self._get(key)
+
+    def _now(self) -> float:
+        return time.time()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        value = self._get(key)
+        with self._lock:
+            if value is MISSING:
+                self.misses += 1
+                return default
+            self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        raise NotImplementedError()
+
+    def set_many(self, items: Iterable[Tuple[Hashable, Any]], ttl: Optional[float] = None) -> None:
+        for key, value in items:
+            self.set(key, value, ttl=ttl)
+
+    def delete(self, key: Hashable) -> None:
+        raise NotImplementedError()
+
+    def clear(self) -> None:
+        raise NotImplementedError()
+
+    def _get_ttl(self, ttl: Optional[float]) -> Optional[float]:
+        return self.ttl if ttl is None else ttl
+
+
+class MemoryCache(BaseCache):
+    """
+    In-memory cache that evicts the least recently used entries when it
+    holds more than maxsize entries.
+    """
+
+    def __init__(self, maxsize: int = DEFAULT_CACHE_SIZE, ttl: Optional[float] = None) -> None:
+        super().__init__(ttl=ttl)
+        self.maxsize = maxsize
+        self._entries = OrderedDict()  # type: OrderedDict[Hashable, Tuple[Optional[float], Any]]
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _get(self, key: Hashable) -> Any:
+        return self._get_entry(key)[1]
+
+    def _get_entry(self, key: Hashable) -> Tuple[Optional[float], Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None, MISSING
+
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= self._now():
+                del self._entries[key]
+                return None, MISSING
+
+            self._entries.move_to_end(key)
+            return entry
+
+    def _now(self) -> float:
+        return time.monotonic()
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self._get_ttl(ttl)
+        expires_at = None if ttl is None else self._now() + ttl
+
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class DiskCache(BaseCache):
+    """
+    Cache stored in a SQLite database, shared by processes and kept across
+    restarts. Keys are stored by their repr() and values are pickled, so
+    the database must only be writable by trusted users.
+    """
+
+    def __init__(self, path: Union[str, Path], ttl: Optional[float] = None) -> None:
+        super().__init__(ttl=ttl)
+        self.path = Path(path)
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL)"
+        )
+
+    def _get(self, key: Hashable) -> Any:
+        return self._get_entry(key)[1]
+
+    def _get_entry(self, key: Hashable) -> Tuple[Optional[float], Any]:
+        with self._lock:
+            row = self._db.execute("SELECT value, expires_at FROM cache WHERE key = ?", (repr(key),)).fetchone()
+        if row is None:
+            return None, MISSING
+
+        value, expires_at = row
+        if expires_at is not None and expires_at <= self._now():
+            self.delete(key)
+            return None, MISSING
+
+        return expires_at, pickle.loads(value)
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self._get_ttl(ttl)
+        expires_at = None if ttl is None else self._now() + ttl
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)", (repr(key), data, expires_at)
+            )
+
+    def set_many(self, items: Iterable[Tuple[Hashable, Any]], ttl: Optional[float] = None) -> None:
+        ttl = self._get_ttl(ttl)
+        expires_at = None if ttl is None else self._now() + ttl
+        rows = ((repr(key), pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), expires_at) for key, value in items)
+
+        with self._lock, self._db:
+            self._db.executemany("INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)", rows)
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM cache WHERE key = ?", (repr(key),))
+
+    def clear(self) -> None:
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM cache")
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+class TieredCache(BaseCache):
+    """
+    Chain of caches, usually a small MemoryCache in front of a DiskCache.
+
+    Values found in a slower level are copied to the faster ones, expiring
+    with the slower level's entry (or earlier, by their default TTL). New
+    values are stored in every level. ttl, when given, overrides the default
+    TTL of every level.
+    """
+
+    def __init__(self, *caches: BaseCache, ttl: Optional[float] = None) -> None:
+        super().__init__(ttl=ttl)
+        self.caches = caches
+
+    def _get(self, key: Hashable) -> Any:
+        for level, cache in enumerate(self.caches):
+            expires_at, value = cache._get_entry(key)
+            if value is MISSING:
+                continue
+
+            ttl = None if expires_at is None else max(0, expires_at - cache._now())
+            for faster_cache in self.caches[:level]:
+                faster_ttl = faster_cache.ttl
+                if ttl is not None and (faster_ttl is None or ttl < faster_ttl):
+                    faster_ttl = ttl
+                faster_cache.set(key, value, ttl=faster_ttl)
+            return value
+        return MISSING
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self._get_ttl(ttl)
+        for cache in self.caches:
+            cache.set(key, value, ttl=ttl)
+
+    def set_many(self, items: Iterable[Tuple[Hashable, Any]], ttl: Optional[float] = None) -> None:
+        # only the last (persistent) level is preloaded
+        self.caches[-1].set_many(items, ttl=self._get_ttl(ttl))
+
+    def delete(self, key: Hashable) -> None:
+        for cache in self.caches:
+            cache.delete(key)
+
+    def clear(self) -> None:
+        for cache in self.caches:
+            cache.clear()
+
+
+def get_zip_code_cache_key(zip_code: Union[ZipCode, str]) -> tuple:
+    return ("consultaCEP", ZipCode.create(zip_code).code)
+
+
+class FreightQuoteNormalizer:
+    """
+    Builds the same freight cache key for quotes that Correios charges
+    the same.
+
+    Packages are mapped to the weight bracket of their posting weight.
+    Mechanizable packages are billed by that weight alone, so their
+    dimensions are ignored. Destination zip codes are mapped to their first
+    zip_code_digits digits. Delivery times can differ inside a zip code
+    band, so use more digits when exact delivery times matter.
+    """
+
+    def __init__(
+        self,
+        weight_brackets: Iterable[int] = DEFAULT_FREIGHT_WEIGHT_BRACKETS,
+        zip_code_digits: int = DEFAULT_FREIGHT_ZIP_CODE_DIGITS,
+    ) -> None:
+        self.weight_brackets = sorted(weight_brackets)
+        self.zip_code_digits = zip_code_digits
+
+    def get_weight_bracket(self, weight: int) -> int:
+        index = bisect_left(self.weight_brackets, weight)
+        if index == len(self.weight_brackets):
+            return weight
+        return self.weight_brackets[index]
+
+    def get_package_key(self, package: Package) -> tuple:
+        key = (package.package_type, self.get_weight_bracket(package.posting_weight))  # type: tuple
+        if not package.is_mechanizable:
+            key += (package.length, package.height, package.width, package.diameter)
+        return key
+
+    def get_zip_code_key(self, zip_code: Union[ZipCode, str]) -> str:
+        return str(zip_code)[: self.zip_code_digits]
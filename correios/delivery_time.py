@@ -0,0 +1,228 @@
+# Copyright 2016 Osvaldo Santana Neto
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import argparse
+import itertools
+import json
+import logging
+import sys
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union  # noqa: F401
+
+from .models.address import ZipCode
+from .models.data import ZIP_CODES
+from .models.user import Service
+from .utils import imap_unordered
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ZIP_CODE_DIGITS = 3
+DEFAULT_BUILD_WORKERS = 8
+MISSING_DELIVERY_TIME = 255
+MAX_DELIVERY_TIME = MISSING_DELIVERY_TIME - 1
+
+
+def get_metadata_path(path: Union[str, Path]) -> Path:
+    return Path(path).with_suffix(".json")
+
+
+def get_default_destinations(zip_code_digits: int = DEFAULT_ZIP_CODE_DIGITS) -> Iterator[str]:
+    """
+    Yield one valid zip code for each destination band with zip_code_digits
+    digits.
+    """
+    prefixes_per_band = 10 ** (5 - zip_code_digits)
+    for band in range(10**zip_code_digits):
+        for prefix in range(band * prefixes_per_band, (band + 1) * prefixes_per_band):
+            if prefix in ZIP_CODES:
+                yield "{:05}000".format(prefix)
+                break
+
+
+class DeliveryTimeMatrix:
+    """
+    Delivery times, in days, by service, origin zip code band and
+    destination zip code band.
+
+    Bands are the first zip_code_digits digits of the zip codes. Times are
+    stored in a (services x origins x 10 ** zip_code_digits) uint8 NumPy
+    array, saved as a .npy file with a .json metadata file next to it.
+    Loaded matrices are memory-mapped and read-only. Requires numpy.
+    """
+
+    def __init__(
+        self,
+        services: Sequence[Union[Service, int]],
+        origins: Sequence[Union[ZipCode, str]],  # zip codes or bands
+        zip_code_digits: int = DEFAULT_ZIP_CODE_DIGITS,
+        data=None,
+    ) -> None:
+        if np is None:
+            raise ImportError("DeliveryTimeMatrix requires numpy (pip install correios[speedups])")
+
+        self.zip_code_digits = zip_code_digits
+        self.services = [Service.get(s).code for s in services]
+        self.origins = []  # type: List[str]
+        for origin in origins:
+            band = self._get_origin_band(origin)
+            if band not in self.origins:
+                self.origins.append(band)
+
+        self._service_indexes = {code: i for i, code in enumerate(self.services)}
+        self._origin_indexes = {band: i for i, band in enumerate(self.origins)}
+
+        shape = (len(self.services), len(self.origins), 10**zip_code_digits)
+        if data is None:
+            data = np.full(shape, MISSING_DELIVERY_TIME, dtype=np.uint8)
+        if data.shape != shape:
+            raise ValueError("Invalid delivery time matrix shape {} (expected {})".format(data.shape, shape))
+        self.data = data
+
+    def _get_band(self, zip_code: Union[ZipCode, str]) -> str:
+        return str(ZipCode.create(zip_code))[: self.zip_code_digits]
+
+    def _get_origin_band(self, origin: Union[ZipCode, str]) -> str:
+        if isinstance(origin, str) and len(origin) == self.zip_code_digits and origin.isdigit():
+            return origin
+        return self._get_band(origin)
+
+    def _get_index(
+        self, service: Union[Service, int], from_zip: Union[ZipCode, str], to_zip: Union[ZipCode, str]
+    ) -> Optional[Tuple[int, int, int]]:
+        service_index = self._service_indexes.get(Service.get(service).code)
+        origin_index = self._origin_indexes.get(self._get_band(from_zip))
+        if service_index is None or origin_index is None:
+            return None
+        return service_index, origin_index, int(self._get_band(to_zip))
+
+    def get(
+        self, service: Union[Service, int], from_zip: Union[ZipCode, str], to_zip: Union[ZipCode, str]
+    ) -> Optional[int]:
+        index = self._get_index(service, from_zip, to_zip)
+        if index is None:
+            return None
+
+        delivery_time = int(self.data[index])
+        if delivery_time == MISSING_DELIVERY_TIME:
+            return None
+        return delivery_time
+
+    def set(
+        self,
+        service: Union[Service, int],
+        from_zip: Union[ZipCode, str],
+        to_zip: Union[ZipCode, str],
+        delivery_time: int,
+    ) -> None:
+        index = self._get_index(service, from_zip, to_zip)
+        if index is None:
+            raise KeyError("Unknown service {} or origin {}".format(service, from_zip))
+        self.data[index] = min(int(delivery_time), MAX_DELIVERY_TIME)
+
+    def save(self, path: Union[str, Path]) -> None:
+        path = Path(path)
+        with path.open("wb") as data_file:
+            np.save(data_file, self.data)
+
+        metadata = {"services": self.services, "origins": self.origins, "zip_code_digits": self.zip_code_digits}
+        with get_metadata_path(path).open("w") as metadata_file:
+            json.dump(metadata, metadata_file)
+
+    @classmethod
+    def load(cls, path: Union[str, Path], mmap: bool = True) -> "DeliveryTimeMatrix":
+        with get_metadata_path(path).open() as metadata_file:
+            metadata = json.load(metadata_file)
+
+        data = np.load(str(path), mmap_mode="r" if mmap else None)
+        return cls(metadata["services"], metadata["origins"], zip_code_digits=metadata["zip_code_digits"], data=data)
+
+    @classmethod
+    def build(
+        cls,
+        client,
+        services: Sequence[Union[Service, int]],
+        origins: Sequence[Union[ZipCode, str]],
+        destinations: Optional[Iterable[Union[ZipCode, str]]] = None,
+        zip_code_digits: int = DEFAULT_ZIP_CODE_DIGITS,
+        max_workers: int = DEFAULT_BUILD_WORKERS,
+    ) -> "DeliveryTimeMatrix":
+        """
+        Build a matrix with client.request_delivery_time() calls for every
+        service, origin and destination. Origins must be full zip codes and
+        destinations one zip code per band; by default, the first valid zip
+        code of each band. Failed calls and answers with an error code are
+        left missing, so their lookups fall back to the live service.
+        """
+        # CalcPrazo needs full zip codes, so bands are rejected here
+        origins = [ZipCode.create(origin) for origin in origins]
+        matrix = cls(services, origins, zip_code_digits=zip_code_digits)
+        if destinations is None:
+            destinations = get_default_destinations(zip_code_digits)
+
+        def calculate(arguments):
+            return client.request_delivery_time(*arguments)
+
+        routes = itertools.product(services, origins, destinations)
+        for arguments, future in imap_unordered(calculate, routes, max_workers):
+            service, origin, destination = arguments
+            try:
+                result = future.result()
+                if str(result.Erro or "").strip().lstrip("0"):
+                    logger.warning(
+                        "Could not calculate delivery time for {}: error {} {}".format(
+                            arguments, result.Erro, result.MsgErro
+                        )
+                    )
+                    continue
+                matrix.set(service, origin, destination, int(result.PrazoEntrega))
+            except Exception as exc:
+                logger.warning("Could not calculate delivery time for {}: {!r}".format(arguments, exc))
+
+        return matrix
+
+
+def cli():
+    parser = argparse.ArgumentParser(description="Builds a Correios delivery time matrix file")
+    parser.add_argument("path", help="Path of the matrix .npy file (metadata is saved in a .json file next to it)")
+    parser.add_argument("-s", "--service", dest="services", action="append", required=True, help="Service code")
+    parser.add_argument("-o", "--origin", dest="origins", action="append", required=True, help="Origin zip code")
+    parser.add_argument("-d", "--destinations", help="File with one destination zip code per line")
+    parser.add_argument("--digits", type=int, default=DEFAULT_ZIP_CODE_DIGITS, help="Zip code band digits")
+    parser.add_argument("-w", "--workers", type=int, default=DEFAULT_BUILD_WORKERS, help="Concurrent requests")
+    args = parser.parse_args()
+
+    from .client import Correios
+
+    # CalcPrazo does not require authentication
+    client = Correios(username="", password="")
+
+    destinations = None
+    if args.destinations:
+        with open(args.destinations) as destinations_file:
+            destinations = [line.strip() for line in destinations_file if line.strip()]
+
+    matrix = DeliveryTimeMatrix.build(
+        client, args.services, args.origins, destinations, zip_code_digits=args.digits, max_workers=args.workers
+    )
+    matrix.save(args.path)
+
+
+if __name__ == "__main__":
+    sys.exit(cli() or 0)
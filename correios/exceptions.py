@@ -133,6 +133,22 @@ class NonexistentPostingCardError(ClientError):
     pass
 
 
+class VerificationDigitMismatchError(ClientError):
+    pass
+
+
+class TrackingCodePoolEmptyError(ClientError):
+    pass
+
+
+class ZipCodeNotFoundError(ClientError):
+    pass
+
+
+class CircuitBreakerOpenError(ClientError):
+    pass
+
+
 class RendererError(BaseCorreiosError):
     pass
 
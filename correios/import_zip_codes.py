@@ -0,0 +1,82 @@
+# Copyright 2016 Osvaldo Santana Neto
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import argparse
+import csv
+import logging
+import sys
+from types import SimpleNamespace
+from typing import Dict, Iterable, Iterator, Optional, Tuple  # noqa: F401
+
+from .cache import BaseCache, DiskCache, get_zip_code_cache_key
+from .exceptions import InvalidZipCodeError
+from .models.address import ZipAddress
+from .models.builders import ModelBuilder
+
+logger = logging.getLogger(__name__)
+
+# consultaCEP response fields
+ZIP_CODE_FIELDS = ("cep", "uf", "cidade", "bairro", "end", "complemento2")
+
+
+def iter_zip_addresses(rows: Iterable[Dict[str, str]]) -> Iterator[Tuple[tuple, ZipAddress]]:
+    """
+    Yield (cache key, ZipAddress) for each row with the consultaCEP fields,
+    skipping rows with invalid zip codes.
+    """
+    model_builder = ModelBuilder()
+    for row in rows:
+        data = SimpleNamespace(**{field: (row.get(field) or "").strip() for field in ZIP_CODE_FIELDS})
+        try:
+            yield get_zip_code_cache_key(data.cep), model_builder.build_zip_address(data)
+        except InvalidZipCodeError as exc:
+            logger.warning("Skipping invalid zip code {!r}: {}".format(data.cep, exc))
+
+
+def import_zip_codes(cache: BaseCache, rows: Iterable[Dict[str, str]], ttl: Optional[float] = None) -> int:
+    """
+    Preload the zip code cache used by Correios.find_zipcode and return the
+    number of imported zip codes.
+    """
+    count = 0
+
+    def counted(items):
+        nonlocal count
+        for item in items:
+            count += 1
+            yield item
+
+    cache.set_many(counted(iter_zip_addresses(rows)), ttl=ttl)
+    return count
+
+
+def cli():
+    parser = argparse.ArgumentParser(description="Imports a CEP dump into a Correios zip code cache")
+    parser.add_argument("path", help="Path of the zip code cache SQLite database")
+    parser.add_argument("dump", help="CSV file with {} columns".format(", ".join(ZIP_CODE_FIELDS)))
+    parser.add_argument("--ttl", type=float, help="Seconds until imported zip codes expire (default: never)")
+    parser.add_argument("--delimiter", default=",", help="CSV delimiter")
+    args = parser.parse_args()
+
+    cache = DiskCache(args.path)
+    with open(args.dump, newline="", encoding="utf-8") as dump_file:
+        count = import_zip_codes(cache, csv.DictReader(dump_file, delimiter=args.delimiter), ttl=args.ttl)
+    cache.close()
+
+    print("Imported {} zip codes into {}".format(count, args.path))
+
+
+if __name__ == "__main__":
+    sys.exit(cli() or 0)
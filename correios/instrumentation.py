@@ -0,0 +1,265 @@
+# Copyright 2016 Osvaldo Santana Neto
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import abc
+import asyncio
+import functools
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple  # noqa: F401
+
+try:
+    from contextvars import ContextVar
+except ImportError:  # pragma: no cover
+    ContextVar = None  # type: ignore
+
+# Prometheus client defaults
+DEFAULT_DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0)
+DEFAULT_SIZE_BUCKETS = tuple(256 * 4**i for i in range(8))  # 256 bytes to 4 MiB
+
+
+class OperationMetrics:
+    """
+    Measurements of a call to a web service operation.
+
+    duration is split into network_time (sending the request and reading
+    the response), serialization_time (zeep request serialization and
+    response parsing) and model_time (building the returned models). Time
+    spent waiting for retries and throttles is only part of duration.
+    attempts is zero for calls rejected by a circuit breaker and for calls
+    that reused a coalesced request. error is the exception class name.
+    """
+
+    def __init__(self, service: str, operation: str) -> None:
+        self.service = service
+        self.operation = operation
+        self.endpoint = ""
+        self.duration = 0.0
+        self.network_time = 0.0
+        self.call_time = 0.0  # network and zeep time
+        self.model_time = 0.0
+        self.request_size = 0
+        self.response_size = 0
+        self.attempts = 0
+        self.retries = 0
+        self.error = None  # type: Optional[str]
+        self.started = False  # False for cache hits, which are not recorded
+
+    @property
+    def serialization_time(self) -> float:
+        return max(self.call_time - self.network_time, 0.0)
+
+    def __repr__(self):
+        return "<OperationMetrics {}.{} duration={:.3f}s attempts={} error={}>".format(
+            self.service, self.operation, self.duration, self.attempts, self.error
+        )
+
+
+class ThreadLocalVar:
+    """
+    The get(), set() and reset() subset of contextvars.ContextVar (Python
+    3.7+) kept in a threading.local(). Asyncio tasks running in the same
+    thread share its value.
+    """
+
+    def __init__(self, name: str, default: Any = None) -> None:
+        self.name = name
+        self.default = default
+        self._local = threading.local()
+
+    def get(self) -> Any:
+        return getattr(self._local, "value", self.default)
+
+    def set(self, value: Any) -> Any:
+        token = self.get()  # the previous value
+        self._local.value = value
+        return token
+
+    def reset(self, token: Any) -> None:
+        self._local.value = token
+
+
+# metrics of the operation running in the current thread or asyncio task
+if ContextVar is not None:
+    current_metrics = ContextVar("current_metrics", default=None)  # type: Any
+else:  # pragma: no cover
+    current_metrics = ThreadLocalVar("current_metrics", default=None)
+
+
+@contextmanager
+def measure(metrics: Optional[OperationMetrics], attribute: str) -> Iterator[None]:
+    started_at = time.perf_counter()
+    try:
+        yield
+    finally:
+        if metrics is not None:
+            setattr(metrics, attribute, getattr(metrics, attribute) + time.perf_counter() - started_at)
+
+
+def record_request(address: str, started_at: float, request: bytes, response: bytes) -> None:
+    """
+    Add an HTTP request, started at started_at (time.perf_counter()), to the
+    current operation metrics.
+    """
+    metrics = current_metrics.get()
+    if metrics is None:
+        return
+
+    metrics.endpoint = address
+    metrics.network_time += time.perf_counter() - started_at
+    metrics.request_size += len(request)
+    metrics.response_size += len(response)
+
+
+def instrumented(service: str, operation: str) -> Callable:
+    """
+    Decorate client methods that call operation of service, so that their
+    model building time is part of the operation metrics.
+    """
+
+    def decorator(method: Callable) -> Callable:
+        if asyncio.iscoroutinefunction(method):
+
+            @functools.wraps(method)
+            async def async_wrapper(self, *args, **kwargs):
+                with self._instrument(service, operation):
+                    return await method(self, *args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with self._instrument(service, operation):
+                return method(self, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+class Instrument(abc.ABC):
+    """
+    Receives the metrics of every web service operation called by the
+    client. Subclasses implement record(), which must be thread-safe.
+    """
+
+    @abc.abstractmethod
+    def record(self, metrics: OperationMetrics) -> None:
+        pass
+
+
+class Histogram:
+    def __init__(self, buckets: Sequence[float]) -> None:
+        self.buckets = sorted(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # the last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def get_cumulative_counts(self) -> List[Tuple[str, int]]:
+        bounds = ["{:g}".format(bucket) for bucket in self.buckets] + ["+Inf"]
+        total = 0
+        cumulative = []
+        for bound, count in zip(bounds, self.counts):
+            total += count
+            cumulative.append((bound, total))
+        return cumulative
+
+
+class HistogramCollector(Instrument):
+    """
+    Instrument that keeps Prometheus style histograms and counters in
+    memory, labeled by service and operation. render() returns them in the
+    Prometheus text exposition format.
+    """
+
+    def __init__(
+        self,
+        prefix: str = "correios",
+        duration_buckets: Sequence[float] = DEFAULT_DURATION_BUCKETS,
+        size_buckets: Sequence[float] = DEFAULT_SIZE_BUCKETS,
+    ) -> None:
+        self.prefix = prefix
+        self.duration_buckets = duration_buckets
+        self.size_buckets = size_buckets
+        self.histograms = {}  # type: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], Histogram]
+        self.counters = {}  # type: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], int]
+        self._lock = threading.Lock()
+
+    def _observe(self, name: str, labels: Tuple[Tuple[str, str], ...], value: float, buckets: Sequence[float]):
+        histogram = self.histograms.get((name, labels))
+        if histogram is None:
+            histogram = self.histograms[(name, labels)] = Histogram(buckets)
+        histogram.observe(value)
+
+    def _increment(self, name: str, labels: Tuple[Tuple[str, str], ...], value: int = 1):
+        self.counters[(name, labels)] = self.counters.get((name, labels), 0) + value
+
+    def record(self, metrics: OperationMetrics) -> None:
+        labels = (("service", metrics.service), ("operation", metrics.operation))
+        phases = (
+            ("total", metrics.duration),
+            ("network", metrics.network_time),
+            ("serialization", metrics.serialization_time),
+            ("model", metrics.model_time),
+        )
+
+        with self._lock:
+            self._increment("operations_total", labels)
+            for phase, duration in phases:
+                self._observe(
+                    "operation_duration_seconds", labels + (("phase", phase),), duration, self.duration_buckets
+                )
+            if metrics.attempts:
+                self._observe("request_size_bytes", labels, metrics.request_size, self.size_buckets)
+                self._observe("response_size_bytes", labels, metrics.response_size, self.size_buckets)
+            if metrics.retries:
+                self._increment("retries_total", labels, metrics.retries)
+            if metrics.error is not None:
+                self._increment("errors_total", labels + (("error", metrics.error),))
+
+    def _format_name(self, name: str, labels: Tuple[Tuple[str, str], ...], suffix: str = "") -> str:
+        label_text = ",".join('{}="{}"'.format(k, v.replace("\\", "\\\\").replace('"', '\\"')) for k, v in labels)
+        return "{}_{}{}{{{}}}".format(self.prefix, name, suffix, label_text)
+
+    def render(self) -> str:
+        lines = []  # type: List[str]
+        with self._lock:
+            histograms = sorted(self.histograms.items(), key=lambda item: item[0])
+            counters = sorted(self.counters.items())
+
+            declared = set()
+            for (name, labels), histogram in histograms:
+                if name not in declared:
+                    lines.append("# TYPE {}_{} histogram".format(self.prefix, name))
+                    declared.add(name)
+                for bound, count in histogram.get_cumulative_counts():
+                    lines.append("{} {}".format(self._format_name(name, labels + (("le", bound),), "_bucket"), count))
+                lines.append("{} {!r}".format(self._format_name(name, labels, "_sum"), histogram.sum))
+                lines.append("{} {}".format(self._format_name(name, labels, "_count"), histogram.count))
+
+            for (name, labels), value in counters:
+                if name not in declared:
+                    lines.append("# TYPE {}_{} counter".format(self.prefix, name))
+                    declared.add(name)
+                lines.append("{} {}".format(self._format_name(name, labels), value))
+
+        return "\n".join(lines) + "\n"
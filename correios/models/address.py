@@ -22,7 +22,7 @@ from typing import List, Tuple, Union
 from phonenumbers import NumberParseException, PhoneNumberFormat, format_number, parse
 
 from correios.exceptions import InvalidStateError, InvalidZipCodeError
-from correios.models.data import ZIP_CODE_MAP, ZIP_CODES
+from correios.models.data import ZIP_CODE_CAPITALS, ZIP_CODE_STATES, ZIP_CODES
 from correios.utils import capitalize_phrase, rreplace
 
 ZIP_CODE_LENGTH = 8
@@ -86,14 +86,11 @@ class ZipCode:
 
     @property
     def state(self):
-        for state, postal_data in ZIP_CODE_MAP.items():
-            if self.prefix in postal_data[self.ALL]:
-                return state
+        return ZIP_CODE_STATES.get(self.prefix)
 
     @property
     def region(self):
-        postal_data = ZIP_CODE_MAP[self.state]
-        if self.prefix in postal_data[self.CAPITAL]:
+        if self.prefix in ZIP_CODE_CAPITALS:
             return self.REGION_CAPITAL
         return self.REGION_INTERIOR
 
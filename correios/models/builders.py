@@ -13,8 +13,12 @@
 # limitations under the License.
 
 
+import re
 from datetime import datetime
-from typing import Dict, Optional
+from io import BytesIO
+from typing import Dict, Iterator, List, Optional, Union
+
+from lxml import etree
 
 from ..utils import to_decimal, to_integer
 from .address import ReceiverAddress, SenderAddress, ZipAddress
@@ -29,10 +33,64 @@ from .posting import (
     Receipt,
     ShippingLabel,
     TrackingCode,
+    TrackingCodeRange,
     TrackingEvent,
 )
 from .user import Contract, ExtraService, FederalTaxNumber, PostingCard, Service, StateTaxNumber, User
 
+INTEGER_RE = re.compile(r"^\s*[+-]?[0-9]+\s*$")
+
+# dimensao_objeto fields used by each package type
+PACKAGE_DIMENSION_FIELDS = {
+    Package.TYPE_BOX: {"height": "dimensao_altura", "length": "dimensao_comprimento", "width": "dimensao_largura"},
+    Package.TYPE_CYLINDER: {"diameter": "dimensao_diametro", "length": "dimensao_comprimento"},
+}
+
+
+def get_children_text(element) -> Dict[str, str]:
+    if element is None:
+        return {}
+    return {child.tag: child.text or "" for child in element}
+
+
+def to_objectify_integer(text: str) -> Union[int, str]:
+    # lxml.objectify, used to build post infos from XML strings, reads integer texts as int
+    return int(text) if INTEGER_RE.match(text) else text
+
+
+class PostInfoParser:
+    """
+    Streaming parser of solicitaXmlPlp responses.
+
+    The plp and remetente blocks come before the objeto_postal ones and are
+    parsed on creation, so the user can be fetched before the shipping labels
+    are built. iter_postal_objects() then yields one objeto_postal element at
+    a time and frees it once the caller is done with it.
+    """
+
+    def __init__(self, xml: bytes) -> None:
+        self._events = etree.iterparse(BytesIO(xml), events=("end",), tag=("plp", "remetente", "objeto_postal"))
+        self.plp = {}  # type: Dict[str, str]
+        self.sender = {}  # type: Dict[str, str]
+
+        for _, element in self._events:
+            if element.tag == "plp":
+                self.plp = get_children_text(element)
+            elif element.tag == "remetente":
+                self.sender = get_children_text(element)
+                break
+
+        self.contract_number = self.sender.get("numero_contrato")
+        self.posting_card_number = self.plp.get("cartao_postagem")
+
+    def iter_postal_objects(self) -> Iterator:
+        for _, element in self._events:
+            yield element
+
+            element.clear()
+            while element.getprevious() is not None:
+                del element.getparent()[0]
+
 
 class ModelBuilder:
     def build_service(self, service_data):
@@ -104,6 +162,9 @@ class ModelBuilder:
         return zip_address
 
     def build_post_info(self, data, user: User) -> PostInfo:
+        if isinstance(data, PostInfoParser):
+            return self._build_parsed_post_info(data, user)
+
         post_info = PostInfo(
             postal_unit=self.build_postal_unit(data.plp),
             posting_list=self._load_posting_list(data=data, user=user),
@@ -126,14 +187,17 @@ class ModelBuilder:
         postal_unit = PostalUnit(code=data.mcu_unidade_postagem, description=data.nome_unidade_postagem)
         return postal_unit
 
-    def _load_posting_list(self, data, user: User) -> PostingList:
-        contract_number = to_integer(data.remetente.numero_contrato)
+    def _get_posting_card(self, user: User, contract_number, posting_card_number) -> PostingCard:
+        contract_number = to_integer(contract_number)
 
         contract = next(c for c in user.contracts if c.number == contract_number)
 
-        posting_card_number = str(data.plp.cartao_postagem.text)
+        posting_card_number = str(posting_card_number)
+
+        return next(p for p in contract.posting_cards if p.number == posting_card_number)
 
-        posting_card = next(p for p in contract.posting_cards if p.number == posting_card_number)
+    def _load_posting_list(self, data, user: User) -> PostingList:
+        posting_card = self._get_posting_card(user, data.remetente.numero_contrato, data.plp.cartao_postagem.text)
 
         posting_list = PostingList(custom_id=0)
 
@@ -246,14 +310,120 @@ class ModelBuilder:
         package = Package(service=data.codigo_servico_postagem.text, **package_data)
         return package
 
+    def _build_parsed_post_info(self, parser: PostInfoParser, user: User) -> PostInfo:
+        posting_card = self._get_posting_card(user, parser.contract_number, parser.posting_card_number)
+        sender_address = self._load_parsed_sender_address(parser.sender)
+
+        posting_list = PostingList(custom_id=0)
+        for postal_object in parser.iter_postal_objects():
+            posting_list.add_shipping_label(
+                self._load_parsed_shipping_label(postal_object, posting_card, sender_address)
+            )
+        posting_list.close_with_id(to_integer(parser.plp["id_plp"]))
+
+        return PostInfo(
+            postal_unit=PostalUnit(
+                code=parser.plp["mcu_unidade_postagem"], description=parser.plp["nome_unidade_postagem"]
+            ),
+            posting_list=posting_list,
+            value=parser.plp["valor_global"],
+        )
+
+    def _load_parsed_shipping_label(
+        self, element, posting_card: PostingCard, sender_address: SenderAddress
+    ) -> ShippingLabel:
+        data = get_children_text(element)
+        national = get_children_text(element.find("nacional"))
+
+        extra_services_element = element.find("servico_adicional")
+        declared_value = None
+        extra_services = []
+        if extra_services_element is not None:
+            declared_value = extra_services_element.findtext("valor_declarado")
+            codes = [e.text for e in extra_services_element.iterfind("codigo_servico_adicional") if e.text]
+            extra_services = [ExtraService.get(code) for code in map(to_integer, codes) if code]
+
+        shipping_label = ShippingLabel(
+            billing=to_decimal(national.get("valor_a_cobrar") or "0.00"),
+            invoice_number=to_objectify_integer(national.get("numero_nota_fiscal", "")),
+            invoice_series=national.get("serie_nota_fiscal", ""),
+            value=to_decimal(declared_value or national.get("valor_nota_fiscal") or "0.00"),
+            text=national.get("descricao_objeto", ""),
+            posting_card=posting_card,
+            sender=sender_address,
+            receiver=self._load_parsed_receiver_address(get_children_text(element.find("destinatario")), national),
+            package=self._load_parsed_package(data, get_children_text(element.find("dimensao_objeto"))),
+            service=Service.get(data["codigo_servico_postagem"]),
+            tracking_code=data["numero_etiqueta"],
+            receipt=self._build_parsed_receipt(data),
+        )
+
+        shipping_label.add_extra_services(
+            [extra_service for extra_service in extra_services if extra_service not in shipping_label.extra_services]
+        )
+
+        return shipping_label
+
+    def _load_parsed_sender_address(self, data: Dict[str, str]) -> SenderAddress:
+        return SenderAddress(
+            email=data.get("email_remetente", ""),
+            name=data.get("nome_remetente", ""),
+            street=data.get("logradouro_remetente", ""),
+            number=data.get("numero_remetente", ""),
+            complement=data.get("complemento_remetente", ""),
+            neighborhood=data.get("bairro_remetente", ""),
+            zip_code=data.get("cep_remetente", ""),
+            city=data.get("cidade_remetente", ""),
+            state=data.get("uf_remetente", ""),
+            phone=data.get("telefone_remetente", ""),
+        )
+
+    def _load_parsed_receiver_address(self, data: Dict[str, str], national: Dict[str, str]) -> ReceiverAddress:
+        return ReceiverAddress(
+            email=data.get("email_destinatario", ""),
+            name=data.get("nome_destinatario", ""),
+            street=data.get("logradouro_destinatario", ""),
+            number=data.get("numero_end_destinatario", ""),
+            complement=data.get("complemento_destinatario", ""),
+            neighborhood=national.get("bairro_destinatario", ""),
+            zip_code=national.get("cep_destinatario", ""),
+            city=national.get("cidade_destinatario", ""),
+            state=national.get("uf_destinatario", ""),
+            phone=data.get("celular_destinatario", ""),
+        )
+
+    def _load_parsed_package(self, data: Dict[str, str], dimensions: Dict[str, str]) -> Package:
+        package_type = to_integer(dimensions["tipo_objeto"])
+        package_data = {key: dimensions[field] for key, field in PACKAGE_DIMENSION_FIELDS.get(package_type, {}).items()}
+        package_data["weight"] = data["peso"]
+
+        return Package(
+            service=data["codigo_servico_postagem"],
+            package_type=package_type,
+            **{k: float(v.replace(",", ".")) for (k, v) in package_data.items()},
+        )
+
+    def _build_parsed_receipt(self, data: Dict[str, str]) -> Optional[Receipt]:
+        if data.get("status_processamento", "").strip() != str(Receipt.STATUS_PROCESSED):
+            return None
+
+        return Receipt(
+            number=data["numero_comprovante_postagem"],
+            post_date=data["data_postagem_sara"],
+            value=data["valor_cobrado"],
+        )
+
     def build_posting_card_status(self, response):
         if response.lower() != "normal":
             return PostingCard.CANCELLED
         return PostingCard.ACTIVE
 
-    def build_tracking_codes_list(self, response):
+    def build_tracking_code_range(self, response):
         codes = response.split(",")
-        return TrackingCode.create_range(codes[0], codes[1])
+        return TrackingCodeRange.create(codes[0], codes[1])
+
+    def build_tracking_codes_list(self, response):
+        return list(self.build_tracking_code_range(response))
 
     def _load_invalid_event(self, tracking_code: TrackingCode, tracked_object):
         event = NotFoundTrackingEvent(timestamp=datetime.utcnow(), comment=tracked_object.erro)
@@ -273,7 +443,7 @@ class ModelBuilder:
                 document=getattr(event, "documento", ""),
                 comment=getattr(event, "comentario", ""),
                 description=getattr(event, "descricao", ""),
-                details=getattr(event, "detalhes", ""),
+                details=getattr(event, "detalhe", ""),
             )
 
             tracking_code.add_event(event)
@@ -295,6 +465,45 @@ class ModelBuilder:
 
         return result
 
+    def load_tracking_events_xml(self, tracking_codes: Dict[str, TrackingCode], body) -> List[TrackingCode]:
+        """
+        Same as load_tracking_events() for the lxml element of a raw
+        buscaEventosLista response body.
+        """
+        result = []
+        for tracked_object in body.iter("objeto"):
+            data = get_children_text(tracked_object)
+            tracking_code = tracking_codes[data["numero"]]
+
+            if data.get("erro"):
+                tracking_code.add_event(NotFoundTrackingEvent(timestamp=datetime.utcnow(), comment=data["erro"]))
+            else:
+                tracking_code.name = data.get("nome")
+                tracking_code.initials = data.get("sigla")
+                tracking_code.category = data.get("categoria")
+                for event in tracked_object.iterfind("evento"):
+                    tracking_code.add_event(self._load_event_xml(get_children_text(event)))
+
+            result.append(tracking_code)
+
+        return result
+
+    def _load_event_xml(self, data: Dict[str, str]) -> TrackingEvent:
+        timestamp = datetime.strptime("{} {}".format(data["data"], data["hora"]), TrackingEvent.timestamp_format)
+        return TrackingEvent(
+            timestamp=timestamp,
+            status=EventStatus(data["tipo"], data["status"]),
+            location_zip_code=data.get("codigo", ""),
+            location=data.get("local", ""),
+            city=data.get("cidade", ""),
+            state=data.get("uf", ""),
+            receiver=data.get("recebedor", ""),
+            document=data.get("documento", ""),
+            comment=data.get("comentario", ""),
+            description=data.get("descricao", ""),
+            details=data.get("detalhe", ""),
+        )
+
     def build_freights_list(self, response):
         result = []
         for service_data in response.cServico:
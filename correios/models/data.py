@@ -16,7 +16,7 @@
 from decimal import Decimal
 from typing import Dict, Tuple  # noqa
 
-from ..utils import RangeSet
+from ..utils import RangeMap, RangeSet
 
 TRACKING_PREFIX = {
     "AL": "Agentes de leitura",
@@ -2254,6 +2254,10 @@ ZIP_CODE_MAP = {
 
 ZIP_CODES = RangeSet(*(p[0] for p in ZIP_CODE_MAP.values()))
 
+# bisect indexes over ZIP_CODE_MAP: zip code prefix -> state and capital zip code prefixes
+ZIP_CODE_STATES = RangeMap((p[0], state) for state, p in ZIP_CODE_MAP.items())
+ZIP_CODE_CAPITALS = RangeSet(*(p[1] for p in ZIP_CODE_MAP.values()))
+
 FREIGHT_ERROR_RESPONSES = {
     0: "Processamento com sucesso",
     -1: "Código de serviço inválido",
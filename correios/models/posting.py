@@ -13,14 +13,20 @@
 # limitations under the License.
 
 import math
+from collections.abc import Sequence
 from datetime import date, datetime, timedelta
 from decimal import Decimal
-from typing import Dict, List, Optional, Tuple, Union, cast  # noqa: F401
+from typing import Dict, Iterable, List, Optional, Tuple, Union, cast  # noqa: F401
 
 from PIL import Image
 
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None  # type: ignore
+
 from .. import exceptions
-from ..utils import get_resource_path, to_decimal
+from ..utils import get_image, get_resource_path, to_decimal
 from .address import Address, ZipCode
 from .data import (
     EXTRA_SERVICE_VD_PAC,
@@ -45,6 +51,8 @@ TRACKING_CODE_SIZE = 13
 TRACKING_CODE_NUMBER_SIZE = 8
 TRACKING_CODE_PREFIX_SIZE = 2
 TRACKING_CODE_SUFFIX_SIZE = 2
+TRACKING_CODE_DIGIT_MULTIPLIERS = (8, 6, 4, 2, 3, 5, 9, 7)
+TRACKING_CODE_MAX_NUMBER = 10**TRACKING_CODE_NUMBER_SIZE - 1
 
 IATA_COEFICIENT = 6.0
 
@@ -169,13 +177,26 @@ class TrackingCode:
             self._digit = int(code[10:11])
 
         self._validate()
+        self._init_tracking_data()
 
+    def _init_tracking_data(self):
         # filled by tracking service
         self.category = None  # type: Optional[str]
         self.name = None  # type: Optional[str]
         self.initials = None  # type: Optional[str]
         self.events = []  # type: List[TrackingEvent]
 
+    @classmethod
+    def _from_parts(cls, prefix: str, number: str, digit: int, suffix: str) -> "TrackingCode":
+        # skips the validation of parts already checked by the caller
+        tracking_code = cls.__new__(cls)
+        tracking_code.prefix = prefix
+        tracking_code.number = number
+        tracking_code.suffix = suffix
+        tracking_code._digit = digit
+        tracking_code._init_tracking_data()
+        return tracking_code
+
     def _validate(self):
         if len(self.prefix) != TRACKING_CODE_PREFIX_SIZE or not self.prefix.isalpha():
             raise exceptions.InvalidTrackingCodeError("Invalid tracking code prefix {}".format(self.prefix))
@@ -194,7 +215,7 @@ class TrackingCode:
             )
 
     @classmethod
-    def create(cls, tracking_code: Union[str, "TrackingCode"]):
+    def create(cls, tracking_code: Union[str, "TrackingCode"]) -> "TrackingCode":
         if isinstance(tracking_code, cls):
             return tracking_code
         tracking_code = cast(str, tracking_code)
@@ -204,7 +225,7 @@ class TrackingCode:
     def calculate_digit(cls, number: str) -> int:
         numbers = [int(c) for c in number if c.isdigit()]
 
-        multipliers = [8, 6, 4, 2, 3, 5, 9, 7]
+        multipliers = TRACKING_CODE_DIGIT_MULTIPLIERS
         mod = sum(multipliers[i] * digit for i, digit in enumerate(numbers)) % 11
 
         if not mod:
@@ -216,31 +237,56 @@ class TrackingCode:
         return 11 - mod
 
     @classmethod
-    def create_range(cls, start: Union[str, "TrackingCode"], end: Union[str, "TrackingCode"]):
-        if not isinstance(start, TrackingCode):
-            start = TrackingCode(start)
+    def calculate_digits(cls, numbers: Iterable[Union[int, str]]) -> List[int]:
+        """
+        Calculate the verification digits of many 8-digit tracking code
+        numbers at once. The calculation is vectorized when numpy is installed.
+        """
+        if np is None:
+            return [cls.calculate_digit("{:08}".format(n)) for n in cls._get_numbers(numbers)]
+        return cls._calculate_digits_array(cls._get_numbers_array(numbers)).tolist()
 
-        if not isinstance(end, TrackingCode):
-            end = TrackingCode(end)
+    @classmethod
+    def _get_numbers(cls, numbers: Iterable[Union[int, str]]) -> List[int]:
+        try:
+            result = [int(n) for n in numbers]
+        except ValueError as exc:
+            raise exceptions.InvalidTrackingCodeError("Invalid tracking code number: {}".format(exc))
 
-        if start.prefix != end.prefix:
-            raise exceptions.InvalidTrackingCodeError(
-                "Different tracking code prefixes: {} != {}".format(start.prefix, end.prefix)
-            )
+        for number in result:
+            if not 0 <= number <= TRACKING_CODE_MAX_NUMBER:
+                raise exceptions.InvalidTrackingCodeError("Invalid tracking code number {}".format(number))
+        return result
 
-        if start.suffix != end.suffix:
-            raise exceptions.InvalidTrackingCodeError(
-                "Different tracking code suffixes: {} != {}".format(start.suffix, end.suffix)
-            )
+    @classmethod
+    def _get_numbers_array(cls, numbers: Iterable[Union[int, str]]):
+        if isinstance(numbers, range):
+            array = np.arange(numbers.start, numbers.stop, numbers.step, dtype=np.int64)  # type: np.ndarray
+        else:
+            try:
+                array = np.asarray(numbers if isinstance(numbers, np.ndarray) else list(numbers)).astype(np.int64)
+            except ValueError as exc:
+                raise exceptions.InvalidTrackingCodeError("Invalid tracking code number: {}".format(exc))
 
-        start_number = int(start.number)
-        end_number = int(end.number)
+        if array.size and (array.min() < 0 or array.max() > TRACKING_CODE_MAX_NUMBER):
+            raise exceptions.InvalidTrackingCodeError("Invalid tracking code numbers (must have 8 digits)")
+        return array
 
-        if start_number > end_number:
-            raise exceptions.InvalidTrackingCodeError("Invalid range numbers: {} > {}".format(start_number, end_number))
+    @classmethod
+    def _calculate_digits_array(cls, numbers):
+        total = np.zeros_like(numbers)
+        for position, multiplier in enumerate(TRACKING_CODE_DIGIT_MULTIPLIERS):
+            total += numbers // 10 ** (TRACKING_CODE_NUMBER_SIZE - position - 1) % 10 * multiplier
+
+        mod = total % 11
+        digits = 11 - mod
+        digits[mod == 0] = 5
+        digits[mod == 1] = 0
+        return digits
 
-        code_range = range(int(start.number), int(end.number) + 1)
-        return [TrackingCode(start.prefix + "{:08}".format(n) + start.suffix) for n in code_range]
+    @classmethod
+    def create_range(cls, start: Union[str, "TrackingCode"], end: Union[str, "TrackingCode"]):
+        return list(TrackingCodeRange.create(start, end))
 
     @property
     def digit(self):
@@ -275,6 +321,95 @@ class TrackingCode:
         return "<TrackingCode code={!r}>".format(self.code)
 
 
+class TrackingCodeRange(Sequence):
+    """
+    Compact sequence of tracking codes with the same prefix and suffix and
+    consecutive numbers.
+
+    Only the bounds are stored. Verification digits are calculated for the
+    whole range on first use and TrackingCode instances are built on demand,
+    so each access returns a new instance.
+    """
+
+    def __init__(self, prefix: str, suffix: str, numbers: range) -> None:
+        self.prefix = prefix
+        self.suffix = suffix
+        self.numbers = numbers
+        self._digits = None
+
+    @classmethod
+    def create(cls, start: Union[str, TrackingCode], end: Union[str, TrackingCode]) -> "TrackingCodeRange":
+        start = TrackingCode.create(start)
+        end = TrackingCode.create(end)
+
+        if start.prefix != end.prefix:
+            raise exceptions.InvalidTrackingCodeError(
+                "Different tracking code prefixes: {} != {}".format(start.prefix, end.prefix)
+            )
+
+        if start.suffix != end.suffix:
+            raise exceptions.InvalidTrackingCodeError(
+                "Different tracking code suffixes: {} != {}".format(start.suffix, end.suffix)
+            )
+
+        start_number = int(start.number)
+        end_number = int(end.number)
+
+        if start_number > end_number:
+            raise exceptions.InvalidTrackingCodeError("Invalid range numbers: {} > {}".format(start_number, end_number))
+
+        return cls(start.prefix, start.suffix, range(start_number, end_number + 1))
+
+    @property
+    def digits(self):
+        if self._digits is None:
+            if np is None:
+                self._digits = TrackingCode.calculate_digits(self.numbers)
+            else:
+                self._digits = TrackingCode._calculate_digits_array(TrackingCode._get_numbers_array(self.numbers))
+        return self._digits
+
+    def _build(self, index: int) -> TrackingCode:
+        number = "{:08}".format(self.numbers[index])
+        return TrackingCode._from_parts(self.prefix, number, int(self.digits[index]), self.suffix)
+
+    def __len__(self):
+        return len(self.numbers)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return TrackingCodeRange(self.prefix, self.suffix, self.numbers[index])
+        return self._build(index)
+
+    def __iter__(self):
+        digits = self.digits
+        if np is not None:
+            digits = digits.tolist()
+
+        for number, digit in zip(self.numbers, digits):
+            yield TrackingCode._from_parts(self.prefix, "{:08}".format(number), digit, self.suffix)
+
+    def __contains__(self, tracking_code):
+        try:
+            tracking_code = TrackingCode.create(tracking_code)
+        except (exceptions.InvalidTrackingCodeError, TypeError):
+            return False
+
+        return (
+            tracking_code.prefix == self.prefix
+            and tracking_code.suffix == self.suffix
+            and int(tracking_code.number) in self.numbers
+        )
+
+    def __eq__(self, other):
+        if not isinstance(other, TrackingCodeRange):
+            return NotImplemented
+        return (self.prefix, self.suffix, self.numbers) == (other.prefix, other.suffix, other.numbers)
+
+    def __repr__(self):
+        return "<TrackingCodeRange prefix={!r} suffix={!r} numbers={!r}>".format(self.prefix, self.suffix, self.numbers)
+
+
 class Package:
     TYPE_ENVELOPE = 1  # type: int
     TYPE_BOX = 2  # type: int
@@ -551,7 +686,8 @@ class ShippingLabel:
         "Assinatura: __________________ Documento: _______________"
     )
     sender_header = "DESTINATÁRIO"
-    carrier_logo = str(get_resource_path("carrier_logo_bw.png"))
+    default_logo = str(get_resource_path("default_logo.png"))
+    carrier_logo_path = str(get_resource_path("carrier_logo_bw.png"))
     receiver_data_template = (
         "{receiver.label_name!s:>.50}<br/>"
         "{receiver.label_address!s:>.95}<br/>"
@@ -575,7 +711,7 @@ class ShippingLabel:
         extra_services: Optional[List[Union[ExtraService, int]]] = None,
         logo: Optional[Union[str, Image.Image]] = None,
         order: Optional[str] = "",
-        invoice_number: Optional[str] = "",
+        invoice_number: Optional[Union[int, str]] = "",
         invoice_series: Optional[str] = "",
         invoice_type: Optional[str] = "",
         value: Optional[Decimal] = Decimal("0.00"),
@@ -589,10 +725,7 @@ class ShippingLabel:
             raise exceptions.InvalidAddressesError("Sender and receiver cannot be the same")
 
         if logo is None:
-            logo = str(get_resource_path("default_logo.png"))
-
-        if isinstance(logo, str):
-            logo = Image.open(logo)
+            logo = self.default_logo
 
         self.posting_card = posting_card
         self.sender = sender
@@ -600,7 +733,7 @@ class ShippingLabel:
         self.service = Service.get(service)
         self.tracking_code = TrackingCode.create(tracking_code)
         self.package = package
-        self.logo = logo
+        self._logo = logo  # type: Union[str, Image.Image]
         self.order = order
         self.invoice_number = invoice_number
         self.invoice_series = invoice_series
@@ -610,9 +743,8 @@ class ShippingLabel:
         self.text = text
         self.latitude = latitude
         self.longitude = longitude
-        self.carrier_logo = Image.open(self.carrier_logo)
 
-        self.extra_services = self.service.default_extra_services[:]
+        self.extra_services = list(self.service.default_extra_services)
         if extra_services:
             self.add_extra_services(extra_services)
 
@@ -623,6 +755,20 @@ class ShippingLabel:
     def __repr__(self):
         return "<ShippingLabel tracking={!r}>".format(str(self.tracking_code))
 
+    @property
+    def logo(self) -> Image.Image:
+        if isinstance(self._logo, str):
+            self._logo = get_image(self._logo)
+        return self._logo
+
+    @logo.setter
+    def logo(self, logo: Union[str, Image.Image]):
+        self._logo = logo
+
+    @property
+    def carrier_logo(self) -> Image.Image:
+        return get_image(self.carrier_logo_path)
+
     def add_extra_services(self, extra_services: List[Union["ExtraService", int]]):
         for extra_service in extra_services:
             self.add_extra_service(extra_service)
@@ -727,17 +873,16 @@ class ShippingLabel:
 
 
 class PostingList:
+    default_logo = str(get_resource_path("carrier_logo.png"))
+
     def __init__(self, custom_id: int, logo: Optional[Union[str, Image.Image]] = None) -> None:
         # will be filled by close_posting_list
         self.number = None  # type: Optional[int]
 
         if logo is None:
-            logo = str(get_resource_path("carrier_logo.png"))
-
-        if isinstance(logo, str):
-            logo = Image.open(logo)
+            logo = self.default_logo
 
-        self.logo = logo
+        self._logo = logo  # type: Union[str, Image.Image]
         self.custom_id = custom_id
         self.shipping_labels = {}  # type: Dict[str, ShippingLabel]
 
@@ -747,6 +892,16 @@ class PostingList:
         self.contract = None  # type: Optional[Contract]
         self.sender = None  # type: Optional[Address]
 
+    @property
+    def logo(self) -> Image.Image:
+        if isinstance(self._logo, str):
+            self._logo = get_image(self._logo)
+        return self._logo
+
+    @logo.setter
+    def logo(self, logo: Union[str, Image.Image]):
+        self._logo = logo
+
     def add_shipping_label(self, shipping_label: ShippingLabel):
         if not self.initial_shipping_label:
             self.initial_shipping_label = shipping_label
@@ -863,3 +1018,28 @@ class FreightResponse:
 
     def is_restricted_address(self):
         return self.error_code in self.restricted_address_error_code
+
+
+class FreightRequest:
+    def __init__(
+        self,
+        posting_card: PostingCard,
+        services: List[Union[Service, int]],
+        from_zip: Union[ZipCode, int, str],
+        to_zip: Union[ZipCode, int, str],
+        package: "Package",
+        value: Union[Decimal, float] = 0.00,
+        extra_services: Optional[List[Union[ExtraService, int]]] = None,
+    ) -> None:
+        self.posting_card = posting_card
+        self.services = [Service.get(s) for s in services]
+        self.from_zip = ZipCode.create(from_zip)
+        self.to_zip = ZipCode.create(to_zip)
+        self.package = package
+        self.value = value
+        self.extra_services = extra_services
+
+    def __repr__(self):
+        return "<FreightRequest services={!r} from_zip={!r} to_zip={!r}>".format(
+            [str(s) for s in self.services], str(self.from_zip), str(self.to_zip)
+        )
@@ -29,7 +29,7 @@ from correios.exceptions import (
     MinimumDeclaredValueError,
 )
 
-from ..utils import get_resource_path, to_datetime, to_integer
+from ..utils import get_image, get_resource_path, to_datetime, to_integer
 from .data import (
     EXTRA_SERVICE_VD_PAC,
     EXTRA_SERVICE_VD_PAC_MINI,
@@ -56,6 +56,28 @@ def _to_state_tax_number(state_tax_number) -> "StateTaxNumber":
     return StateTaxNumber(state_tax_number)
 
 
+class Immutable:
+    """
+    Base class of models shared through a registry by their get() class
+    method. Attributes can't be changed once __init__ calls _freeze().
+    """
+
+    _frozen = False
+
+    def _freeze(self) -> None:
+        object.__setattr__(self, "_frozen", True)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        if self._frozen:
+            raise AttributeError("{} instances are immutable".format(type(self).__name__))
+        super().__setattr__(name, value)
+
+    def __delattr__(self, name: str) -> None:
+        if self._frozen:
+            raise AttributeError("{} instances are immutable".format(type(self).__name__))
+        super().__delattr__(name)
+
+
 class AbstractTaxNumber:
     def __init__(self, number: str) -> None:
         self._number = self._validate(number)
@@ -125,7 +147,10 @@ class StateTaxNumber(AbstractTaxNumber):
         return self.number
 
 
-class Service:
+class Service(Immutable):
+    # shared instances returned by Service.get() indexed by integer code
+    _registry = {}  # type: Dict[int, Service]
+
     # noinspection PyShadowingBuiltins
     def __init__(
         self,
@@ -152,9 +177,9 @@ class Service:
         self.max_declared_value = max_declared_value
 
         if default_extra_services is None:
-            self.default_extra_services = []  # type: List
-        else:
-            self.default_extra_services = [ExtraService.get(es) for es in default_extra_services]
+            default_extra_services = ()
+        self.default_extra_services = tuple(ExtraService.get(es) for es in default_extra_services)
+        self._freeze()
 
     def __str__(self):
         return str(self.code)
@@ -163,9 +188,15 @@ class Service:
         return "<Service code={!r}, name={!r}>".format(self.code, self.display_name)
 
     def __eq__(self, other):
+        if self is other:
+            return True
         other = Service.get(other)
         return (self.id, self.code) == (other.id, other.code)
 
+    def __hash__(self):
+        # consistent with __eq__ for Service instances and integer codes
+        return hash(int(self.code))
+
     def validate_insurance_declared_value(self, value: Union[Decimal, float], insurance_code: int) -> bool:
         services_need_value_gt_zero = [EXTRA_SERVICE_VD_SEDEX, EXTRA_SERVICE_VD_PAC, EXTRA_SERVICE_VD_PAC_MINI]
         if value == 0 and insurance_code in services_need_value_gt_zero:
@@ -196,7 +227,8 @@ class Service:
     @property
     def symbol_image(self) -> Image.Image:
         if not self._symbol_image:
-            self._symbol_image = Image.open(self.get_symbol_filename())
+            # cached image, not part of the service data
+            object.__setattr__(self, "_symbol_image", get_image(self.get_symbol_filename()))
         return self._symbol_image
 
     @classmethod
@@ -208,12 +240,19 @@ class Service:
     def get(cls, service: Union["Service", int, str]) -> "Service":
         if isinstance(service, cls):
             return service
+
         service = cast(Union[int, str], service)
-        code = cls.sanitize_code(service)
-        return cls(code=code, **SERVICES[code])
+        number = service if isinstance(service, int) else int(cls.sanitize_code(service))
+        instance = cls._registry.get(number)
+        if instance is None:
+            code = "{:05}".format(number)
+            instance = cls._registry.setdefault(number, cls(code=code, **SERVICES[code]))
+        return instance
+
 
+class ExtraService(Immutable):
+    _registry = {}  # type: Dict[int, ExtraService]
 
-class ExtraService:
     def __init__(self, number: int, code: str, name: str, display_on_label: bool = True) -> None:
         if not number:
             raise InvalidExtraServiceError("Invalid Extra Service Number {!r}".format(number))
@@ -228,25 +267,35 @@ class ExtraService:
         self.name = name
 
         self.display_on_label = display_on_label
+        self._freeze()
 
     def __repr__(self):
         return "<ExtraService number={!r}, code={!r}>".format(self.number, self.code)
 
     def __eq__(self, other):
+        if self is other:
+            return True
         if isinstance(other, int):
             return self.number == other
         return self.number == other.number
 
+    def __hash__(self):
+        return hash(self.number)
+
     def is_declared_value(self):
-        return self in (EXTRA_SERVICE_VD_PAC, EXTRA_SERVICE_VD_PAC_MINI, EXTRA_SERVICE_VD_SEDEX)
+        return self.number in (EXTRA_SERVICE_VD_PAC, EXTRA_SERVICE_VD_PAC_MINI, EXTRA_SERVICE_VD_SEDEX)
 
     @classmethod
     def get(cls, number: Union["ExtraService", int]) -> "ExtraService":
         if isinstance(number, cls):
             return number
+
         number = cast(int, number)
-        attrs = EXTRA_SERVICES[number]  # type: Dict[str, Any]
-        return cls(number=number, **attrs)
+        instance = cls._registry.get(number)
+        if instance is None:
+            attrs = EXTRA_SERVICES[number]  # type: Dict[str, Any]
+            instance = cls._registry.setdefault(number, cls(number=number, **attrs))
+        return instance
 
 
 class User:
@@ -416,7 +465,9 @@ class PostingCard:
         return self.number
 
 
-class RegionalDirection:
+class RegionalDirection(Immutable):
+    _registry = {}  # type: Dict[int, RegionalDirection]
+
     def __init__(self, number: int, code: str, name: str) -> None:
         if not number:
             raise InvalidRegionalDirectionError("Invalid regional direction number {!r}".format(number))
@@ -430,13 +481,18 @@ class RegionalDirection:
         self.number = to_integer(number)
         self.code = code.upper()
         self.name = name
+        self._freeze()
 
     @classmethod
     def get(cls, number: Union["RegionalDirection", int]) -> "RegionalDirection":
         if isinstance(number, RegionalDirection):
             return number
 
-        return cls(number=number, **REGIONAL_DIRECTIONS[number])
+        number = to_integer(number)
+        instance = cls._registry.get(number)
+        if instance is None:
+            instance = cls._registry.setdefault(number, cls(number=number, **REGIONAL_DIRECTIONS[number]))
+        return instance
 
     def __repr__(self):
         return "<RegionalDirection number={!r}, code={!r}>".format(self.number, self.code)
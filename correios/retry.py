@@ -0,0 +1,180 @@
+# Copyright 2016 Osvaldo Santana Neto
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import random
+import threading
+import time
+from typing import Iterable, Optional  # noqa: F401
+
+from requests.exceptions import ConnectionError, ConnectTimeout, Timeout
+from zeep.exceptions import TransportError
+
+from .exceptions import CircuitBreakerOpenError
+
+try:
+    import httpx
+except ImportError:  # pragma: no cover
+    httpx = None  # type: ignore
+
+DEFAULT_RETRY_ATTEMPTS = 3
+DEFAULT_RETRY_BACKOFF = 0.5  # seconds
+DEFAULT_RETRY_MAX_BACKOFF = 8.0  # seconds
+DEFAULT_CIRCUIT_BREAKER_THRESHOLD = 5
+DEFAULT_CIRCUIT_BREAKER_TIMEOUT = 30.0  # seconds
+
+# SIGEP operations that change data on Correios: a retried request that
+# had reached the server would close the posting list or reserve tracking
+# codes twice
+NON_IDEMPOTENT_OPERATIONS = frozenset(("fechaPlpVariosServicos", "solicitaEtiquetas"))
+
+
+def is_connect_error(exception: Exception) -> bool:
+    """
+    Return True for errors raised before the request was sent.
+    """
+    if isinstance(exception, ConnectTimeout):
+        return True
+    return httpx is not None and isinstance(exception, (httpx.ConnectTimeout, httpx.ConnectError))
+
+
+def is_transient_error(exception: Exception) -> bool:
+    """
+    Return True for timeouts, connection errors and 5xx responses, that is,
+    errors that may not happen again and mean the service is unhealthy.
+    SOAP faults are answers from a working service.
+    """
+    if isinstance(exception, (Timeout, ConnectionError)):
+        return True
+    if isinstance(exception, TransportError):
+        return exception.status_code >= 500
+    return httpx is not None and isinstance(exception, httpx.TransportError)
+
+
+class RetryPolicy:
+    """
+    Retries transient errors up to max_attempts calls in total.
+
+    Calls wait a random time between zero and backoff * 2 ** retry seconds
+    (at most max_backoff) before each retry ("full jitter"), so clients do
+    not retry in lockstep. Operations in non_idempotent_operations are only
+    retried when the request was not sent.
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = DEFAULT_RETRY_ATTEMPTS,
+        backoff: float = DEFAULT_RETRY_BACKOFF,
+        max_backoff: float = DEFAULT_RETRY_MAX_BACKOFF,
+        non_idempotent_operations: Iterable[str] = NON_IDEMPOTENT_OPERATIONS,
+    ) -> None:
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.non_idempotent_operations = frozenset(non_idempotent_operations)
+        self.retries = 0
+        self._lock = threading.Lock()
+
+    def should_retry(self, operation: str, exception: Exception, attempt: int) -> bool:
+        # attempt is the number of calls made so far
+        if attempt >= self.max_attempts:
+            return False
+        if operation in self.non_idempotent_operations:
+            return is_connect_error(exception)
+        return is_transient_error(exception)
+
+    def get_delay(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** (attempt - 1)))
+
+    def record_retry(self) -> None:
+        # policies are shared by the threads (and tasks) of a client
+        with self._lock:
+            self.retries += 1
+
+
+class CircuitBreaker:
+    """
+    Fails fast while a service is down.
+
+    The circuit opens after threshold consecutive transient errors and
+    calls raise CircuitBreakerOpenError for timeout seconds. Then one trial
+    call is let through: the circuit closes if it succeeds and opens again
+    if it fails or is interrupted. A trial call that is not recorded within
+    timeout seconds is replaced by a new one.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(
+        self,
+        name: str,
+        threshold: int = DEFAULT_CIRCUIT_BREAKER_THRESHOLD,
+        timeout: float = DEFAULT_CIRCUIT_BREAKER_TIMEOUT,
+    ) -> None:
+        self.name = name
+        self.threshold = threshold
+        self.timeout = timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.rejected = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def before_call(self) -> None:
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+
+            now = time.monotonic()
+            remaining = self._opened_at + self.timeout - now
+            if remaining <= 0:
+                # _opened_at also marks when the trial call started
+                self.state = self.HALF_OPEN
+                self._opened_at = now
+                return
+
+            self.rejected += 1
+        raise CircuitBreakerOpenError(
+            "Correios {} service is unavailable (retry in {:.0f} seconds)".format(self.name, max(remaining, 0))
+        )
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.threshold:
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    def record_interrupted(self) -> None:
+        """
+        Record a call interrupted by a BaseException (e.g. a cancelled
+        task or KeyboardInterrupt), which says nothing about the service.
+        """
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    def record(self, exception: Optional[Exception]) -> None:
+        if exception is not None and is_transient_error(exception):
+            self.record_failure()
+        else:
+            self.record_success()
@@ -13,13 +13,49 @@
 # limitations under the License.
 
 
-from typing import Optional
+import os
+import threading
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple  # noqa: F401
 
 from . import xml_utils
 from .exceptions import PostingListSerializerError
 from .models.posting import PostingList, ShippingLabel
 from .utils import get_resource_path
 
+XML_DECLARATION = b'<?xml version="1.0" encoding="ISO-8859-1"?>'
+
+_schema_cache = {}  # type: Dict[Tuple[str, float], xml_utils.XMLSchema]
+_schema_cache_lock = threading.Lock()
+
+
+def get_schema(xsd_path: str) -> xml_utils.XMLSchema:
+    """
+    Return the compiled XMLSchema for xsd_path.
+
+    Compiled schemas are shared by the whole process and keyed by path and
+    modification time, so a changed XSD file is compiled again on next use.
+    """
+    key = (os.path.abspath(xsd_path), os.path.getmtime(xsd_path))
+    schema = _schema_cache.get(key)
+    if schema is not None:
+        return schema
+
+    with _schema_cache_lock:
+        schema = _schema_cache.get(key)
+        if schema is None:
+            with open(xsd_path) as xsd:
+                xsd_document = xml_utils.parse(xsd)
+            schema = xml_utils.XMLSchema(xsd_document)
+            for stale_key in [k for k in _schema_cache if k[0] == key[0]]:
+                del _schema_cache[stale_key]
+            _schema_cache[key] = schema
+    return schema
+
+
+def clear_schema_cache() -> None:
+    with _schema_cache_lock:
+        _schema_cache.clear()
+
 
 class PostingListSerializer:
     def __init__(self, xsd_path: Optional[str] = None) -> None:
@@ -114,19 +150,28 @@ class PostingListSerializer:
 
         return item
 
-    def get_document(self, posting_list: PostingList) -> xml_utils.Element:
+    def _check_posting_list(self, posting_list: PostingList) -> None:
         if not posting_list.shipping_labels:
             raise PostingListSerializerError("Cannot serialize an empty posting list")
 
         if posting_list.closed:
             raise PostingListSerializerError("Cannot serialize a closed posting list")
 
+    def _get_header_elements(self, posting_list: PostingList) -> List[xml_utils.Element]:
+        return [
+            xml_utils.Element("tipo_arquivo", text="Postagem"),
+            xml_utils.Element("versao_arquivo", text="2.3"),
+            self._get_posting_list_element(posting_list),
+            self._get_sender_info_element(posting_list),
+            xml_utils.Element("forma_pagamento"),
+        ]
+
+    def get_document(self, posting_list: PostingList) -> xml_utils.Element:
+        self._check_posting_list(posting_list)
+
         root = xml_utils.Element("correioslog")
-        root.append(xml_utils.Element("tipo_arquivo", text="Postagem"))
-        root.append(xml_utils.Element("versao_arquivo", text="2.3"))
-        root.append(self._get_posting_list_element(posting_list))
-        root.append(self._get_sender_info_element(posting_list))
-        root.append(xml_utils.Element("forma_pagamento"))
+        for element in self._get_header_elements(posting_list):
+            root.append(element)
 
         for shipping_label in posting_list.shipping_labels.values():
             root.append(self._get_shipping_label_element(shipping_label))
@@ -134,17 +179,51 @@ class PostingListSerializer:
         return root
 
     def validate(self, document) -> None:
-        with open(self.xsd_path) as xsd:
-            xsd_document = xml_utils.parse(xsd)
-        schema = xml_utils.XMLSchema(xsd_document)
+        schema = get_schema(self.xsd_path)
         return schema.assertValid(document)
 
+    def _encode(self, element) -> bytes:
+        xmlstring = str(xml_utils.tostring(element, encoding="unicode"))
+        return xmlstring.encode("iso-8859-1", errors="ignore")
+
     def get_xml(self, document) -> bytes:
-        xmlstring = str(xml_utils.tostring(document, encoding="unicode"))
-        encoded_xmlstring = xmlstring.encode("iso-8859-1", errors="ignore")
-        return b'<?xml version="1.0" encoding="ISO-8859-1"?>' + encoded_xmlstring
+        return XML_DECLARATION + self._encode(document)
 
     def serialize(self, posting_list: PostingList) -> bytes:
         document = self.get_document(posting_list)
         self.validate(document)
         return self.get_xml(document)
+
+    def iter_serialize(self, posting_list: PostingList, validate: bool = True) -> Iterator[bytes]:
+        """
+        Yield the posting list XML as ISO-8859-1 encoded chunks, one chunk per
+        objeto_postal, producing the same bytes as serialize().
+
+        Only one shipping label element is kept in memory at a time. When
+        validate is set each label is checked against the XSD together with
+        the posting list header instead of validating the whole document.
+        """
+        self._check_posting_list(posting_list)
+
+        header = self._get_header_elements(posting_list)
+        yield XML_DECLARATION + b"<correioslog>" + b"".join(self._encode(element) for element in header)
+
+        if validate:
+            schema = get_schema(self.xsd_path)
+            document = xml_utils.Element("correioslog")
+            for element in header:
+                document.append(element)
+
+        for shipping_label in posting_list.shipping_labels.values():
+            item = self._get_shipping_label_element(shipping_label)
+            if validate:
+                document.append(item)
+                schema.assertValid(document)
+                document.remove(item)
+            yield self._encode(item)
+
+        yield b"</correioslog>"
+
+    def serialize_to(self, posting_list: PostingList, output: BinaryIO, validate: bool = True) -> None:
+        for chunk in self.iter_serialize(posting_list, validate=validate):
+            output.write(chunk)
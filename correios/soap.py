@@ -12,18 +12,282 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import gc
+import hashlib
+import logging
+import os
+import pickle
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Union  # noqa: F401
+from urllib.parse import urlsplit
+
+import zeep
+from lxml import etree
 from requests import Session
-from zeep import Client, Transport
+from requests.adapters import HTTPAdapter
+from zeep import Client, Settings, Transport
+from zeep.wsdl import Document
+
+from .instrumentation import record_request
+
+logger = logging.getLogger(__name__)
+
+# modules where zeep creates classes at runtime while parsing XSD types
+ZEEP_DYNAMIC_MODULES = ("zeep.xsd.dynamic_types", "zeep.objects")
+
+DEFAULT_POOL_CONNECTIONS = 10  # hosts
+DEFAULT_POOL_MAXSIZE = 20  # kept-alive connections per host
+
+# parsed WSDL documents can only be pickled with Pickler.reducer_override()
+WSDL_CACHE_SUPPORTED = sys.version_info >= (3, 8)
+
+
+class _WSDLPickler(pickle.Pickler):
+    def persistent_id(self, obj):
+        # settings and transport belong to the client that loads the document
+        if isinstance(obj, Settings):
+            return "settings"
+        if isinstance(obj, Transport):
+            return "transport"
+        return None
+
+    def reducer_override(self, obj):
+        if isinstance(obj, etree.QName):
+            return etree.QName, (obj.text,)
+
+        if isinstance(obj, etree._Element):
+            return etree.fromstring, (etree.tostring(obj),)
+
+        if isinstance(obj, type) and obj.__module__ in ZEEP_DYNAMIC_MODULES:
+            attrs = {k: v for k, v in vars(obj).items() if k not in ("__dict__", "__weakref__")}
+            return type, (obj.__name__, obj.__bases__, attrs)
+
+        return NotImplemented
+
+
+class _WSDLUnpickler(pickle.Unpickler):
+    def __init__(self, file, transport: Transport, settings: Settings) -> None:
+        super().__init__(file)
+        self.transport = transport
+        self.settings = settings
+
+    def persistent_load(self, pid):
+        if pid == "settings":
+            return self.settings
+        if pid == "transport":
+            return self.transport
+        raise pickle.UnpicklingError("Unsupported persistent id {!r}".format(pid))
+
+
+def _get_local_documents(wsdl: str) -> List[str]:
+    """
+    Return the path of a local WSDL file followed by the local WSDL and
+    schema files it imports or includes, recursively.
+    """
+    documents = []  # type: List[str]
+    seen = set()  # type: Set[str]
+    pending = [os.path.abspath(wsdl)]
+    while pending:
+        path = pending.pop(0)
+        if path in seen or not os.path.isfile(path):
+            continue
+        seen.add(path)
+        documents.append(path)
+
+        try:
+            root = etree.parse(path).getroot()
+        except etree.XMLSyntaxError:
+            continue
+
+        for element in root.iter(etree.Element):
+            if etree.QName(element).localname not in ("import", "include", "redefine"):
+                continue
+            location = element.get("schemaLocation") or element.get("location")
+            if location and not urlsplit(location).scheme:
+                pending.append(os.path.join(os.path.dirname(path), location))
+    return documents
+
+
+class WSDLCache:
+    """
+    On-disk cache of parsed WSDL documents.
+
+    Only local WSDL files are cached. Entries are keyed by the contents of
+    the file and of the local schemas it imports or includes, and by the
+    zeep version, so updated WSDL files or a zeep upgrade invalidate them.
+    Cache files are unpickled on load, so the cache directory must only be
+    writable by trusted users. Requires Python 3.8+; WSDL files are just
+    parsed on older versions.
+    """
+
+    def __init__(self, path: Union[str, Path]) -> None:
+        self.path = Path(path)
+        if not WSDL_CACHE_SUPPORTED:
+            logger.warning("WSDL cache is disabled: it requires Python 3.8+")
+
+    def get_cache_file(self, wsdl: str) -> Optional[Path]:
+        if not WSDL_CACHE_SUPPORTED or not os.path.isfile(wsdl):
+            return None
+
+        digest = hashlib.sha256(zeep.__version__.encode())
+        for path in _get_local_documents(wsdl):
+            with open(path, "rb") as document_file:
+                digest.update(document_file.read())
+
+        filename = "{}-{}.pickle".format(os.path.basename(wsdl), digest.hexdigest()[:16])
+        return self.path / filename
+
+    def load(self, wsdl: str, transport: Transport, settings: Settings) -> Document:
+        cache_file = self.get_cache_file(wsdl)
+        if cache_file is None:
+            return Document(wsdl, transport, settings=settings)
+
+        # unpickling allocates lots of container objects and would trigger
+        # several pointless garbage collection passes
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            with cache_file.open("rb") as cached:
+                return _WSDLUnpickler(cached, transport, settings).load()
+        except FileNotFoundError:
+            pass
+        except Exception as exc:
+            logger.debug("Ignoring invalid WSDL cache file {}: {!r}".format(cache_file, exc))
+        finally:
+            if gc_enabled:
+                gc.enable()
+
+        document = Document(wsdl, transport, settings=settings)
+        self.save(cache_file, document)
+        return document
+
+    def save(self, cache_file: Path, document: Document) -> None:
+        temp_path = None  # type: Optional[str]
+        try:
+            self.path.mkdir(parents=True, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=str(self.path), suffix=".tmp")
+            with os.fdopen(fd, "wb") as temp_file:
+                _WSDLPickler(temp_file, protocol=pickle.HIGHEST_PROTOCOL).dump(document)
+            os.replace(temp_path, str(cache_file))
+        except Exception as exc:
+            logger.warning("Unable to write WSDL cache file {}: {!r}".format(cache_file, exc))
+            if temp_path is not None and os.path.exists(temp_path):
+                os.unlink(temp_path)
+
+
+class PoolMetricsAdapter(HTTPAdapter):
+    """
+    HTTPAdapter that counts requests per host, to show how busy its
+    connection pools are.
+
+    A request is saturated when pool_maxsize requests to its host are
+    already in flight: it waits for a free connection (pool_block=True) or
+    opens an extra connection that is closed afterwards, paying a new TLS
+    handshake. connections is the number of connections opened so far.
+    """
+
+    def __init__(
+        self,
+        pool_connections: int = DEFAULT_POOL_CONNECTIONS,
+        pool_maxsize: int = DEFAULT_POOL_MAXSIZE,
+        pool_block: bool = False,
+        **kwargs,
+    ) -> None:
+        self._stats = {}  # type: Dict[str, Dict[str, int]]
+        self._stats_lock = threading.Lock()
+        super().__init__(pool_connections=pool_connections, pool_maxsize=pool_maxsize, pool_block=pool_block, **kwargs)
+
+    def send(self, request, **kwargs):
+        host = urlsplit(request.url).hostname or ""
+        with self._stats_lock:
+            stats = self._stats.setdefault(host, {"requests": 0, "in_flight": 0, "max_in_flight": 0, "saturated": 0})
+            stats["requests"] += 1
+            stats["in_flight"] += 1
+            stats["max_in_flight"] = max(stats["max_in_flight"], stats["in_flight"])
+            if stats["in_flight"] > self._pool_maxsize:
+                stats["saturated"] += 1
+
+        try:
+            return super().send(request, **kwargs)
+        finally:
+            with self._stats_lock:
+                stats["in_flight"] -= 1
+
+    def get_stats(self) -> Dict[str, Dict[str, int]]:
+        with self._stats_lock:
+            stats = {host: dict(host_stats, connections=0) for host, host_stats in self._stats.items()}
+
+        pools = self.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is not None and pool.host in stats:
+                stats[pool.host]["connections"] += pool.num_connections
+        return stats
+
+
+def create_session(
+    cert=None,
+    verify=True,
+    pool_connections: int = DEFAULT_POOL_CONNECTIONS,
+    pool_maxsize: int = DEFAULT_POOL_MAXSIZE,
+    pool_block: bool = False,
+) -> Session:
+    """
+    Create a requests Session for SoapClient that keeps up to pool_maxsize
+    connections alive per host. With pool_block, no more than pool_maxsize
+    connections are opened and further requests wait for a free one.
+    """
+    session = Session()
+    session.cert = cert
+    session.verify = verify
+    session.headers.update({"Content-Type": "text/xml;charset=UTF-8"})
+
+    adapter = PoolMetricsAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, pool_block=pool_block)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+class InstrumentedTransport(Transport):
+    def post(self, address, message, headers):
+        started_at = time.perf_counter()
+        response = super().post(address, message, headers)
+        record_request(address, started_at, message, response.content)
+        return response
 
 
 class SoapClient(Client):
-    def __init__(self, wsdl, cert=None, verify=True, timeout=8, **kwargs):
-        session = Session()
-        session.cert = cert
-        session.verify = verify
-        session.timeout = timeout
-        session.headers.update({"Content-Type": "text/xml;charset=UTF-8"})
-
-        transport = Transport(operation_timeout=timeout, session=session)
+    """
+    Synchronous SOAP client.
+
+    Operations are sent through session, a requests Session that can be
+    shared by several clients to reuse its connection pools. A session is
+    created with create_session() when none is given; given sessions are
+    used as they are, so cert and verify are ignored.
+    """
+
+    def __init__(
+        self,
+        wsdl,
+        cert=None,
+        verify=True,
+        timeout=8,
+        wsdl_cache: Optional[WSDLCache] = None,
+        session: Optional[Session] = None,
+        **kwargs,
+    ):
+        if session is None:
+            session = create_session(cert=cert, verify=verify)
+            session.timeout = timeout
+
+        transport = InstrumentedTransport(operation_timeout=timeout, session=session)
+
+        if wsdl_cache is not None:
+            settings = kwargs.setdefault("settings", Settings())
+            wsdl = wsdl_cache.load(wsdl, transport, settings)
 
         super().__init__(wsdl=wsdl, transport=transport, **kwargs)
@@ -0,0 +1,138 @@
+# Copyright 2016 Osvaldo Santana Neto
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import asyncio
+import threading
+import time
+import weakref
+from typing import Optional  # noqa: F401
+
+
+class Throttle:
+    """
+    Limits the requests sent to a web service.
+
+    rate is the number of requests per second, with bursts of up to burst
+    requests (token bucket), and max_in_flight is the number of concurrent
+    requests. Either limit is disabled when None.
+
+    Use "with throttle:" in threads and "async with throttle:" in asyncio
+    code. Threads and each event loop have separate max_in_flight limits;
+    the rate is shared by all of them. waits and wait_time count the
+    requests that had to wait and the seconds they waited.
+    """
+
+    def __init__(self, rate: Optional[float] = None, burst: int = 1, max_in_flight: Optional[int] = None) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.max_in_flight = max_in_flight
+        self.waits = 0
+        self.wait_time = 0.0
+
+        self._tokens = float(burst)
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+        self._semaphore = None  # type: Optional[threading.BoundedSemaphore]
+        if max_in_flight is not None:
+            self._semaphore = threading.BoundedSemaphore(max_in_flight)
+        self._async_semaphores = weakref.WeakKeyDictionary()  # type: weakref.WeakKeyDictionary
+
+    def _reserve(self) -> float:
+        # takes a token, even when the bucket is empty, and returns how long
+        # to wait until it would be available
+        if self.rate is None:
+            return 0.0
+
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def _record_wait(self, started_at: float) -> None:
+        with self._lock:
+            self.waits += 1
+            self.wait_time += time.monotonic() - started_at
+
+    def __enter__(self) -> "Throttle":
+        started_at = time.monotonic()
+        waited = False
+        if self._semaphore is not None and not self._semaphore.acquire(blocking=False):
+            self._semaphore.acquire()
+            waited = True
+
+        try:
+            delay = self._reserve()
+            if delay > 0:
+                time.sleep(delay)
+                waited = True
+        except BaseException:
+            self.__exit__()
+            raise
+
+        if waited:
+            self._record_wait(started_at)
+        return self
+
+    def __exit__(self, exc_type=None, exc_value=None, traceback=None) -> None:
+        if self._semaphore is not None:
+            self._semaphore.release()
+
+    def _get_async_semaphore(self) -> Optional[asyncio.Semaphore]:
+        if self.max_in_flight is None:
+            return None
+
+        # only called from coroutines, where it is the running loop
+        # (asyncio.get_running_loop() is Python 3.7+)
+        loop = asyncio.get_event_loop()
+        with self._lock:
+            semaphore = self._async_semaphores.get(loop)
+            if semaphore is None:
+                semaphore = asyncio.Semaphore(self.max_in_flight)
+                self._async_semaphores[loop] = semaphore
+        return semaphore
+
+    async def __aenter__(self) -> "Throttle":
+        started_at = time.monotonic()
+        waited = False
+        semaphore = self._get_async_semaphore()
+        if semaphore is not None:
+            waited = semaphore.locked()
+            await semaphore.acquire()
+
+        try:
+            delay = self._reserve()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                waited = True
+        except BaseException:
+            await self.__aexit__()
+            raise
+
+        if waited:
+            self._record_wait(started_at)
+        return self
+
+    async def __aexit__(self, exc_type=None, exc_value=None, traceback=None) -> None:
+        semaphore = self._get_async_semaphore()
+        if semaphore is not None:
+            semaphore.release()
+
+
+# used for services without limits
+UNLIMITED = Throttle()
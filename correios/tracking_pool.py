@@ -0,0 +1,194 @@
+# Copyright 2016 Osvaldo Santana Neto
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import logging
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Optional, Union  # noqa: F401
+
+from .exceptions import TrackingCodePoolEmptyError
+from .models.posting import TrackingCode, TrackingCodeRange
+from .models.user import Service, User
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LOW_WATER_MARK = 100
+DEFAULT_BATCH_SIZE = 1000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tracking_code_ranges (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    federal_tax_number TEXT NOT NULL,
+    service INTEGER NOT NULL,
+    prefix TEXT NOT NULL,
+    suffix TEXT NOT NULL,
+    next_number INTEGER NOT NULL,
+    stop_number INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tracking_code_ranges_owner ON tracking_code_ranges (federal_tax_number, service);
+"""
+
+
+class TrackingCodePool:
+    """
+    Pool of tracking codes requested from SIGEP for one user and service.
+
+    Codes are requested with solicitaEtiquetas in batches of batch_size and
+    handed out by get(). When fewer than low_water_mark codes are left a new
+    batch is requested in a background thread (or, with background=False,
+    only when the pool is empty). The requested ranges and the next code of
+    each one are stored in the SQLite database at path, so codes handed out
+    before a restart are never handed out again and the unused ones are not
+    lost. Each code is claimed in its own database transaction, so pools in
+    several processes can share the database without handing out the same
+    code twice.
+    """
+
+    def __init__(
+        self,
+        client,
+        user: User,
+        service: Union[Service, int],
+        path: Union[str, Path] = ":memory:",
+        low_water_mark: int = DEFAULT_LOW_WATER_MARK,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        background: bool = True,
+    ) -> None:
+        self.client = client
+        self.user = user
+        self.service = Service.get(service)
+        self.low_water_mark = low_water_mark
+        self.batch_size = batch_size
+        self.background = background
+
+        self._condition = threading.Condition(threading.RLock())
+        self._refilling = False
+        self._error = None  # type: Optional[Exception]
+
+        # transactions are managed explicitly (BEGIN IMMEDIATE in _claim)
+        self._db = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None)
+        self._db.executescript(SCHEMA)
+        if str(path) != ":memory:":
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+
+    @property
+    def _owner(self):
+        return str(self.user.federal_tax_number), self.service.code
+
+    @property
+    def available(self) -> int:
+        with self._condition:
+            (available,) = self._db.execute(
+                "SELECT COALESCE(SUM(stop_number - next_number), 0) FROM tracking_code_ranges "
+                "WHERE federal_tax_number = ? AND service = ? AND next_number < stop_number",
+                self._owner,
+            ).fetchone()
+        return available
+
+    def _add_range(self, code_range: TrackingCodeRange):
+        self._db.execute(
+            "INSERT INTO tracking_code_ranges "
+            "(federal_tax_number, service, prefix, suffix, next_number, stop_number) VALUES (?, ?, ?, ?, ?, ?)",
+            self._owner + (code_range.prefix, code_range.suffix, code_range.numbers.start, code_range.numbers.stop),
+        )
+
+    def _claim(self) -> Optional[TrackingCode]:
+        # the write lock taken by BEGIN IMMEDIATE keeps other connections from
+        # claiming the same number; the conditional UPDATE double checks it
+        while True:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute(
+                    "SELECT id, prefix, suffix, next_number FROM tracking_code_ranges "
+                    "WHERE federal_tax_number = ? AND service = ? AND next_number < stop_number ORDER BY id LIMIT 1",
+                    self._owner,
+                ).fetchone()
+                if row is None:
+                    self._db.execute("COMMIT")
+                    return None
+
+                id_, prefix, suffix, number = row
+                cursor = self._db.execute(
+                    "UPDATE tracking_code_ranges SET next_number = next_number + 1 WHERE id = ? AND next_number = ?",
+                    (id_, number),
+                )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+            if cursor.rowcount == 1:
+                return TrackingCodeRange(prefix, suffix, range(number, number + 1))[0]
+
+    def refill(self) -> None:
+        """
+        Request a new batch of tracking codes and add it to the pool.
+        """
+        code_range = self.client.request_tracking_code_range(self.user, self.service, quantity=self.batch_size)
+        with self._condition:
+            self._add_range(code_range)
+            self._condition.notify_all()
+
+    def _run_refill(self):
+        try:
+            self.refill()
+        except Exception as exc:
+            logger.exception("Could not refill tracking code pool for service {}".format(self.service))
+            with self._condition:
+                self._error = exc
+        finally:
+            with self._condition:
+                self._refilling = False
+                self._condition.notify_all()
+
+    def _start_refill(self):
+        if self._refilling:
+            return
+
+        self._refilling = True
+        if self.background:
+            threading.Thread(target=self._run_refill, name="correios-tracking-code-pool", daemon=True).start()
+        else:
+            self._run_refill()
+
+    def get(self, timeout: Optional[float] = None) -> TrackingCode:
+        """
+        Hand out the next unused tracking code, waiting at most timeout
+        seconds for a refill when the pool is empty.
+        """
+        with self._condition:
+            tracking_code = self._claim()
+            if tracking_code is None:
+                self._error = None
+                self._start_refill()
+                self._condition.wait_for(lambda: self.available or not self._refilling, timeout)
+                tracking_code = self._claim()
+
+            if tracking_code is None:
+                error, self._error = self._error, None
+                if error is not None:
+                    raise TrackingCodePoolEmptyError("Could not refill tracking code pool: {}".format(error)) from error
+                raise TrackingCodePoolEmptyError("Tracking code pool is empty")
+
+            if self.background and self.available < self.low_water_mark:
+                self._start_refill()
+
+        return tracking_code
+
+    def close(self) -> None:
+        with self._condition:
+            self._db.close()
@@ -12,15 +12,20 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import asyncio
 import os
 import re
+import threading
+from bisect import bisect_right
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from datetime import datetime
 from decimal import Decimal
 from itertools import chain
 from pathlib import Path
-from typing import Container, Iterable, Sized, Union
+from typing import Any, Callable, Container, Dict, Hashable, Iterable, Iterator, List, Sized, Tuple, Union  # noqa: F401
 
 import pkg_resources
+from PIL import Image
 
 
 def capitalize_phrase(phrase: str) -> str:
@@ -64,16 +69,90 @@ class RangeSet(Sized, Iterable, Container):
 
             self.ranges.extend(element)
 
+        self._build_index()
+
+    def _build_index(self):
+        # contiguous ranges are merged into sorted (start, stop) boundaries for bisect lookups
+        intervals = sorted((r.start, r.stop) for r in self.ranges if r.step == 1 and r.start < r.stop)
+        starts = []  # type: List[int]
+        stops = []  # type: List[int]
+        for start, stop in intervals:
+            if stops and start <= stops[-1]:
+                stops[-1] = max(stops[-1], stop)
+                continue
+            starts.append(start)
+            stops.append(stop)
+
+        self._starts = starts
+        self._stops = stops
+        self._stepped_ranges = [r for r in self.ranges if r.step != 1]
+
     def __iter__(self):
         return chain.from_iterable(r for r in self.ranges)
 
     def __contains__(self, elem):
-        return any(elem in r for r in self.ranges)
+        if not isinstance(elem, int):
+            return any(elem in r for r in self.ranges)
+
+        position = bisect_right(self._starts, elem) - 1
+        if position >= 0 and elem < self._stops[position]:
+            return True
+        return any(elem in r for r in self._stepped_ranges)
 
     def __len__(self):
         return sum(len(r) for r in self.ranges)
 
 
+class RangeMap(Sized, Container):
+    """
+    Map non-overlapping integer ranges to values.
+
+    Lookups use bisect over the sorted range boundaries instead of scanning
+    every range.
+    """
+
+    def __init__(self, items: Iterable[Tuple[Any, Any]]) -> None:
+        intervals = []
+        for ranges, value in items:
+            for r in RangeSet(ranges).ranges:
+                if r.step != 1:
+                    raise ValueError("RangeMap does not support ranges with step {}".format(r.step))
+                if r.start < r.stop:
+                    intervals.append((r.start, r.stop, value))
+        intervals.sort(key=lambda interval: interval[0])
+
+        for previous, current in zip(intervals, intervals[1:]):
+            if current[0] < previous[1]:
+                msg = "RangeMap ranges cannot overlap: range({}, {}) and range({}, {})"
+                raise ValueError(msg.format(previous[0], previous[1], current[0], current[1]))
+
+        self._starts = [interval[0] for interval in intervals]
+        self._stops = [interval[1] for interval in intervals]
+        self._values = [interval[2] for interval in intervals]
+
+    def get(self, key: int, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __getitem__(self, key: int):
+        position = bisect_right(self._starts, key) - 1
+        if position >= 0 and key < self._stops[position]:
+            return self._values[position]
+        raise KeyError(key)
+
+    def __contains__(self, key):
+        try:
+            self[key]
+        except (KeyError, TypeError):
+            return False
+        return True
+
+    def __len__(self):
+        return sum(stop - start for start, stop in zip(self._starts, self._stops))
+
+
 def to_integer(number: Union[int, str]) -> int:
     return int(str(number).strip())
 
@@ -104,3 +183,128 @@ def get_resource_path(path) -> Path:
     resource_package = "correios"
     resource_path = os.path.join("data", path)
     return Path(pkg_resources.resource_filename(resource_package, resource_path))
+
+
+_images = {}  # type: Dict[str, Image.Image]
+_images_lock = threading.Lock()
+
+
+def get_image(path: Union[str, Path]) -> Image.Image:
+    """
+    Return the decoded image stored at path.
+
+    Images are decoded once and shared by every caller, so they must be
+    treated as read-only.
+    """
+    key = os.path.abspath(str(path))
+    image = _images.get(key)
+    if image is not None:
+        return image
+
+    with _images_lock:
+        image = _images.get(key)
+        if image is None:
+            image = Image.open(str(path))
+            image.load()
+            _images[key] = image
+    return image
+
+
+def imap_unordered(function: Callable, iterable: Iterable, max_workers: int) -> Iterator[Tuple[Any, Future]]:
+    """
+    Call function with each item of iterable in a pool of max_workers
+    threads and yield (item, future) pairs as the calls complete.
+
+    iterable is consumed lazily, keeping at most 2 * max_workers calls
+    queued. Calls not started yet are cancelled when the consumer stops.
+    """
+    pending = {}  # type: Dict[Future, Any]
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        try:
+            for item in iterable:
+                pending[executor.submit(function, item)] = item
+                if len(pending) < max_workers * 2:
+                    continue
+
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield pending.pop(future), future
+
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield pending.pop(future), future
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent calls.
+
+    The first thread that calls do() with a key runs function and the
+    threads that call do() with the same key meanwhile wait for it and get
+    the same result or exception. calls counts the functions run and shared
+    the calls that reused them.
+    """
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.shared = 0
+        self._futures = {}  # type: Dict[Hashable, Future]
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, function: Callable, *args, **kwargs) -> Any:
+        with self._lock:
+            call = key not in self._futures
+            if call:
+                self._futures[key] = Future()
+                self.calls += 1
+            else:
+                self.shared += 1
+            future = self._futures[key]
+
+        if not call:
+            return future.result()
+
+        try:
+            result = function(*args, **kwargs)
+        except BaseException as exc:
+            future.set_exception(exc)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._futures[key]
+
+
+class AsyncSingleFlight:
+    """
+    asyncio version of SingleFlight, where function is a coroutine
+    function. Cancelling a caller does not cancel the shared call.
+    """
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.shared = 0
+        self._tasks = {}  # type: Dict[Hashable, asyncio.Future]
+
+    def _remove(self, key: Hashable, task: asyncio.Future) -> None:
+        del self._tasks[key]
+        if not task.cancelled():
+            task.exception()  # retrieved, even when every caller was cancelled
+
+    async def do(self, key: Hashable, function: Callable, *args, **kwargs) -> Any:
+        task = self._tasks.get(key)
+        if task is not None:
+            self.shared += 1
+        else:
+            self.calls += 1
+            task = asyncio.ensure_future(function(*args, **kwargs))
+            self._tasks[key] = task
+            task.add_done_callback(lambda task: self._remove(key, task))
+        return await asyncio.shield(task)
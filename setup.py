@@ -55,5 +55,11 @@ setup(
         "Programming Language :: Python :: 3",
         "Programming Language :: Python :: 3.5",
     ],
-    entry_points={"console_scripts": ["update-correios-wsdl=correios.update_wsdl:cli"]},
+    entry_points={
+        "console_scripts": [
+            "update-correios-wsdl=correios.update_wsdl:cli",
+            "build-correios-delivery-times=correios.delivery_time:cli",
+            "import-correios-zip-codes=correios.import_zip_codes:cli",
+        ]
+    },
 )
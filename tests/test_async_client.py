@@ -0,0 +1,410 @@
+# Copyright 2016 Osvaldo Santana Neto
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import asyncio
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest import mock
+
+import pytest
+from zeep.exceptions import Fault
+
+from correios.cache import MemoryCache
+from correios.exceptions import ClientError, ClosePostingListError, ConnectTimeoutError
+from correios.instrumentation import HistogramCollector
+from correios.models.address import ZipCode
+from correios.models.data import SERVICE_PAC, SERVICE_SEDEX
+from correios.models.posting import FreightRequest, FreightResponse, TrackingCode
+from correios.models.user import Service
+from correios.retry import RetryPolicy
+from correios.throttle import Throttle
+
+from .vcr import vcr
+
+try:
+    import httpx
+
+    from correios import async_client
+except ImportError:
+    async_client = None
+
+
+@pytest.fixture
+def async_correios():
+    return async_client.AsyncCorreios(username="sigep", password="XXXXXX", environment=async_client.Correios.TEST)
+
+
+def _zip_address_data(cep):
+    return SimpleNamespace(
+        cep=cep, uf="DF", cidade="Brasília", bairro="Asa Norte", end="SBN Quadra 1 Bloco A", complemento2=""
+    )
+
+
+@pytest.mark.skipif(not async_client, reason="Async API Client support disabled")
+@vcr.use_cassette("test_calculate_freights")
+def test_async_calculate_freights(async_correios, posting_card, package):
+    async def calculate_freights():
+        async with async_correios:
+            return await async_correios.calculate_freights(
+                posting_card, [SERVICE_SEDEX, SERVICE_PAC], "07192100", "80030001", package
+            )
+
+    freights = asyncio.run(calculate_freights())
+
+    assert len(freights) == 2
+    assert freights[0].service == Service.get(SERVICE_SEDEX)
+    assert freights[0].total == Decimal("23.75")
+    assert freights[1].service == Service.get(SERVICE_PAC)
+    assert freights[1].total == Decimal("14.10")
+
+
+@pytest.mark.skipif(not async_client, reason="Async API Client support disabled")
+@vcr.use_cassette("test_calculate_delivery_time")
+def test_async_calculate_delivery_time(async_correios):
+    delivery_time = asyncio.run(async_correios.calculate_delivery_time(SERVICE_SEDEX, "07192100", "80030001"))
+    assert int(delivery_time) == 1
+
+
+@pytest.mark.skipif(not async_client, reason="Async API Client support disabled")
+@vcr.use_cassette("test_get_tracking_codes_events")
+def test_async_get_tracking_code_events(async_correios):
+    codes = ["BE058714266BR", "JT365572014BR"]
+    result = asyncio.run(async_correios.get_tracking_code_events(codes))
+
+    assert len(result) == 2
+    assert all(isinstance(tracking_code, TrackingCode) for tracking_code in result)
+    assert {tracking_code.code for tracking_code in result} == set(codes)
+
+
+@pytest.mark.skipif(not async_client, reason="Async API Client support disabled")
+@vcr.use_cassette("test_get_tracking_codes_events")
+def test_async_get_tracking_code_events_fast_path(async_correios):
+    async_correios.fast_tracking = True
+    codes = ["BE058714266BR", "JT365572014BR"]
+
+    async def get_tracking_code_events():
+        async with async_correios:
+            return await async_correios.get_tracking_code_events(codes)
+
+    result = asyncio.run(get_tracking_code_events())
+
+    assert {tracking_code.code for tracking_code in result} == set(codes)
+    assert all(tracking_code.events for tracking_code in result)
+
+
+@pytest.mark.skipif(not async_client, reason="Async API Client support disabled")
+@pytest.mark.parametrize("fast_tracking", (False, True))
+def test_async_get_tracking_code_events_timeout(async_correios, fast_tracking):
+    async_correios.fast_tracking = fast_tracking
+    with mock.patch("httpx.AsyncClient.post", new_callable=mock.AsyncMock, side_effect=httpx.ReadTimeout("timeout")):
+        with pytest.raises(ConnectTimeoutError):
+            asyncio.run(async_correios.get_tracking_code_events("BE058714266BR"))
+
+
+@pytest.mark.skipif(not async_client, reason="Async API Client support disabled")
+@mock.patch("zeep.proxy.AsyncOperationProxy.__call__", new_callable=mock.AsyncMock)
+def test_async_concurrent_calls(mock_soap_client, async_correios):
+    mock_soap_client.side_effect = _zip_address_data
+
+    async def find_zipcodes():
+        return await asyncio.gather(*(async_correios.find_zipcode(cep) for cep in ("70002900", "70002901")))
+
+    zip_addresses = asyncio.run(find_zipcodes())
+
+    assert [zip_address.zip_code for zip_address in zip_addresses] == [ZipCode("70002900"), ZipCode("70002901")]
+    assert mock_soap_client.await_count == 2
+
+
+@pytest.mark.skipif(not async_client, reason="Async API Client support disabled")
+def test_async_get_post_infos(async_correios, user):
+    async def auth_call(method_name, number):
+        await asyncio.sleep(0)
+        if number == 3:
+            raise ClientError("PLP inexistente")
+        return number
+
+    async def get_post_infos():
+        return [result async for result in async_correios.get_post_infos([1, 2, 3])]
+
+    parse_post_info = mock.patch.object(
+        async_correios, "_parse_post_info", side_effect=lambda number: (number, "9911222777", "0056789123")
+    )
+    build_post_info = mock.patch.object(
+        async_correios.model_builder, "build_post_info", side_effect=lambda data, user: data
+    )
+    with mock.patch.object(async_correios, "_auth_call", side_effect=auth_call), parse_post_info, build_post_info:
+        with mock.patch.object(async_correios, "get_user", new_callable=mock.AsyncMock) as mock_get_user:
+            mock_get_user.return_value = user
+            results = dict(asyncio.run(get_post_infos()))
+
+    mock_get_user.assert_awaited_once_with("9911222777", "0056789123")
+    assert results[1] == 1
+    assert results[2] == 2
+    assert isinstance(results[3], ClientError)
+
+
+@pytest.mark.skipif(not async_client, reason="Async API Client support disabled")
+def test_async_get_user_with_cache(async_correios, user):
+    async_correios.user_cache = MemoryCache()
+
+    with mock.patch.object(async_correios, "_auth_call", new_callable=mock.AsyncMock) as mock_auth_call:
+        with mock.patch.object(async_correios.model_builder, "build_user", return_value=user):
+            users = [asyncio.run(async_correios.get_user("9911222777", "0056789123")) for _ in range(2)]
+
+    assert users == [user, user]
+    mock_auth_call.assert_awaited_once_with("buscaCliente", "9911222777", "0056789123")
+
+
+@pytest.mark.skipif(not async_client, reason="Async API Client support disabled")
+@mock.patch("zeep.proxy.AsyncOperationProxy.__call__", new_callable=mock.AsyncMock)
+def test_async_client_timeout_error(mock_soap_client, async_correios):
+    mock_soap_client.side_effect = httpx.ConnectTimeout("timeout")
+    with pytest.raises(ConnectTimeoutError):
+        asyncio.run(async_correios.find_zipcode(ZipCode("70002-900")))
+
+
+@pytest.mark.skipif(not async_client, reason="Async API Client support disabled")
+@mock.patch("zeep.proxy.AsyncOperationProxy.__call__", new_callable=mock.AsyncMock)
+def test_async_close_posting_list_error(mock_soap_client, async_correios, posting_card, posting_list, shipping_label):
+    original_exception = Fault(
+        "A PLP não será fechada , o(s) objeto(s) [PP40233163BR] já estão vinculados em outra PLP!"
+    )
+    mock_soap_client.side_effect = original_exception
+    shipping_label.posting_card = posting_card
+    posting_list.add_shipping_label(shipping_label)
+
+    with pytest.raises(ClosePostingListError) as exc:
+        asyncio.run(async_correios.close_posting_list(posting_list, posting_card))
+
+    assert isinstance(exc.value.__cause__, ClientError)
+
+
+@pytest.mark.skipif(not async_client, reason="Async API Client support disabled")
+def test_async_client_connection_pools():
+    async def check_pools():
+        async with async_client.AsyncCorreios(username="sigep", password="XXXXXX") as client:
+            assert client.sigep_client.transport.client is client.websro_client.transport.client
+            assert client.websro_client.transport.client is client.freight_client.transport.client
+            http_client = client.freight_client.transport.client
+        assert http_client.is_closed
+
+        async with httpx.AsyncClient() as http_client:
+            async with async_client.AsyncCorreios(username="sigep", password="XXXXXX", http_client=http_client) as c:
+                assert c.websro_client.transport.client is http_client
+            assert not http_client.is_closed
+
+    asyncio.run(check_pools())
+
+
+@pytest.mark.skipif(not async_client, reason="Async API Client support disabled")
+def test_async_test_environment_uses_unverified_sigep_pool(async_correios):
+    assert async_correios.sigep_client.transport.client is not async_correios.websro_client.transport.client
+
+
+@pytest.mark.skipif(not async_client, reason="Async API Client support disabled")
+def test_async_iter_tracking_code_events(async_correios):
+    codes = ["PD{:08}BR".format(i) for i in range(120)]
+
+    async def get_tracking_code_events(chunk):
+        await asyncio.sleep(0)
+        return list(chunk)
+
+    async def iter_tracking_code_events():
+        return [tc async for tc in async_correios.iter_tracking_code_events(codes + codes[:10], max_workers=2)]
+
+    with mock.patch.object(async_correios, "get_tracking_code_events", side_effect=get_tracking_code_events):
+        result = asyncio.run(iter_tracking_code_events())
+
+    assert sorted(tc.short for tc in result) == sorted(codes)
+
+
+@pytest.mark.skipif(not async_client, reason="Async API Client support disabled")
+def test_async_calculate_freights_bulk(async_correios, posting_card, package):
+    requests = [
+        FreightRequest(posting_card, [SERVICE_SEDEX], "07192100", "80030001", package),
+        FreightRequest(posting_card, [SERVICE_PAC], "07192100", "80030001", package),
+        FreightRequest(posting_card, [SERVICE_PAC], "07192100", "01310000", package),
+    ]
+
+    async def calculate_freights(posting_card, services, *args):
+        await asyncio.sleep(0)
+        return [FreightResponse(service=s, delivery_time=1, value=10) for s in services]
+
+    async def calculate_freights_bulk():
+        return [result async for result in async_correios.calculate_freights_bulk(requests)]
+
+    with mock.patch.object(async_correios, "calculate_freights", side_effect=calculate_freights) as mock_calculate:
+        results = dict(asyncio.run(calculate_freights_bulk()))
+
+    assert mock_calculate.call_count == 2
+    assert [[f.service for f in results[request]] for request in requests] == [r.services for r in requests]
+
+
+@pytest.mark.skipif(not async_client, reason="Async API Client support disabled")
+@mock.patch("zeep.proxy.AsyncOperationProxy.__call__", new_callable=mock.AsyncMock)
+def test_async_retries_transient_errors(mock_soap_client):
+    client = async_client.AsyncCorreios(username="sigep", password="XXXXXX", retry_policy=RetryPolicy(backoff=0))
+    mock_soap_client.side_effect = [httpx.ReadTimeout("timeout"), _zip_address_data("70002900")]
+
+    zip_address = asyncio.run(client.find_zipcode("70002900"))
+
+    assert zip_address.zip_code == ZipCode("70002900")
+    assert mock_soap_client.await_count == 2
+
+
+@pytest.mark.skipif(not async_client, reason="Async API Client support disabled")
+@mock.patch("zeep.proxy.AsyncOperationProxy.__call__", new_callable=mock.AsyncMock)
+def test_async_circuit_breaker_reopens_after_cancelled_trial_call(mock_soap_client):
+    client = async_client.AsyncCorreios(
+        username="sigep", password="XXXXXX", circuit_breaker_threshold=1, circuit_breaker_timeout=0
+    )
+    circuit_breaker = client.circuit_breakers["sigep"]
+
+    async def consulta_cep(cep):
+        await asyncio.sleep(60)
+
+    async def cancel_trial_call():
+        mock_soap_client.side_effect = httpx.ConnectTimeout("timeout")
+        with pytest.raises(ConnectTimeoutError):
+            await client.find_zipcode("70002900")
+
+        mock_soap_client.side_effect = consulta_cep
+        task = asyncio.ensure_future(client.find_zipcode("70002900"))
+        await asyncio.sleep(0)
+        assert circuit_breaker.state == "half-open"
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel_trial_call())
+
+    assert circuit_breaker.state == "open"
+
+
+@pytest.mark.skipif(not async_client, reason="Async API Client support disabled")
+@mock.patch("zeep.proxy.AsyncOperationProxy.__call__", new_callable=mock.AsyncMock)
+def test_async_throttles(mock_soap_client):
+    throttle = Throttle(max_in_flight=1)
+    client = async_client.AsyncCorreios(username="sigep", password="XXXXXX", throttles={"sigep": throttle})
+
+    async def consulta_cep(cep):
+        await asyncio.sleep(0)
+        return _zip_address_data(cep)
+
+    mock_soap_client.side_effect = consulta_cep
+
+    async def find_zipcodes():
+        return await asyncio.gather(*(client.find_zipcode(cep) for cep in ("70002900", "70002901", "70002902")))
+
+    assert len(asyncio.run(find_zipcodes())) == 3
+    assert throttle.waits == 2
+
+
+@pytest.mark.skipif(not async_client, reason="Async API Client support disabled")
+@mock.patch("zeep.proxy.AsyncOperationProxy.__call__", new_callable=mock.AsyncMock)
+def test_async_coalesces_requests(mock_soap_client):
+    client = async_client.AsyncCorreios(username="sigep", password="XXXXXX", coalesce_requests=True)
+
+    async def consulta_cep(cep):
+        await asyncio.sleep(0)
+        return _zip_address_data(cep)
+
+    mock_soap_client.side_effect = consulta_cep
+
+    async def find_zipcodes():
+        return await asyncio.gather(*(client.find_zipcode(cep) for cep in ("70002900", "70002900", "70002901")))
+
+    zip_addresses = asyncio.run(find_zipcodes())
+
+    assert [zip_address.zip_code for zip_address in zip_addresses] == ["70002900", "70002900", "70002901"]
+    assert mock_soap_client.await_count == 2
+
+
+@pytest.mark.skipif(not async_client, reason="Async API Client support disabled")
+@vcr.use_cassette("test_calculate_freights")
+def test_async_instrument(async_correios, posting_card, package):
+    collector = HistogramCollector()
+    async_correios.instrument = collector
+
+    async def calculate_freights():
+        async with async_correios:
+            return await async_correios.calculate_freights(
+                posting_card, [SERVICE_SEDEX, SERVICE_PAC], "07192100", "80030001", package
+            )
+
+    asyncio.run(calculate_freights())
+
+    lines = collector.render().splitlines()
+    labels = 'service="freight",operation="CalcPrecoPrazo"'
+    assert "correios_operations_total{{{}}} 1".format(labels) in lines
+    assert 'correios_operation_duration_seconds_count{{{},phase="network"}} 1'.format(labels) in lines
+    assert 'correios_response_size_bytes_bucket{{{},le="256"}} 0'.format(labels) in lines
+
+
+@pytest.mark.skipif(not async_client, reason="Async API Client support disabled")
+def test_async_aclose_closes_transports():
+    shared_http_client = httpx.AsyncClient()
+    client = async_client.AsyncCorreios(username="sigep", password="XXXXXX")
+    shared_client = async_client.AsyncCorreios(username="sigep", password="XXXXXX", http_client=shared_http_client)
+
+    async def use_clients():
+        async with client, shared_client:
+            transports = [client.websro_client.transport, client.freight_client.transport]
+            transports.append(shared_client.websro_client.transport)
+        return transports
+
+    transports = asyncio.run(use_clients())
+
+    assert all(transport.wsdl_client.is_closed for transport in transports)
+    assert transports[0].client.is_closed
+    assert not shared_http_client.is_closed
+    assert client.websro_client.transport is not transports[0]
+
+
+@pytest.mark.skipif(not async_client, reason="Async API Client support disabled")
+def test_async_client_sync_close_is_not_supported(async_correios):
+    with pytest.raises(TypeError):
+        async_correios.close()
+    with pytest.raises(TypeError):
+        with async_correios:
+            pass
+
+
+@pytest.mark.skipif(not async_client, reason="Async API Client support disabled")
+@vcr.use_cassette("test_get_tracking_codes_events")
+def test_async_client_pool_stats(async_correios):
+    assert async_correios.get_pool_stats() == {}
+
+    asyncio.run(async_correios.get_tracking_code_events(["BE058714266BR", "JT365572014BR"]))
+
+    stats = async_correios.get_pool_stats()["webservice.correios.com.br"]
+    assert stats["requests"] == 1
+    assert stats["in_flight"] == 0
+    assert stats["max_in_flight"] == 1
+    assert stats["saturated"] == 0
+
+
+@pytest.mark.skipif(not async_client, reason="Async API Client support disabled")
+def test_async_pool_metrics_saturation():
+    pool_metrics = async_client.AsyncPoolMetrics(httpx.AsyncClient(), max_connections=1)
+    address = "https://webservice.correios.com.br/service/rastro"
+    first = pool_metrics.start(address)
+    second = pool_metrics.start(address)
+    pool_metrics.finish(second)
+
+    stats = pool_metrics.get_stats()["webservice.correios.com.br"]
+    assert stats == {"requests": 2, "in_flight": 1, "max_in_flight": 2, "saturated": 1, "connections": 0}
+    pool_metrics.finish(first)
+    assert pool_metrics.get_stats()["webservice.correios.com.br"]["in_flight"] == 0
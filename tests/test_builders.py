@@ -1,9 +1,12 @@
 import pytest
+from lxml import objectify
 
-from correios.models.builders import ModelBuilder
+from correios.models.builders import ModelBuilder, PostInfoParser, to_objectify_integer
 from correios.models.posting import Package
 from correios.xml_utils import fromstring
 
+from .conftest import PostingCardFactory
+
 
 @pytest.fixture
 def post_info_data():
@@ -75,3 +78,149 @@ def test_build_receipt_when_status_unprocessed(status, model_builder, post_info_
 
     receipt_data = model_builder.build_receipt(post_info)
     assert receipt_data is None
+
+
+POSTAL_OBJECT = """
+  <objeto_postal>
+    <numero_etiqueta>{tracking_code}</numero_etiqueta>
+    <codigo_servico_postagem>04669</codigo_servico_postagem>
+    <peso>2250</peso>
+    <destinatario>
+      <nome_destinatario>Mundo dos Computadores Loja I</nome_destinatario>
+      <celular_destinatario></celular_destinatario>
+      <logradouro_destinatario>Av. Mutirao</logradouro_destinatario>
+      <complemento_destinatario></complemento_destinatario>
+      <numero_end_destinatario>1856</numero_end_destinatario>
+    </destinatario>
+    <nacional>
+      <bairro_destinatario>CENTRO</bairro_destinatario>
+      <cidade_destinatario>SAO PAULO</cidade_destinatario>
+      <uf_destinatario>SP</uf_destinatario>
+      <cep_destinatario>05639030</cep_destinatario>
+      <numero_nota_fiscal>1424</numero_nota_fiscal>
+      <serie_nota_fiscal></serie_nota_fiscal>
+      <valor_nota_fiscal>0,0</valor_nota_fiscal>
+      <descricao_objeto></descricao_objeto>
+      <valor_a_cobrar>0,0</valor_a_cobrar>
+    </nacional>
+    <servico_adicional>
+      <codigo_servico_adicional>25</codigo_servico_adicional>
+      <codigo_servico_adicional>{extra_service}</codigo_servico_adicional>
+      <valor_declarado>{declared_value}</valor_declarado>
+    </servico_adicional>
+    <dimensao_objeto>
+      <tipo_objeto>{package_type}</tipo_objeto>
+      <dimensao_altura>8.0</dimensao_altura>
+      <dimensao_largura>35.0</dimensao_largura>
+      <dimensao_comprimento>20.0</dimensao_comprimento>
+      <dimensao_diametro>10.0</dimensao_diametro>
+    </dimensao_objeto>
+    <data_postagem_sara>20170630</data_postagem_sara>
+    <status_processamento>{status}</status_processamento>
+    <numero_comprovante_postagem>32973055</numero_comprovante_postagem>
+    <valor_cobrado>22.22</valor_cobrado>
+  </objeto_postal>
+"""
+
+
+@pytest.fixture
+def plp_xml():
+    postal_objects = POSTAL_OBJECT.format(
+        tracking_code="SO230262969BR", extra_service="", declared_value="", package_type=2, status=1
+    ) + POSTAL_OBJECT.format(
+        tracking_code="SO230262972BR", extra_service=19, declared_value="150,00", package_type=3, status=0
+    )
+    return """<?xml version="1.0" encoding="ISO-8859-1"?><correioslog>
+      <tipo_arquivo>Postagem</tipo_arquivo>
+      <versao_arquivo>2.3</versao_arquivo>
+      <plp>
+        <id_plp>875057</id_plp>
+        <valor_global>22.22</valor_global>
+        <mcu_unidade_postagem>4140</mcu_unidade_postagem>
+        <nome_unidade_postagem>AC MINISTERIO DA MARINHA</nome_unidade_postagem>
+        <cartao_postagem>0057018901</cartao_postagem>
+      </plp>
+      <remetente>
+        <numero_contrato>9912208555</numero_contrato>
+        <nome_remetente>Vasco da Gama</nome_remetente>
+        <logradouro_remetente>Rua Anita Garibaldi, 100</logradouro_remetente>
+        <numero_remetente>100</numero_remetente>
+        <complemento_remetente></complemento_remetente>
+        <bairro_remetente>Copacabana</bairro_remetente>
+        <cep_remetente>22041080</cep_remetente>
+        <cidade_remetente>Rio de Janeiro</cidade_remetente>
+        <uf_remetente>RJ</uf_remetente>
+        <telefone_remetente></telefone_remetente>
+        <email_remetente></email_remetente>
+      </remetente>
+      {}
+    </correioslog>""".format(postal_objects).encode("iso-8859-1")
+
+
+@pytest.fixture
+def plp_user():
+    return PostingCardFactory(number="0057018901", contract__number=9912208555).contract.user
+
+
+def _shipping_label_data(shipping_label):
+    receiver, package = shipping_label.receiver, shipping_label.package
+    return (
+        shipping_label.tracking_code.code,
+        shipping_label.service,
+        shipping_label.sender.name,
+        shipping_label.sender.zip_code,
+        (receiver.name, receiver.street, receiver.number, receiver.zip_code, receiver.city, receiver.state.code),
+        (package.package_type, package.weight, package.width, package.height, package.length, package.diameter),
+        sorted(extra_service.code for extra_service in shipping_label.extra_services),
+        shipping_label.value,
+        shipping_label.billing,
+        shipping_label.invoice_number,
+        shipping_label.invoice_series,
+        shipping_label.receipt and shipping_label.receipt.number,
+    )
+
+
+def test_post_info_parser_reads_header(plp_xml):
+    parser = PostInfoParser(plp_xml)
+
+    assert parser.contract_number == "9912208555"
+    assert parser.posting_card_number == "0057018901"
+    assert parser.plp["id_plp"] == "875057"
+    assert parser.sender["nome_remetente"] == "Vasco da Gama"
+
+
+def test_post_info_parser_frees_parsed_postal_objects(plp_xml):
+    parser = PostInfoParser(plp_xml)
+    postal_objects = list(parser.iter_postal_objects())
+
+    assert len(postal_objects) == 2
+    assert all(len(postal_object) == 0 for postal_object in postal_objects)
+    assert postal_objects[-1].getprevious() is None
+
+
+@pytest.mark.parametrize("text", ["1424", "0123", " 12 ", "-3", "", "A1", "1_000"])
+def test_to_objectify_integer(text):
+    expected = objectify.fromstring("<r><n>{}</n></r>".format(text)).n.pyval
+    value = to_objectify_integer(text)
+    assert value == expected
+    assert type(value) is type(expected)
+
+
+def test_build_post_info_from_parser(model_builder, plp_xml, plp_user):
+    post_info = model_builder.build_post_info(PostInfoParser(plp_xml), plp_user)
+    expected_post_info = model_builder.build_post_info(fromstring(plp_xml), plp_user)
+
+    assert post_info.value == expected_post_info.value
+    assert post_info.postal_unit.code == "4140"
+    assert post_info.postal_unit.description == expected_post_info.postal_unit.description
+    assert post_info.posting_list.number == expected_post_info.posting_list.number == 875057
+
+    shipping_labels = list(post_info.posting_list.shipping_labels.values())
+    expected_shipping_labels = list(expected_post_info.posting_list.shipping_labels.values())
+    assert [_shipping_label_data(s) for s in shipping_labels] == [
+        _shipping_label_data(s) for s in expected_shipping_labels
+    ]
+    assert type(shipping_labels[0].invoice_number) is int
+    assert shipping_labels[0].sender is shipping_labels[1].sender
+    assert shipping_labels[1].value == 150
+    assert shipping_labels[1].receipt is None
@@ -0,0 +1,152 @@
+# Copyright 2016 Osvaldo Santana Neto
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from decimal import Decimal
+from unittest import mock
+
+import pytest
+
+from correios.cache import DiskCache, FreightQuoteNormalizer, MemoryCache, TieredCache
+from correios.models.posting import Package
+
+
+@pytest.fixture(params=["memory", "disk", "tiered"])
+def cache(request, tmp_path):
+    if request.param == "memory":
+        return MemoryCache()
+    if request.param == "tiered":
+        return TieredCache(MemoryCache(), DiskCache(tmp_path / "cache.sqlite3"))
+    return DiskCache(tmp_path / "cache.sqlite3")
+
+
+def test_cache(cache):
+    key = ("CalcPrecoPrazo", "07192100", Decimal("10.00"))
+    assert cache.get(key) is None
+    assert cache.get(key, "default") == "default"
+
+    cache.set(key, ["value"])
+    assert cache.get(key) == ["value"]
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_cache_expiration(cache):
+    cache.set("expired", "value", ttl=0)
+    cache.set("valid", "value", ttl=60)
+    assert cache.get("expired") is None
+    assert cache.get("valid") == "value"
+
+
+def test_cache_default_ttl(cache):
+    cache.ttl = 0
+    cache.set("key", "value")
+    assert cache.get("key") is None
+
+
+def test_cache_invalidation(cache):
+    cache.set("key1", "value1")
+    cache.set("key2", "value2")
+
+    cache.delete("key1")
+    assert cache.get("key1") is None
+    assert cache.get("key2") == "value2"
+
+    cache.clear()
+    assert cache.get("key2") is None
+
+
+def test_memory_cache_evicts_least_recently_used():
+    cache = MemoryCache(maxsize=2)
+    cache.set("key1", "value1")
+    cache.set("key2", "value2")
+    cache.get("key1")
+    cache.set("key3", "value3")
+
+    assert len(cache) == 2
+    assert cache.get("key1") == "value1"
+    assert cache.get("key2") is None
+
+
+def test_disk_cache_persistence(tmp_path):
+    cache = DiskCache(tmp_path / "cache.sqlite3")
+    cache.set("key", {"value": Decimal("1.00")})
+    cache.close()
+
+    cache = DiskCache(tmp_path / "cache.sqlite3")
+    assert cache.get("key") == {"value": Decimal("1.00")}
+
+
+def test_cache_set_many(cache):
+    cache.set_many((("key{}".format(i), i) for i in range(3)), ttl=60)
+    assert [cache.get("key{}".format(i)) for i in range(3)] == [0, 1, 2]
+
+
+def test_tiered_cache_promotes_values_to_faster_caches(tmp_path):
+    memory_cache = MemoryCache()
+    disk_cache = DiskCache(tmp_path / "cache.sqlite3")
+    disk_cache.set("key", "value")
+    cache = TieredCache(memory_cache, disk_cache)
+
+    assert cache.get("key") == "value"
+    assert memory_cache.get("key") == "value"
+
+    cache.delete("key")
+    assert memory_cache.get("key") is None
+    assert disk_cache.get("key") is None
+
+
+def test_tiered_cache_promoted_values_keep_their_remaining_ttl(tmp_path):
+    memory_cache = MemoryCache(ttl=3600)
+    disk_cache = DiskCache(tmp_path / "cache.sqlite3")
+    cache = TieredCache(memory_cache, disk_cache)
+    with mock.patch("time.time", return_value=1000.0):
+        disk_cache.set("key", "value", ttl=10)
+
+    with mock.patch("time.time", return_value=1005.0), mock.patch("time.monotonic", return_value=50.0):
+        assert cache.get("key") == "value"
+
+    with mock.patch("time.monotonic", return_value=54.0):
+        assert memory_cache.get("key") == "value"
+
+    with mock.patch("time.time", return_value=1011.0), mock.patch("time.monotonic", return_value=56.0):
+        assert memory_cache.get("key") is None
+        assert cache.get("key") is None
+
+
+@pytest.mark.parametrize(
+    "weight,bracket", [(1, 300), (300, 300), (301, 1000), (2500, 3000), (30000, 30000), (31000, 31000)]
+)
+def test_freight_quote_normalizer_weight_brackets(weight, bracket):
+    assert FreightQuoteNormalizer().get_weight_bracket(weight) == bracket
+
+
+def test_freight_quote_normalizer_package_key():
+    normalizer = FreightQuoteNormalizer()
+    package1 = Package(package_type=Package.TYPE_BOX, width=11, height=2, length=16, weight=350)
+    package2 = Package(package_type=Package.TYPE_BOX, width=20, height=10, length=30, weight=900)
+    package3 = Package(package_type=Package.TYPE_BOX, width=20, height=10, length=30, weight=1100)
+    assert normalizer.get_package_key(package1) == normalizer.get_package_key(package2)
+    assert normalizer.get_package_key(package1) != normalizer.get_package_key(package3)
+
+
+def test_freight_quote_normalizer_keeps_non_mechanizable_package_dimensions():
+    normalizer = FreightQuoteNormalizer()
+    package1 = Package(package_type=Package.TYPE_BOX, width=11, height=2, length=80, weight=350)
+    package2 = Package(package_type=Package.TYPE_BOX, width=11, height=2, length=90, weight=350)
+    assert normalizer.get_package_key(package1) != normalizer.get_package_key(package2)
+
+
+def test_freight_quote_normalizer_zip_code_key():
+    normalizer = FreightQuoteNormalizer(zip_code_digits=3)
+    assert normalizer.get_zip_code_key("80030001") == normalizer.get_zip_code_key("80099999") == "800"
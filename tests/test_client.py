@@ -13,23 +13,36 @@
 # limitations under the License.
 
 
+import io
+import os
+import sys
+import threading
 from decimal import Decimal
+from types import SimpleNamespace
 from unittest import mock
 
 import pytest
-from requests.exceptions import ConnectTimeout
-from zeep.exceptions import Fault
+from lxml.etree import DocumentInvalid
+from requests.exceptions import ConnectTimeout, ReadTimeout
+from zeep.exceptions import Fault, TransportError
 
+from correios.cache import DiskCache, FreightQuoteNormalizer, MemoryCache, TieredCache
 from correios.exceptions import (
     AuthenticationError,
     CanceledPostingCardError,
+    CircuitBreakerOpenError,
     ClientError,
     ClosePostingListError,
     ConnectTimeoutError,
+    InvalidTrackingCodeError,
+    InvalidZipCodeError,
     NonexistentPostingCardError,
     PostingListSerializerError,
     TrackingCodesLimitExceededError,
+    VerificationDigitMismatchError,
+    ZipCodeNotFoundError,
 )
+from correios.instrumentation import Instrument
 from correios.models.address import ZipCode
 from correios.models.builders import ModelBuilder
 from correios.models.data import (
@@ -46,15 +59,21 @@ from correios.models.data import (
     SERVICE_SEDEX10,
 )
 from correios.models.posting import (
+    FreightRequest,
     FreightResponse,
     NotFoundTrackingEvent,
+    Package,
     PostalUnit,
     PostInfo,
     PostingList,
     TrackingCode,
+    TrackingCodeRange,
 )
 from correios.models.user import ExtraService, PostingCard, Service
-from correios.serializers import PostingListSerializer
+from correios.retry import RetryPolicy
+from correios.serializers import PostingListSerializer, clear_schema_cache, get_schema
+from correios.soap import PoolMetricsAdapter, SoapClient, WSDLCache, create_session
+from correios.throttle import Throttle
 from correios.utils import get_resource_path, to_decimal
 from correios.xml_utils import fromstring
 
@@ -156,6 +175,18 @@ def test_request_tracking_codes(client, user):
     assert len(result[0].code) == 13
 
 
+@pytest.mark.skipif(not correios, reason="API Client support disabled")
+def test_request_tracking_codes_returns_list(client, user):
+    with mock.patch.object(client, "_auth_call", return_value="DL74668650 BR,DL74668654 BR"):
+        tracking_codes = client.request_tracking_codes(user, Service.get(SERVICE_SEDEX), quantity=5)
+        code_range = client.request_tracking_code_range(user, Service.get(SERVICE_SEDEX), quantity=5)
+
+    assert isinstance(tracking_codes, list)
+    assert [tc.code for tc in tracking_codes] == [tc.code for tc in code_range]
+    assert isinstance(code_range, TrackingCodeRange)
+    assert len(code_range) == 5
+
+
 @pytest.mark.skipif(not correios, reason="API Client support disabled")
 @vcr.use_cassette
 def test_generate_verification_digit(client):
@@ -163,6 +194,44 @@ def test_generate_verification_digit(client):
     assert result[0] == 6
 
 
+@pytest.mark.skipif(not correios, reason="API Client support disabled")
+@mock.patch("zeep.proxy.OperationProxy.__call__")
+def test_generate_local_verification_digit(mock_soap_client, client):
+    result = client.generate_verification_digit(["DL74668653 BR", TrackingCode("DL02000000 BR")], local=True)
+    assert result == [6, 0]
+    mock_soap_client.assert_not_called()
+
+
+@pytest.mark.skipif(not correios, reason="API Client support disabled")
+@pytest.mark.parametrize(
+    "tracking_code", ["DL7466865 BR", "DL7466865X BR", "D174668653 BR", "DL74668653 B1", "DL746686531BR"]
+)
+def test_fail_generate_local_verification_digit_with_invalid_tracking_code(client, tracking_code):
+    with pytest.raises(InvalidTrackingCodeError):
+        client.generate_verification_digit(["DL74668653 BR", tracking_code], local=True)
+
+
+@pytest.mark.skipif(not correios, reason="API Client support disabled")
+def test_generate_local_verification_digit_with_cross_check(client):
+    def remote_digits(method_name, tracking_codes):
+        return [{"DL74668653 BR": 6, "DL02000000 BR": 0}[tc] for tc in tracking_codes]
+
+    client.local_verification_digit = True
+    with mock.patch.object(client, "_auth_call", side_effect=remote_digits) as mock_auth_call:
+        assert client.generate_verification_digit(["DL74668653 BR", "DL02000000 BR"], cross_check=1) == [6, 0]
+
+    method_name, sample = mock_auth_call.call_args[0]
+    assert method_name == "geraDigitoVerificadorEtiquetas"
+    assert len(sample) == 1
+
+
+@pytest.mark.skipif(not correios, reason="API Client support disabled")
+def test_fail_generate_local_verification_digit_cross_check_mismatch(client):
+    with mock.patch.object(client, "_auth_call", return_value=[1]):
+        with pytest.raises(VerificationDigitMismatchError):
+            client.generate_verification_digit(["DL74668653 BR"], local=True, cross_check=1)
+
+
 @vcr.use_cassette
 def test_get_post_info(client):
     result = client._auth_call("solicitaXmlPlp", 875057)
@@ -352,6 +421,73 @@ def test_get_tracking_code_object_not_found_by_correios(client):
     assert event.status.status == 0
 
 
+def _tracking_code_data(tracking_code):
+    # zeep returns None for elements missing from the response
+    events = [
+        (e.status.type, e.status.status, e.location_zip_code, e.location, e.city, e.description, e.details or "")
+        for e in tracking_code.events
+    ]
+    return tracking_code.code, tracking_code.name, tracking_code.initials, tracking_code.category, events
+
+
+@pytest.mark.skipif(not correios, reason="API Client support disabled")
+@pytest.mark.parametrize(
+    "cassette,tracking_list",
+    (
+        ("test_get_tracking_codes_events", ["BE058714266BR", "JT365572014BR"]),
+        ("test_get_tracking_code_events_without_city_field", "FJ064849483BR"),
+        ("test_get_tracking_code_object_not_found_by_correios", "DU05508759BR"),
+    ),
+)
+def test_get_tracking_code_events_fast_path(client, cassette, tracking_list):
+    with vcr.use_cassette(cassette):
+        expected = client.get_tracking_code_events(tracking_list)
+
+    client.fast_tracking = True
+    with vcr.use_cassette(cassette):
+        result = client.get_tracking_code_events(tracking_list)
+
+    assert [_tracking_code_data(tc) for tc in result] == [_tracking_code_data(tc) for tc in expected]
+
+
+@pytest.mark.skipif(not correios, reason="API Client support disabled")
+def test_get_tracking_code_events_fast_path_request(client):
+    client.fast_tracking = True
+    response = mock.Mock(status_code=200, content=b"<Envelope/>")
+    with mock.patch("requests.Session.post", return_value=response) as mock_post:
+        with pytest.raises(TransportError):
+            client.get_tracking_code_events(["BE058714266BR", "JT365572014BR"])
+
+    url = mock_post.call_args[0][0]
+    body = mock_post.call_args[1]["data"]
+    assert url == client.websro_address
+    assert mock_post.call_args[1]["headers"]["SOAPAction"] == '"buscaEventosLista"'
+    assert b"<usuario>sigep</usuario><senha>XXXXXX</senha>" in body
+    assert b"<objetos>BE058714266BR</objetos><objetos>JT365572014BR</objetos>" in body
+
+
+@pytest.mark.skipif(not correios, reason="API Client support disabled")
+@pytest.mark.parametrize("fast_tracking", (False, True))
+def test_get_tracking_code_events_timeout(client, fast_tracking):
+    client.fast_tracking = fast_tracking
+    with mock.patch("requests.Session.post", side_effect=ReadTimeout()):
+        with pytest.raises(ConnectTimeoutError):
+            client.get_tracking_code_events("BE058714266BR")
+
+
+@pytest.mark.skipif(not correios, reason="API Client support disabled")
+def test_get_tracking_code_events_fast_path_fault(client):
+    client.fast_tracking = True
+    content = (
+        b'<soapenv:Envelope xmlns:soapenv="http://schemas.xmlsoap.org/soap/envelope/"><soapenv:Body>'
+        b"<soapenv:Fault><faultcode>soapenv:Server</faultcode><faultstring>Usuario invalido</faultstring>"
+        b"</soapenv:Fault></soapenv:Body></soapenv:Envelope>"
+    )
+    with mock.patch("requests.Session.post", return_value=mock.Mock(status_code=500, content=content)):
+        with pytest.raises(Fault, match="Usuario invalido"):
+            client.get_tracking_code_events("BE058714266BR")
+
+
 @pytest.mark.skipif(not correios, reason="API Client support disabled")
 def test_get_tracking_codes_events_over_limit(client):
     codes = ["DU05508759BR"] * 51
@@ -359,6 +495,24 @@ def test_get_tracking_codes_events_over_limit(client):
         client.get_tracking_code_events(codes)
 
 
+@pytest.mark.skipif(not correios, reason="API Client support disabled")
+def test_iter_tracking_code_events(client):
+    codes = ["PD{:08}BR".format(i) for i in range(120)]
+    with mock.patch.object(client, "get_tracking_code_events", side_effect=list) as mock_get_events:
+        result = list(client.iter_tracking_code_events(codes + codes[:10], max_workers=2))
+
+    assert sorted(tc.short for tc in result) == sorted(codes)
+    assert sorted(len(call[0][0]) for call in mock_get_events.call_args_list) == [20, 50, 50]
+
+
+@pytest.mark.skipif(not correios, reason="API Client support disabled")
+def test_iter_tracking_code_events_error(client):
+    codes = ["PD{:08}BR".format(i) for i in range(120)]
+    with mock.patch.object(client, "get_tracking_code_events", side_effect=ConnectTimeoutError("timeout")):
+        with pytest.raises(ConnectTimeoutError):
+            list(client.iter_tracking_code_events(codes))
+
+
 @pytest.mark.skipif(not correios, reason="API Client support disabled")
 def test_builder_posting_card_status():
     builder = ModelBuilder()
@@ -502,6 +656,178 @@ def test_calculate_freights(client, posting_card, package):
     assert freight.home is True
 
 
+def _fake_freights(posting_card, services, *args):
+    return [FreightResponse(service=s, delivery_time=1, value=Service.get(s).code) for s in services]
+
+
+@pytest.mark.skipif(not correios, reason="API Client support disabled")
+def test_calculate_freights_bulk(client, posting_card, package):
+    requests = [
+        FreightRequest(posting_card, [SERVICE_SEDEX], "07192100", "80030001", package),
+        FreightRequest(posting_card, [SERVICE_PAC, SERVICE_SEDEX], "07192100", "80030001", package),
+        FreightRequest(posting_card, [SERVICE_SEDEX], "07192100", "80030001", package),
+        FreightRequest(posting_card, [SERVICE_PAC], "07192100", "01310000", package),
+    ]
+    with mock.patch.object(client, "calculate_freights", side_effect=_fake_freights) as mock_calculate_freights:
+        results = dict(client.calculate_freights_bulk(requests, max_workers=2))
+
+    assert mock_calculate_freights.call_count == 2
+    assert sorted(len(call[0][1]) for call in mock_calculate_freights.call_args_list) == [1, 2]
+    assert len(results) == 4
+    for request in requests:
+        assert [f.service for f in results[request]] == request.services
+
+
+@pytest.mark.skipif(not correios, reason="API Client support disabled")
+def test_calculate_freights_bulk_error(client, posting_card, package):
+    requests = [FreightRequest(posting_card, [SERVICE_SEDEX], "07192100", "80030001", package)]
+    with mock.patch.object(client, "calculate_freights", side_effect=ConnectTimeoutError("timeout")):
+        with pytest.raises(ConnectTimeoutError):
+            list(client.calculate_freights_bulk(requests))
+
+
+@pytest.mark.skipif(not correios, reason="API Client support disabled")
+def test_get_user_with_cache(client, user):
+    client.user_cache = MemoryCache()
+
+    with mock.patch.object(client, "_auth_call") as mock_auth_call:
+        with mock.patch.object(client.model_builder, "build_user", return_value=user) as mock_build_user:
+            assert client.get_user(9911222777, "0056789123") is user
+            assert client.get_user("9911222777", 56789123) is not None
+            assert client.get_user("9911222777", "0056789123") is user
+            assert mock_auth_call.call_count == 2
+            assert mock_build_user.call_count == 2
+
+            client.invalidate_user("9911222777", "0056789123")
+            client.get_user("9911222777", "0056789123")
+            assert mock_auth_call.call_count == 3
+
+    mock_auth_call.assert_called_with("buscaCliente", "9911222777", "0056789123")
+
+
+def _zip_address_data(cep):
+    return SimpleNamespace(cep=cep, uf="DF", cidade="Brasília", bairro="Asa Norte", end="SBN Quadra 1", complemento2="")
+
+
+@pytest.mark.skipif(not correios, reason="API Client support disabled")
+def test_find_zipcode_with_cache(client, tmp_path):
+    client.zip_code_cache = TieredCache(MemoryCache(), DiskCache(tmp_path / "zip-codes.sqlite3"))
+
+    with mock.patch.object(client, "_call", return_value=_zip_address_data("70002900")) as mock_call:
+        zip_address = client.find_zipcode("70002-900")
+        cached_zip_address = client.find_zipcode(ZipCode("70002900"))
+
+    mock_call.assert_called_once_with("consultaCEP", "70002900")
+    assert cached_zip_address.zip_code == zip_address.zip_code
+    assert cached_zip_address.city == "Brasília"
+
+
+@pytest.mark.skipif(not correios, reason="API Client support disabled")
+def test_find_zipcode_with_cache_caches_not_found_zip_codes(client):
+    client.zip_code_cache = MemoryCache()
+
+    with mock.patch("zeep.proxy.OperationProxy.__call__", side_effect=Fault("CEP NAO ENCONTRADO")) as mock_soap_client:
+        for _ in range(2):
+            with pytest.raises(ZipCodeNotFoundError):
+                client.find_zipcode("99999999")
+
+    assert mock_soap_client.call_count == 1
+
+    client.zip_code_negative_ttl = None
+    client.zip_code_cache.clear()
+    with mock.patch.object(client, "_call", side_effect=ZipCodeNotFoundError("CEP NAO ENCONTRADO")):
+        with pytest.raises(ZipCodeNotFoundError):
+            client.find_zipcode("99999999")
+    assert len(client.zip_code_cache) == 0
+
+
+@pytest.mark.skipif(not correios, reason="API Client support disabled")
+def test_find_invalid_zipcode_does_not_call_service(client):
+    with mock.patch("zeep.proxy.OperationProxy.__call__") as mock_soap_client:
+        with pytest.raises(InvalidZipCodeError):
+            client.find_zipcode("123")
+        mock_soap_client.assert_not_called()
+
+
+def _post_info_call(method_name, number):
+    if number == 3:
+        raise ClientError("PLP inexistente")
+    return number
+
+
+@pytest.mark.skipif(not correios, reason="API Client support disabled")
+def test_get_post_infos(client, user):
+    posting_cards = {1: "0056789123", 2: "0056789123", 3: "0056789123", 4: "0057018901"}
+
+    parse_post_info = mock.patch.object(
+        client, "_parse_post_info", side_effect=lambda number: (number, "9911222777", posting_cards[number])
+    )
+    build_post_info = mock.patch.object(
+        client.model_builder, "build_post_info", side_effect=lambda data, user: (data, user)
+    )
+    with mock.patch.object(client, "_auth_call", side_effect=_post_info_call) as mock_auth_call, parse_post_info:
+        with mock.patch.object(client, "get_user", return_value=user) as mock_get_user, build_post_info:
+            results = dict(client.get_post_infos([1, 2, 3, 4, 1], max_workers=2))
+
+    assert mock_auth_call.call_count == 4
+    assert sorted(mock_get_user.call_args_list) == [
+        mock.call("9911222777", "0056789123"),
+        mock.call("9911222777", "0057018901"),
+    ]
+    assert results[1] == (1, user)
+    assert results[4] == (4, user)
+    assert isinstance(results[3], ClientError)
+
+
+@pytest.mark.skipif(not correios, reason="API Client support disabled")
+@pytest.mark.parametrize("cache_class", ["MemoryCache", "DiskCache"])
+def test_calculate_freights_with_cache(cache_class, client, posting_card, package, tmp_path):
+    client.freight_cache = MemoryCache() if cache_class == "MemoryCache" else DiskCache(tmp_path / "cache.sqlite3")
+    arguments = (posting_card, [SERVICE_SEDEX, SERVICE_PAC], "07192100", "80030001", package)
+
+    with vcr.use_cassette("test_calculate_freights"):
+        freights = client.calculate_freights(*arguments)
+
+    with mock.patch("zeep.proxy.OperationProxy.__call__") as mock_soap_client:
+        cached_freights = client.calculate_freights(*arguments, value=Decimal("0.00"))
+        mock_soap_client.assert_not_called()
+
+    assert [(f.service, f.total) for f in cached_freights] == [(f.service, f.total) for f in freights]
+    assert (client.freight_cache.hits, client.freight_cache.misses) == (1, 1)
+
+    client.invalidate_freights(*arguments)
+    cache_key = client._get_freight_cache_key(client._get_freight_arguments(*arguments), package)
+    assert client.freight_cache.get(cache_key) is None
+
+
+@pytest.mark.skipif(not correios, reason="API Client support disabled")
+def test_calculate_freights_with_normalized_cache_key(client, posting_card):
+    client.freight_cache = MemoryCache()
+    client.freight_quote_normalizer = FreightQuoteNormalizer()
+    services = [SERVICE_SEDEX, SERVICE_PAC]
+
+    package = Package(package_type=Package.TYPE_BOX, width=11, height=2, length=16, weight=350)
+    with vcr.use_cassette("test_calculate_freights"):
+        freights = client.calculate_freights(posting_card, services, "07192100", "80030001", package)
+
+    package = Package(package_type=Package.TYPE_BOX, width=20, height=10, length=30, weight=900)
+    with mock.patch("zeep.proxy.OperationProxy.__call__") as mock_soap_client:
+        cached_freights = client.calculate_freights(posting_card, services, "07192100", "80030999", package)
+        mock_soap_client.assert_not_called()
+
+    assert [f.total for f in cached_freights] == [f.total for f in freights]
+
+
+@pytest.mark.skipif(not correios, reason="API Client support disabled")
+@vcr.use_cassette("test_calculate_freight_with_error")
+def test_calculate_freights_with_cache_ignores_errors(client, posting_card, package):
+    client.freight_cache = MemoryCache()
+    package.real_weight = 80000  # invalid weight (80kg)
+    freights = client.calculate_freights(posting_card, [SERVICE_SEDEX], "99999000", "99999999", package)
+    assert freights[0].error_code
+    assert len(client.freight_cache) == 0
+
+
 @pytest.mark.skipif(not correios, reason="API Client support disabled")
 @vcr.use_cassette
 def test_calculate_freights_with_extra_services(client, posting_card, package):
@@ -622,3 +948,427 @@ def test_calculate_freight_with_error_code_9_restricted(client, posting_card, pa
     assert freight.value != 0
     assert freight.delivery_time.days == 8
     assert freight.saturday
+
+
+@pytest.mark.skipif(not correios, reason="API Client support disabled")
+def test_posting_list_serializer_schema_cache(posting_list, shipping_label):
+    clear_schema_cache()
+    posting_list.add_shipping_label(shipping_label)
+
+    first_serializer = PostingListSerializer()
+    second_serializer = PostingListSerializer()
+
+    assert first_serializer.serialize(posting_list) == second_serializer.serialize(posting_list)
+    assert get_schema(first_serializer.xsd_path) is get_schema(second_serializer.xsd_path)
+
+
+@pytest.mark.skipif(not correios, reason="API Client support disabled")
+def test_posting_list_serializer_schema_cache_reloads_modified_file(tmp_path):
+    clear_schema_cache()
+    xsd_path = tmp_path / "schema.xsd"
+    xsd_path.write_text(get_resource_path("posting_list_schema.xsd").read_text())
+
+    schema = get_schema(str(xsd_path))
+    assert get_schema(str(xsd_path)) is schema
+
+    stat = xsd_path.stat()
+    os.utime(str(xsd_path), (stat.st_atime, stat.st_mtime + 10))
+    assert get_schema(str(xsd_path)) is not schema
+
+
+@pytest.mark.skipif(not correios, reason="API Client support disabled")
+def test_posting_list_streaming_serialization(posting_list, shipping_label_factory, posting_card):
+    for _ in range(3):
+        posting_list.add_shipping_label(shipping_label_factory(posting_card=posting_card))
+    shipping_label = list(posting_list.shipping_labels.values())[0]
+    shipping_label.receiver.neighborhood = "Olho D’Água"
+
+    serializer = PostingListSerializer()
+    output = io.BytesIO()
+    serializer.serialize_to(posting_list, output)
+
+    chunks = list(serializer.iter_serialize(posting_list))
+    assert len(chunks) == len(posting_list.shipping_labels) + 2
+    assert output.getvalue() == b"".join(chunks) == serializer.serialize(posting_list)
+
+
+@pytest.mark.skipif(not correios, reason="API Client support disabled")
+def test_posting_list_streaming_serialization_validates_labels(posting_list, shipping_label):
+    shipping_label.package.real_weight = 40000
+    posting_list.add_shipping_label(shipping_label)
+
+    serializer = PostingListSerializer()
+    with pytest.raises(DocumentInvalid):
+        serializer.serialize_to(posting_list, io.BytesIO())
+
+    serializer.serialize_to(posting_list, io.BytesIO(), validate=False)
+
+
+@pytest.mark.skipif(not correios, reason="API Client support disabled")
+def test_fail_empty_posting_list_streaming_serialization(posting_list):
+    serializer = PostingListSerializer()
+    with pytest.raises(PostingListSerializerError):
+        serializer.serialize_to(posting_list, io.BytesIO())
+
+
+@pytest.mark.skipif(not correios, reason="API Client support disabled")
+def test_client_builds_soap_clients_on_first_use():
+    client = correios.Correios(username="sigep", password="XXXXXX", environment=correios.Correios.TEST)
+    assert client._soap_clients == {}
+
+    assert client.websro_client is client.websro_client
+    assert list(client._soap_clients) == ["websro"]
+
+
+@pytest.mark.skipif(not correios, reason="API Client support disabled")
+@pytest.mark.skipif(sys.version_info < (3, 8), reason="WSDL cache requires Python 3.8+")
+@pytest.mark.parametrize("run", (1, 2))
+def test_client_with_wsdl_cache(run, posting_card, package, tmp_path):
+    cache_path = tmp_path / "wsdl-cache"
+    for _ in range(run):
+        client = correios.Correios(
+            username="sigep", password="XXXXXX", environment=correios.Correios.TEST, wsdl_cache_path=cache_path
+        )
+        with vcr.use_cassette("test_calculate_freights"):
+            freights = client.calculate_freights(
+                posting_card, [SERVICE_SEDEX, SERVICE_PAC], "07192100", "80030001", package
+            )
+
+    assert [f.service for f in freights] == [Service.get(SERVICE_SEDEX), Service.get(SERVICE_PAC)]
+    assert freights[0].total == Decimal("23.75")
+    assert len(list(cache_path.glob("CalcPrecoPrazo.asmx-*.pickle"))) == 1
+
+
+@pytest.mark.skipif(not correios, reason="API Client support disabled")
+@pytest.mark.skipif(sys.version_info < (3, 8), reason="WSDL cache requires Python 3.8+")
+def test_wsdl_cache_saves_parsed_documents(tmp_path):
+    wsdl_cache = WSDLCache(tmp_path)
+    wsdl = str(get_resource_path("wsdls/Rastro.wsdl"))
+    SoapClient(wsdl, wsdl_cache=wsdl_cache)
+    assert wsdl_cache.get_cache_file(wsdl).is_file()
+
+    with mock.patch("correios.soap.Document", side_effect=AssertionError("WSDL parsed again")):
+        soap_client = SoapClient(wsdl, wsdl_cache=wsdl_cache)
+    assert soap_client.service.buscaEventosLista
+
+
+@pytest.mark.skipif(not correios, reason="API Client support disabled")
+def test_wsdl_cache_is_disabled_without_reducer_override(tmp_path):
+    with mock.patch("correios.soap.WSDL_CACHE_SUPPORTED", False):
+        wsdl_cache = WSDLCache(tmp_path / "wsdl-cache")
+        with mock.patch("correios.soap._WSDLPickler") as mock_pickler:
+            soap_client = SoapClient(str(get_resource_path("wsdls/Rastro.wsdl")), wsdl_cache=wsdl_cache)
+
+    assert soap_client.service.buscaEventosLista
+    mock_pickler.assert_not_called()
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.skipif(not correios, reason="API Client support disabled")
+@pytest.mark.skipif(sys.version_info < (3, 8), reason="WSDL cache requires Python 3.8+")
+def test_wsdl_cache_ignores_invalid_cache_file(tmp_path):
+    wsdl_cache = WSDLCache(tmp_path)
+    wsdl = str(get_resource_path("wsdls/Rastro.wsdl"))
+    cache_file = wsdl_cache.get_cache_file(wsdl)
+    cache_file.write_bytes(b"invalid")
+
+    soap_client = SoapClient(wsdl, wsdl_cache=wsdl_cache)
+    assert soap_client.service.buscaEventosLista
+    assert cache_file.read_bytes() != b"invalid"
+
+
+@pytest.mark.skipif(not correios, reason="API Client support disabled")
+@pytest.mark.skipif(sys.version_info < (3, 8), reason="WSDL cache requires Python 3.8+")
+def test_wsdl_cache_file_changes_with_wsdl_contents(tmp_path):
+    wsdl_cache = WSDLCache(tmp_path)
+    wsdl = tmp_path / "service.wsdl"
+    wsdl.write_text(get_resource_path("wsdls/Rastro.wsdl").read_text())
+    cache_file = wsdl_cache.get_cache_file(str(wsdl))
+
+    wsdl.write_text(wsdl.read_text() + "\n")
+    assert wsdl_cache.get_cache_file(str(wsdl)) != cache_file
+    assert wsdl_cache.get_cache_file("http://example.com/service.wsdl") is None
+
+
+@pytest.mark.skipif(not correios, reason="API Client support disabled")
+@pytest.mark.skipif(sys.version_info < (3, 8), reason="WSDL cache requires Python 3.8+")
+def test_wsdl_cache_file_changes_with_imported_schemas(tmp_path):
+    wsdl_cache = WSDLCache(tmp_path)
+    wsdl = tmp_path / "Rastro.wsdl"
+    schema = tmp_path / "Rastro_schema1.xsd"
+    wsdl.write_text(get_resource_path("wsdls/Rastro.wsdl").read_text())
+    schema.write_text(get_resource_path("wsdls/Rastro_schema1.xsd").read_text())
+    cache_file = wsdl_cache.get_cache_file(str(wsdl))
+
+    schema.write_text(schema.read_text() + "\n")
+    assert wsdl_cache.get_cache_file(str(wsdl)) != cache_file
+
+
+@pytest.mark.skipif(not correios, reason="API Client support disabled")
+def test_wsdl_cache_ignores_unwritable_cache_path(tmp_path):
+    cache_path = tmp_path / "file"
+    cache_path.write_text("not a directory")
+    wsdl_cache = WSDLCache(cache_path / "wsdl-cache")
+    wsdl = str(get_resource_path("wsdls/Rastro.wsdl"))
+
+    soap_client = SoapClient(wsdl, wsdl_cache=wsdl_cache)
+    assert soap_client.service.buscaEventosLista
+    assert list(tmp_path.iterdir()) == [cache_path]
+
+
+@pytest.mark.skipif(not correios, reason="API Client support disabled")
+def test_client_shares_sessions_between_services():
+    client = correios.Correios(username="sigep", password="XXXXXX", environment=correios.Correios.TEST)
+    session = client.websro_client.transport.session
+
+    assert client.freight_client.transport.session is session
+    assert client.sigep_client.transport.session is not session  # SSL verification is disabled in tests
+    assert session.get_adapter("https://webservice.correios.com.br/")._pool_maxsize == client.pool_maxsize
+
+
+@pytest.mark.skipif(not correios, reason="API Client support disabled")
+def test_clients_with_shared_session():
+    session = create_session(pool_maxsize=50)
+    clients = [correios.Correios(username="sigep", password="XXXXXX", session=session) for _ in range(2)]
+
+    assert all(c.websro_client.transport.session is session for c in clients)
+    assert clients[0]._sessions == {}
+
+
+@pytest.mark.skipif(not correios, reason="API Client support disabled")
+@vcr.use_cassette("test_get_tracking_code_events")
+def test_client_pool_stats(client):
+    assert client.get_pool_stats() == {}
+
+    client.get_tracking_code_events("BE058714266BR")
+
+    stats = client.get_pool_stats()["webservice.correios.com.br"]
+    assert stats["requests"] == 1
+    assert stats["in_flight"] == 0
+    assert stats["max_in_flight"] == 1
+    assert stats["saturated"] == 0
+
+
+@pytest.mark.skipif(not correios, reason="API Client support disabled")
+def test_pool_metrics_adapter_saturation():
+    adapter = PoolMetricsAdapter(pool_maxsize=1)
+    request = SimpleNamespace(url="https://webservice.correios.com.br/service/rastro")
+    release = threading.Event()
+
+    with mock.patch("requests.adapters.HTTPAdapter.send", side_effect=lambda *args, **kwargs: release.wait()):
+        threads = [threading.Thread(target=adapter.send, args=(request,)) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        while adapter.get_stats()["webservice.correios.com.br"]["in_flight"] < 3:
+            pass
+        release.set()
+        for thread in threads:
+            thread.join()
+
+    stats = adapter.get_stats()["webservice.correios.com.br"]
+    assert stats == {"requests": 3, "in_flight": 0, "max_in_flight": 3, "saturated": 2, "connections": 0}
+
+
+@pytest.mark.skipif(not correios, reason="API Client support disabled")
+def test_client_retries_transient_errors():
+    client = correios.Correios(username="sigep", password="XXXXXX", retry_policy=RetryPolicy(backoff=0))
+    side_effect = [ReadTimeout(), TransportError(status_code=503), _zip_address_data("70002900")]
+
+    with mock.patch("zeep.proxy.OperationProxy.__call__", side_effect=side_effect) as mock_soap_client:
+        zip_address = client.find_zipcode("70002-900")
+
+    assert zip_address.zip_code == "70002900"
+    assert mock_soap_client.call_count == 3
+    assert client.retry_policy.retries == 2
+
+
+@pytest.mark.skipif(not correios, reason="API Client support disabled")
+def test_client_does_not_retry_sent_posting_list(posting_card, posting_list, shipping_label):
+    client = correios.Correios(username="sigep", password="XXXXXX", retry_policy=RetryPolicy(backoff=0))
+    shipping_label.posting_card = posting_card
+    posting_list.add_shipping_label(shipping_label)
+
+    with mock.patch("zeep.proxy.OperationProxy.__call__", side_effect=ReadTimeout()) as mock_soap_client:
+        with pytest.raises(ConnectTimeoutError):
+            client.close_posting_list(posting_list, posting_card)
+
+    assert mock_soap_client.call_count == 1
+
+
+@pytest.mark.skipif(not correios, reason="API Client support disabled")
+def test_client_circuit_breaker():
+    client = correios.Correios(username="sigep", password="XXXXXX", circuit_breaker_threshold=2)
+
+    with mock.patch("zeep.proxy.OperationProxy.__call__", side_effect=ConnectTimeout()) as mock_soap_client:
+        for _ in range(2):
+            with pytest.raises(ConnectTimeoutError):
+                client.find_zipcode("70002-900")
+        with pytest.raises(CircuitBreakerOpenError):
+            client.find_zipcode("70002-900")
+
+    assert mock_soap_client.call_count == 2
+    assert client.circuit_breakers["sigep"].rejected == 1
+    assert client.circuit_breakers["freight"].state == "closed"
+
+
+@pytest.mark.skipif(not correios, reason="API Client support disabled")
+def test_client_circuit_breaker_reopens_after_interrupted_trial_call():
+    client = correios.Correios(
+        username="sigep", password="XXXXXX", circuit_breaker_threshold=1, circuit_breaker_timeout=0
+    )
+
+    with mock.patch("zeep.proxy.OperationProxy.__call__", side_effect=[ConnectTimeout(), KeyboardInterrupt()]):
+        with pytest.raises(ConnectTimeoutError):
+            client.find_zipcode("70002-900")
+        with pytest.raises(KeyboardInterrupt):
+            client.find_zipcode("70002-900")
+
+    assert client.circuit_breakers["sigep"].state == "open"
+
+
+@pytest.mark.skipif(not correios, reason="API Client support disabled")
+def test_client_throttles():
+    throttle = Throttle(rate=1)
+    client = correios.Correios(username="sigep", password="XXXXXX", throttles={"sigep": throttle})
+
+    patch_soap_client = mock.patch("zeep.proxy.OperationProxy.__call__", side_effect=_zip_address_data)
+    with patch_soap_client, mock.patch("time.sleep") as mock_sleep:
+        client.find_zipcode("70002-900")
+        client.find_zipcode("70002-901")
+
+    assert mock_sleep.call_count == 1
+    assert throttle.waits == 1
+
+
+@pytest.mark.skipif(not correios, reason="API Client support disabled")
+def test_client_throttles_unknown_service():
+    with pytest.raises(ValueError):
+        correios.Correios(username="sigep", password="XXXXXX", throttles={"sro": Throttle(rate=1)})
+
+
+@pytest.mark.skipif(not correios, reason="API Client support disabled")
+def test_client_coalesces_requests():
+    client = correios.Correios(username="sigep", password="XXXXXX", coalesce_requests=True)
+    release = threading.Event()
+    zip_addresses = []
+
+    def consulta_cep(cep):
+        release.wait()
+        return _zip_address_data(cep)
+
+    with mock.patch("zeep.proxy.OperationProxy.__call__", side_effect=consulta_cep) as mock_soap_client:
+        threads = [
+            threading.Thread(target=lambda: zip_addresses.append(client.find_zipcode("70002-900"))) for _ in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        while client.single_flight.shared < 3:
+            pass
+        release.set()
+        for thread in threads:
+            thread.join()
+
+    assert mock_soap_client.call_count == 1
+    assert [zip_address.zip_code for zip_address in zip_addresses] == ["70002900"] * 4
+
+
+@pytest.mark.skipif(not correios, reason="API Client support disabled")
+@pytest.mark.parametrize("fast_tracking", (False, True))
+def test_client_coalesced_tracking_events_are_loaded_by_each_caller(fast_tracking):
+    client = correios.Correios(username="sigep", password="XXXXXX", coalesce_requests=True, fast_tracking=fast_tracking)
+    tracking_codes = [TrackingCode("BE058714266BR"), TrackingCode("BE058714266BR")]
+    release = threading.Event()
+    send = client._send
+
+    def delayed_send(*args):
+        release.wait()
+        return send(*args)
+
+    with vcr.use_cassette("test_get_tracking_code_events"), mock.patch.object(
+        client, "_send", side_effect=delayed_send
+    ) as mock_send:
+        threads = [threading.Thread(target=client.get_tracking_code_events, args=(t,)) for t in tracking_codes]
+        for thread in threads:
+            thread.start()
+        while client.single_flight.shared < 1:
+            pass
+        release.set()
+        for thread in threads:
+            thread.join()
+
+    assert mock_send.call_count == 1
+    assert all(tracking_code.events for tracking_code in tracking_codes)
+
+
+class RecordingInstrument(Instrument):
+    def __init__(self):
+        self.metrics = []
+
+    def record(self, metrics):
+        self.metrics.append(metrics)
+
+
+@pytest.mark.skipif(not correios, reason="API Client support disabled")
+@vcr.use_cassette("test_calculate_freights")
+def test_client_instrument(posting_card, package):
+    instrument = RecordingInstrument()
+    client = correios.Correios(username="sigep", password="XXXXXX", instrument=instrument)
+
+    client.calculate_freights(posting_card, [SERVICE_SEDEX, SERVICE_PAC], "07192100", "80030001", package)
+
+    (metrics,) = instrument.metrics
+    assert (metrics.service, metrics.operation) == ("freight", "CalcPrecoPrazo")
+    assert metrics.endpoint.startswith("http")
+    assert metrics.attempts == 1
+    assert metrics.request_size > 0
+    assert metrics.response_size > 0
+    assert 0 < metrics.network_time <= metrics.call_time < metrics.duration
+    assert metrics.model_time > 0
+    assert metrics.error is None
+
+
+@pytest.mark.skipif(not correios, reason="API Client support disabled")
+@vcr.use_cassette("test_get_tracking_code_events")
+def test_client_instrument_fast_tracking():
+    instrument = RecordingInstrument()
+    client = correios.Correios(username="sigep", password="XXXXXX", fast_tracking=True, instrument=instrument)
+
+    client.get_tracking_code_events(TrackingCode("BE058714266BR"))
+
+    (metrics,) = instrument.metrics
+    assert (metrics.service, metrics.operation) == ("websro", "buscaEventosLista")
+    assert metrics.response_size > 0
+    assert metrics.network_time > 0
+    assert metrics.model_time > 0
+
+
+@pytest.mark.skipif(not correios, reason="API Client support disabled")
+def test_client_instrument_records_retries_and_errors():
+    instrument = RecordingInstrument()
+    client = correios.Correios(
+        username="sigep", password="XXXXXX", retry_policy=RetryPolicy(backoff=0), instrument=instrument
+    )
+
+    side_effect = [ReadTimeout(), TransportError(status_code=503), ReadTimeout()]
+    with mock.patch("zeep.proxy.OperationProxy.__call__", side_effect=side_effect):
+        with pytest.raises(ConnectTimeoutError):
+            client.find_zipcode("70002-900")
+
+    (metrics,) = instrument.metrics
+    assert (metrics.service, metrics.operation) == ("sigep", "consultaCEP")
+    assert metrics.attempts == 3
+    assert metrics.retries == 2
+    assert metrics.error == "ConnectTimeoutError"
+
+
+@pytest.mark.skipif(not correios, reason="API Client support disabled")
+def test_client_instrument_ignores_cache_hits():
+    instrument = RecordingInstrument()
+    client = correios.Correios(username="sigep", password="XXXXXX", zip_code_cache=MemoryCache(), instrument=instrument)
+
+    with mock.patch("zeep.proxy.OperationProxy.__call__", side_effect=_zip_address_data):
+        client.find_zipcode("70002-900")
+        client.find_zipcode("70002-900")
+        client.generate_verification_digit(["DL74668653 BR"], local=True)
+
+    assert [metrics.operation for metrics in instrument.metrics] == ["consultaCEP"]
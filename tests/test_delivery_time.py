@@ -0,0 +1,104 @@
+# Copyright 2016 Osvaldo Santana Neto
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from types import SimpleNamespace
+from unittest import mock
+
+import pytest
+
+from correios.client import Correios
+from correios.delivery_time import DeliveryTimeMatrix, get_default_destinations
+from correios.exceptions import ConnectTimeoutError, InvalidZipCodeError
+from correios.models.data import SERVICE_PAC, SERVICE_SEDEX, SERVICE_SEDEX10
+from correios.models.user import Service
+
+from .vcr import vcr
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def _delivery_time(service, from_zip, to_zip):
+    if str(to_zip).startswith("013"):
+        raise ConnectTimeoutError("timeout")
+    if str(to_zip).startswith("690"):
+        return SimpleNamespace(PrazoEntrega="0", Erro="008", MsgErro="Serviço indisponível para o trecho informado.")
+    return SimpleNamespace(
+        PrazoEntrega="1" if Service.get(service).code == SERVICE_SEDEX else "6", Erro="0", MsgErro=""
+    )
+
+
+@pytest.fixture
+def matrix():
+    client = mock.Mock()
+    client.request_delivery_time.side_effect = _delivery_time
+    return DeliveryTimeMatrix.build(
+        client, [SERVICE_SEDEX, SERVICE_PAC], ["07192100"], ["80030001", "01310000", "69000000"], max_workers=2
+    )
+
+
+@pytest.mark.skipif(not numpy, reason="NumPy support disabled")
+def test_delivery_time_matrix(matrix):
+    assert matrix.get(SERVICE_SEDEX, "07192100", "80030001") == 1
+    assert matrix.get(SERVICE_PAC, "07100001", "80099999") == 6
+    assert matrix.get(SERVICE_SEDEX, "07192100", "01310000") is None  # failed call
+    assert matrix.get(SERVICE_SEDEX, "07192100", "69000000") is None  # error code
+    assert matrix.get(SERVICE_SEDEX, "07192100", "90010000") is None  # missing destination
+    assert matrix.get(SERVICE_SEDEX, "80030001", "80030001") is None  # missing origin
+    assert matrix.get(SERVICE_SEDEX10, "07192100", "80030001") is None  # missing service
+
+
+@pytest.mark.skipif(not numpy, reason="NumPy support disabled")
+def test_delivery_time_matrix_file(matrix, tmp_path):
+    path = tmp_path / "delivery-times.npy"
+    matrix.save(path)
+
+    loaded = DeliveryTimeMatrix.load(path)
+    assert isinstance(loaded.data, numpy.memmap)
+    assert loaded.origins == ["071"]
+    assert loaded.get(SERVICE_SEDEX, "07192100", "80030001") == 1
+    assert loaded.get(SERVICE_SEDEX, "07192100", "01310000") is None
+
+
+@pytest.mark.skipif(not numpy, reason="NumPy support disabled")
+def test_fail_delivery_time_matrix_build_with_origin_band():
+    client = mock.Mock()
+    with pytest.raises(InvalidZipCodeError):
+        DeliveryTimeMatrix.build(client, [SERVICE_SEDEX], ["071"], ["80030001"])
+    client.request_delivery_time.assert_not_called()
+
+
+@pytest.mark.skipif(not numpy, reason="NumPy support disabled")
+def test_delivery_time_default_destinations():
+    destinations = list(get_default_destinations(2))
+    assert len(destinations) == 99  # there is no 00xxx-xxx zip code
+    assert destinations[0] == "01000000"
+
+
+@pytest.mark.skipif(not numpy, reason="NumPy support disabled")
+def test_client_delivery_time_from_matrix(matrix):
+    client = Correios(username="sigep", password="XXXXXX", environment=Correios.TEST, delivery_time_matrix=matrix)
+    with mock.patch("zeep.proxy.OperationProxy.__call__") as mock_soap_client:
+        assert client.calculate_delivery_time(SERVICE_PAC, "07192100", "80030001") == "6"
+        mock_soap_client.assert_not_called()
+
+
+@pytest.mark.skipif(not numpy, reason="NumPy support disabled")
+@vcr.use_cassette("test_calculate_delivery_time")
+def test_client_delivery_time_matrix_fallback(matrix):
+    client = Correios(username="sigep", password="XXXXXX", environment=Correios.TEST, delivery_time_matrix=matrix)
+    assert client.calculate_delivery_time(SERVICE_SEDEX, "07192100", "01310000") == "1"
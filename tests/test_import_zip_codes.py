@@ -0,0 +1,46 @@
+# Copyright 2016 Osvaldo Santana Neto
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from unittest import mock
+
+from correios.cache import DiskCache, MemoryCache, get_zip_code_cache_key
+from correios.import_zip_codes import cli, import_zip_codes
+
+ROWS = [
+    {"cep": "70002900", "uf": "DF", "cidade": "Brasília", "bairro": "Asa Norte", "end": "SBN Quadra 1 Bloco A"},
+    {"cep": "123", "uf": "SP", "cidade": "São Paulo", "bairro": "", "end": ""},
+]
+
+
+def test_import_zip_codes():
+    cache = MemoryCache()
+    assert import_zip_codes(cache, ROWS) == 1
+
+    zip_address = cache.get(get_zip_code_cache_key("70002-900"))
+    assert zip_address.zip_code == "70002900"
+    assert zip_address.state == "DF"
+    assert zip_address.city == "Brasília"
+    assert zip_address.address == "SBN Quadra 1 Bloco A"
+
+
+def test_import_zip_codes_cli(tmp_path):
+    dump = tmp_path / "ceps.csv"
+    dump.write_text("cep;uf;cidade;bairro;end;complemento2\n70002900;DF;Brasília;Asa Norte;SBN Quadra 1;\n")
+    path = tmp_path / "zip-codes.sqlite3"
+
+    with mock.patch("sys.argv", ["import-correios-zip-codes", str(path), str(dump), "--delimiter", ";"]):
+        cli()
+
+    assert DiskCache(path).get(get_zip_code_cache_key("70002900")).district == "Asa Norte"
@@ -0,0 +1,140 @@
+# Copyright 2016 Osvaldo Santana Neto
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import threading
+from unittest import mock
+
+import pytest
+
+from correios.instrumentation import (
+    Histogram,
+    HistogramCollector,
+    Instrument,
+    OperationMetrics,
+    ThreadLocalVar,
+    current_metrics,
+    measure,
+    record_request,
+)
+
+
+def test_histogram():
+    histogram = Histogram([1, 0.5])
+    for value in (0.1, 0.5, 0.7, 3):
+        histogram.observe(value)
+
+    assert histogram.get_cumulative_counts() == [("0.5", 2), ("1", 3), ("+Inf", 4)]
+    assert histogram.sum == pytest.approx(4.3)
+    assert histogram.count == 4
+
+
+def test_operation_metrics_serialization_time():
+    metrics = OperationMetrics("sigep", "consultaCEP")
+    metrics.call_time = 0.3
+    metrics.network_time = 0.2
+    assert metrics.serialization_time == pytest.approx(0.1)
+
+    metrics.network_time = 0.4
+    assert metrics.serialization_time == 0.0
+
+
+def test_measure():
+    metrics = OperationMetrics("sigep", "consultaCEP")
+    with mock.patch("time.perf_counter", side_effect=[1.0, 1.5, 2.0, 2.25]):
+        with measure(metrics, "model_time"):
+            pass
+        with pytest.raises(ValueError):
+            with measure(metrics, "model_time"):
+                raise ValueError()
+
+    assert metrics.model_time == pytest.approx(0.75)
+
+
+def test_record_request():
+    metrics = OperationMetrics("freight", "CalcPrecoPrazo")
+    record_request("http://ws.correios.com.br/calculador", 0.0, b"request", b"response")
+    assert metrics.request_size == 0
+
+    token = current_metrics.set(metrics)
+    try:
+        with mock.patch("time.perf_counter", return_value=0.25):
+            record_request("http://ws.correios.com.br/calculador", 0.0, b"request", b"response")
+    finally:
+        current_metrics.reset(token)
+
+    assert metrics.endpoint == "http://ws.correios.com.br/calculador"
+    assert metrics.network_time == 0.25
+    assert metrics.request_size == 7
+    assert metrics.response_size == 8
+
+
+def test_thread_local_var():
+    var = ThreadLocalVar("var", default=None)
+    token = var.set("value")
+    assert var.get() == "value"
+
+    thread = threading.Thread(target=lambda: values.append(var.get()))
+    values = []
+    thread.start()
+    thread.join()
+    assert values == [None]
+
+    var.reset(token)
+    assert var.get() is None
+
+
+def test_histogram_collector():
+    collector = HistogramCollector(duration_buckets=[0.1, 1], size_buckets=[1024])
+
+    metrics = OperationMetrics("sigep", "consultaCEP")
+    metrics.duration = 0.5
+    metrics.call_time = 0.45
+    metrics.network_time = 0.4
+    metrics.model_time = 0.01
+    metrics.request_size = 300
+    metrics.response_size = 2000
+    metrics.attempts = 2
+    metrics.retries = 1
+    collector.record(metrics)
+
+    rejected = OperationMetrics("sigep", "consultaCEP")
+    rejected.duration = 0.001
+    rejected.error = "CircuitBreakerOpenError"
+    collector.record(rejected)
+
+    lines = collector.render().splitlines()
+    labels = 'service="sigep",operation="consultaCEP"'
+
+    assert lines[0] == "# TYPE correios_operation_duration_seconds histogram"
+    assert 'correios_operation_duration_seconds_bucket{{{},phase="total",le="0.1"}} 1'.format(labels) in lines
+    assert 'correios_operation_duration_seconds_bucket{{{},phase="total",le="1"}} 2'.format(labels) in lines
+    assert 'correios_operation_duration_seconds_count{{{},phase="network"}} 2'.format(labels) in lines
+    assert 'correios_request_size_bytes_bucket{{{},le="1024"}} 1'.format(labels) in lines
+    assert 'correios_response_size_bytes_bucket{{{},le="1024"}} 0'.format(labels) in lines
+    assert 'correios_response_size_bytes_bucket{{{},le="+Inf"}} 1'.format(labels) in lines
+    assert "correios_response_size_bytes_sum{{{}}} 2000.0".format(labels) in lines
+    assert "# TYPE correios_operations_total counter" in lines
+    assert "correios_operations_total{{{}}} 2".format(labels) in lines
+    assert "correios_retries_total{{{}}} 1".format(labels) in lines
+    assert 'correios_errors_total{{{},error="CircuitBreakerOpenError"}} 1'.format(labels) in lines
+    assert sum(line.startswith("# TYPE correios_operation_duration_seconds ") for line in lines) == 1
+
+
+def test_instrument_subclasses_must_implement_record():
+    class IncompleteInstrument(Instrument):
+        pass
+
+    with pytest.raises(TypeError):
+        IncompleteInstrument()
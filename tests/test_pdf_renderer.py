@@ -19,7 +19,7 @@ from unittest import mock
 import pytest
 
 from correios.models.posting import PostingList
-from correios.models.user import PostingCard
+from correios.models.user import ExtraService, PostingCard
 
 from .conftest import ShippingLabelFactory
 
@@ -80,7 +80,10 @@ def test_display_on_label_render_condition(mock_drawstring, display, count):
     shipping_labels_renderer = PostingReportPDFRenderer()
     shipping_labels = ShippingLabelFactory.build()
 
-    shipping_labels.extra_services[0].display_on_label = display
+    extra_service = shipping_labels.extra_services[0]
+    shipping_labels.extra_services[0] = ExtraService(
+        extra_service.number, extra_service.code, extra_service.name, display_on_label=display
+    )
     shipping_labels_renderer.add_shipping_label(shipping_labels)
     shipping_labels_renderer.render_labels()
 
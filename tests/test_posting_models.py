@@ -33,7 +33,7 @@ from correios.models.data import (
     TRACKING_EVENT_TYPES,
 )
 from correios.models.user import ExtraService, Service
-from correios.utils import to_decimal
+from correios.utils import get_image, to_decimal
 
 from .conftest import ShippingLabelFactory
 
@@ -76,6 +76,22 @@ def test_tracking_code_digit_calculator(tracking_code, digit):
     assert tracking.digit == digit
 
 
+@pytest.mark.parametrize("numbers", [["74668653", "02000000", "00000000"], [74668653, 2000000, 0]])
+def test_tracking_code_bulk_digit_calculator(numbers):
+    assert posting.TrackingCode.calculate_digits(numbers) == [6, 0, 5]
+
+
+def test_tracking_code_bulk_digit_calculator_without_numpy(monkeypatch):
+    monkeypatch.setattr(posting, "np", None)
+    assert posting.TrackingCode.calculate_digits(range(74668653, 74668654)) == [6]
+
+
+@pytest.mark.parametrize("numbers", [["7466865X"], [-1], [100000000]])
+def test_fail_tracking_code_bulk_digit_calculator(numbers):
+    with pytest.raises(exceptions.InvalidTrackingCodeError):
+        posting.TrackingCode.calculate_digits(numbers)
+
+
 def test_tracking_code_creator():
     tracking_code1 = posting.TrackingCode.create("DL746686536BR")
     assert tracking_code1.code == "DL746686536BR"
@@ -90,15 +106,56 @@ def test_tracking_code_range_generator():
     assert all(isinstance(tc, posting.TrackingCode) for tc in tracking_codes)
 
 
-def test_fail_tracking_code_invalid_range_generator():
+def test_tracking_code_range():
+    tracking_codes = posting.TrackingCodeRange.create("DL74668650 BR", "DL74668654 BR")
+    assert len(tracking_codes) == 5
+    assert [tc.code for tc in tracking_codes] == [
+        posting.TrackingCode("DL7466865{} BR".format(n)).code for n in range(5)
+    ]
+    assert tracking_codes[3].code == "DL746686536BR"
+    assert tracking_codes[-1].short == "DL74668654BR"
+
+
+def test_tracking_code_range_slicing():
+    tracking_codes = posting.TrackingCodeRange.create("DL74668650 BR", "DL74668659 BR")
+    sliced = tracking_codes[2:5]
+    assert isinstance(sliced, posting.TrackingCodeRange)
+    assert sliced == posting.TrackingCodeRange.create("DL74668652 BR", "DL74668654 BR")
+    assert [tc.code for tc in sliced] == [tc.code for tc in list(tracking_codes)[2:5]]
+
+
+@pytest.mark.parametrize(
+    "tracking_code,expected",
+    [
+        ("DL746686536BR", True),
+        ("DL74668653 BR", True),
+        ("DL74668655 BR", False),
+        ("SX74668653 BR", False),
+        ("DL74668653 US", False),
+        ("invalid", False),
+    ],
+)
+def test_tracking_code_range_membership(tracking_code, expected):
+    tracking_codes = posting.TrackingCodeRange.create("DL74668650 BR", "DL74668654 BR")
+    assert (tracking_code in tracking_codes) is expected
+
+
+def test_tracking_code_range_without_numpy(monkeypatch):
+    monkeypatch.setattr(posting, "np", None)
+    tracking_codes = posting.TrackingCodeRange.create("DL74668650 BR", "DL74668654 BR")
+    assert tracking_codes[3].code == "DL746686536BR"
+
+
+@pytest.mark.parametrize("create_range", [posting.TrackingCode.create_range, posting.TrackingCodeRange.create])
+def test_fail_tracking_code_invalid_range_generator(create_range):
     with pytest.raises(exceptions.InvalidTrackingCodeError):
-        posting.TrackingCode.create_range("DL74668650 BR", "SX74668654 BR")  # different prefix
+        create_range("DL74668650 BR", "SX74668654 BR")  # different prefix
 
     with pytest.raises(exceptions.InvalidTrackingCodeError):
-        posting.TrackingCode.create_range("DL74668650 BR", "DL74668654 US")  # different suffix
+        create_range("DL74668650 BR", "DL74668654 US")  # different suffix
 
     with pytest.raises(exceptions.InvalidTrackingCodeError):
-        posting.TrackingCode.create_range("DL74668654 BR", "DL74668650 BR")  # end < start
+        create_range("DL74668654 BR", "DL74668650 BR")  # end < start
 
 
 def test_receipt_basic():
@@ -226,6 +283,28 @@ def test_basic_shipping_label(posting_card, sender_address, receiver_address, tr
     assert repr(shipping_label) == "<ShippingLabel tracking='{!s}'>".format(shipping_label.tracking_code)
 
 
+def test_shipping_labels_share_logo_images(posting_card):
+    logo = os.path.join(FIXTURESDIR, "test_logo.jpg")
+    first_label = ShippingLabelFactory.build(posting_card=posting_card, logo=logo)
+    second_label = ShippingLabelFactory.build(posting_card=posting_card, logo=logo)
+    assert first_label.logo is second_label.logo
+    assert first_label.carrier_logo is second_label.carrier_logo
+    assert isinstance(first_label.carrier_logo, Image)
+
+    default_label = ShippingLabelFactory.build(posting_card=posting_card)
+    assert default_label.logo is get_image(posting.ShippingLabel.default_logo)
+
+
+def test_shipping_label_with_decoded_logo(posting_card):
+    logo = get_image(os.path.join(FIXTURESDIR, "test_logo.jpg"))
+    shipping_label = ShippingLabelFactory.build(posting_card=posting_card, logo=logo)
+    assert shipping_label.logo is logo
+
+
+def test_posting_lists_share_logo_image():
+    assert posting.PostingList(custom_id=1).logo is posting.PostingList(custom_id=2).logo
+
+
 def test_basic_default_shipping_label(posting_card, sender_address, receiver_address, package):
     shipping_label = posting.ShippingLabel(
         posting_card=posting_card,
@@ -0,0 +1,110 @@
+# Copyright 2016 Osvaldo Santana Neto
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from unittest import mock
+
+import pytest
+from requests.exceptions import ConnectTimeout, ReadTimeout
+from zeep.exceptions import Fault, TransportError
+
+from correios.exceptions import CircuitBreakerOpenError
+from correios.retry import CircuitBreaker, RetryPolicy
+
+
+@pytest.mark.parametrize(
+    "operation,exception,attempt,retry",
+    (
+        ("consultaCEP", ReadTimeout(), 1, True),
+        ("consultaCEP", ReadTimeout(), 3, False),
+        ("consultaCEP", TransportError(status_code=503), 1, True),
+        ("consultaCEP", TransportError(status_code=404), 1, False),
+        ("consultaCEP", Fault("CEP NAO ENCONTRADO"), 1, False),
+        ("fechaPlpVariosServicos", ReadTimeout(), 1, False),
+        ("fechaPlpVariosServicos", TransportError(status_code=503), 1, False),
+        ("fechaPlpVariosServicos", ConnectTimeout(), 1, True),
+    ),
+)
+def test_retry_policy_should_retry(operation, exception, attempt, retry):
+    assert RetryPolicy(max_attempts=3).should_retry(operation, exception, attempt) is retry
+
+
+def test_retry_policy_delay():
+    retry_policy = RetryPolicy(backoff=1, max_backoff=3)
+    with mock.patch("random.uniform", side_effect=lambda a, b: b):
+        assert [retry_policy.get_delay(attempt) for attempt in range(1, 5)] == [1, 2, 3, 3]
+
+
+def test_circuit_breaker():
+    circuit_breaker = CircuitBreaker("sigep", threshold=2, timeout=10)
+    with mock.patch("time.monotonic", return_value=100):
+        circuit_breaker.record(ReadTimeout())
+        circuit_breaker.before_call()
+        circuit_breaker.record(Fault("autenticacao"))  # the service answered
+        circuit_breaker.record(ReadTimeout())
+        circuit_breaker.record(ReadTimeout())
+        assert circuit_breaker.state == CircuitBreaker.OPEN
+
+        with pytest.raises(CircuitBreakerOpenError):
+            circuit_breaker.before_call()
+        assert circuit_breaker.rejected == 1
+
+    with mock.patch("time.monotonic", return_value=110):
+        circuit_breaker.before_call()
+        assert circuit_breaker.state == CircuitBreaker.HALF_OPEN
+        with pytest.raises(CircuitBreakerOpenError):
+            circuit_breaker.before_call()  # a single trial call is let through
+
+        circuit_breaker.record(ReadTimeout())
+        assert circuit_breaker.state == CircuitBreaker.OPEN
+
+    with mock.patch("time.monotonic", return_value=120):
+        circuit_breaker.before_call()
+        circuit_breaker.record(None)
+        assert circuit_breaker.state == CircuitBreaker.CLOSED
+        circuit_breaker.before_call()
+
+
+def test_circuit_breaker_interrupted_trial_call():
+    circuit_breaker = CircuitBreaker("sigep", threshold=1, timeout=10)
+    with mock.patch("time.monotonic", return_value=100):
+        circuit_breaker.record(ReadTimeout())
+
+    with mock.patch("time.monotonic", return_value=110):
+        circuit_breaker.before_call()
+        circuit_breaker.record_interrupted()
+        assert circuit_breaker.state == CircuitBreaker.OPEN
+        with pytest.raises(CircuitBreakerOpenError):
+            circuit_breaker.before_call()
+
+    with mock.patch("time.monotonic", return_value=120):
+        circuit_breaker.before_call()
+        assert circuit_breaker.state == CircuitBreaker.HALF_OPEN
+
+
+def test_circuit_breaker_replaces_unrecorded_trial_call():
+    circuit_breaker = CircuitBreaker("sigep", threshold=1, timeout=10)
+    with mock.patch("time.monotonic", return_value=100):
+        circuit_breaker.record(ReadTimeout())
+
+    with mock.patch("time.monotonic", return_value=110):
+        circuit_breaker.before_call()  # never recorded
+
+    with mock.patch("time.monotonic", return_value=115):
+        with pytest.raises(CircuitBreakerOpenError):
+            circuit_breaker.before_call()
+
+    with mock.patch("time.monotonic", return_value=120):
+        circuit_breaker.before_call()
+        assert circuit_breaker.state == CircuitBreaker.HALF_OPEN
@@ -0,0 +1,92 @@
+# Copyright 2016 Osvaldo Santana Neto
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import asyncio
+import threading
+import time
+from unittest import mock
+
+import pytest
+
+from correios.throttle import Throttle
+
+
+def test_throttle_rate():
+    with mock.patch("time.monotonic", return_value=100):
+        throttle = Throttle(rate=10, burst=2)
+        with mock.patch("time.sleep") as mock_sleep:
+            for _ in range(4):
+                with throttle:
+                    pass
+
+    assert [c.args[0] for c in mock_sleep.call_args_list] == [pytest.approx(0.1), pytest.approx(0.2)]
+    assert throttle.waits == 2
+
+
+def test_throttle_refills_tokens():
+    with mock.patch("time.monotonic", return_value=100):
+        throttle = Throttle(rate=2, burst=2)
+    with mock.patch("time.sleep") as mock_sleep:
+        for now in (100, 100, 100.5, 101, 110, 110):
+            with mock.patch("time.monotonic", return_value=now), throttle:
+                pass
+
+    mock_sleep.assert_not_called()
+    assert throttle.waits == 0
+
+
+def test_throttle_max_in_flight():
+    throttle = Throttle(max_in_flight=1)
+    entered = threading.Event()
+    release = threading.Event()
+
+    def hold():
+        with throttle:
+            entered.set()
+            release.wait()
+
+    holder = threading.Thread(target=hold)
+    holder.start()
+    entered.wait()
+
+    waiter = threading.Thread(target=hold)
+    waiter.start()
+    time.sleep(0.05)
+    release.set()
+    holder.join()
+    waiter.join()
+
+    assert throttle.waits == 1
+    assert throttle.wait_time >= 0.05
+
+
+def test_async_throttle_max_in_flight():
+    throttle = Throttle(max_in_flight=2)
+    in_flight = []
+
+    async def request():
+        async with throttle:
+            in_flight.append(1)
+            peak = len(in_flight)
+            await asyncio.sleep(0)
+            in_flight.pop()
+            return peak
+
+    async def requests():
+        return await asyncio.gather(*(request() for _ in range(5)))
+
+    for _ in range(2):  # each event loop has its own semaphore
+        assert max(asyncio.run(requests())) == 2
+    assert throttle.waits == 6
@@ -0,0 +1,108 @@
+# Copyright 2016 Osvaldo Santana Neto
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import threading
+from unittest import mock
+
+import pytest
+
+from correios.exceptions import ConnectTimeoutError, TrackingCodePoolEmptyError
+from correios.models.data import SERVICE_PAC, SERVICE_SEDEX
+from correios.models.posting import TrackingCode, TrackingCodeRange
+from correios.tracking_pool import TrackingCodePool
+
+
+def _client(*starts, size=10):
+    client = mock.Mock()
+    client.request_tracking_code_range.side_effect = [
+        TrackingCodeRange("DL", "BR", range(start, start + size)) for start in starts
+    ]
+    return client
+
+
+def test_tracking_code_pool_refills_when_empty(user):
+    client = _client(10000000, 20000000)
+    pool = TrackingCodePool(client, user, SERVICE_SEDEX, batch_size=10, background=False)
+
+    codes = [pool.get() for _ in range(11)]
+
+    assert all(isinstance(tc, TrackingCode) for tc in codes)
+    assert [tc.short for tc in codes[:2]] == ["DL10000000BR", "DL10000001BR"]
+    assert codes[-1].short == "DL20000000BR"
+    assert codes[0].code == TrackingCode("DL10000000 BR").code
+    assert pool.available == 9
+    client.request_tracking_code_range.assert_called_with(user, pool.service, quantity=10)
+
+
+def test_tracking_code_pool_refills_in_background(user):
+    client = _client(10000000, 20000000)
+    refilled = threading.Event()
+    request_tracking_code_range = client.request_tracking_code_range.side_effect
+
+    def side_effect(*args, **kwargs):
+        try:
+            return next(request_tracking_code_range)
+        finally:
+            refilled.set()
+
+    client.request_tracking_code_range.side_effect = side_effect
+    pool = TrackingCodePool(client, user, SERVICE_SEDEX, low_water_mark=5, batch_size=10)
+    pool.get(timeout=1)
+    refilled.clear()
+
+    for _ in range(5):
+        pool.get()
+    assert refilled.wait(1)
+    assert client.request_tracking_code_range.call_count == 2
+
+
+def test_tracking_code_pool_persists_ranges(user, tmp_path):
+    path = tmp_path / "pool.sqlite3"
+    pool = TrackingCodePool(_client(10000000), user, SERVICE_SEDEX, path=path, batch_size=10, background=False)
+    handed_out = [pool.get().short for _ in range(3)]
+    pool.close()
+
+    client = _client()
+    pool = TrackingCodePool(client, user, SERVICE_SEDEX, path=path, batch_size=10, background=False)
+    assert pool.available == 7
+    assert pool.get().short not in handed_out
+    client.request_tracking_code_range.assert_not_called()
+
+    other_service_pool = TrackingCodePool(_client(), user, SERVICE_PAC, path=path, background=False)
+    assert other_service_pool.available == 0
+
+
+def test_fail_tracking_code_pool_refill(user):
+    client = mock.Mock()
+    client.request_tracking_code_range.side_effect = ConnectTimeoutError("timeout")
+    pool = TrackingCodePool(client, user, SERVICE_SEDEX, background=False)
+
+    with pytest.raises(TrackingCodePoolEmptyError):
+        pool.get()
+
+
+def test_tracking_code_pools_sharing_a_database(user, tmp_path):
+    path = tmp_path / "pool.sqlite3"
+    first_client = _client(10000000, 20000000, 40000000)
+    first_pool = TrackingCodePool(first_client, user, SERVICE_SEDEX, path=path, background=False)
+    handed_out = [first_pool.get().short]
+
+    second_pool = TrackingCodePool(_client(30000000), user, SERVICE_SEDEX, path=path, background=False)
+    for _ in range(12):
+        handed_out.append(second_pool.get().short)
+        handed_out.append(first_pool.get().short)
+
+    assert len(set(handed_out)) == len(handed_out) == 25
+    assert first_pool.available == second_pool.available == 5
@@ -374,3 +374,57 @@ def test_regional_direction_getter():
     assert regional_direction.code == "AC"
     assert regional_direction.name == "AC - ADMINISTRAÇAO CENTRAL"
     assert RegionalDirection.get(regional_direction) == regional_direction
+
+
+@pytest.mark.parametrize("code", [40215, "40215", "40215   ", "4-0-2-1-5"])
+def test_service_getter_returns_shared_instance(code):
+    service = Service.get(code)
+    assert service is Service.get(40215)
+    assert hash(service) == hash(Service.get("40215"))
+    assert isinstance(service.default_extra_services, tuple)
+
+
+def test_service_hash_is_consistent_with_integer_codes():
+    assert Service.get(40215) == 40215
+    assert 40215 in {Service.get(40215)}
+    assert Service.get(40215) in {40215}
+
+
+def test_service_getter_does_not_register_raw_codes():
+    Service.get("4 0 2 1 5")
+    Service.get(" 40215")
+    assert all(isinstance(key, int) for key in Service._registry)
+
+
+@pytest.mark.parametrize(
+    "instance, attribute",
+    [
+        (Service.get(40215), "code"),
+        (Service.get(40215), "default_extra_services"),
+        (ExtraService.get(EXTRA_SERVICE_AR), "display_on_label"),
+        (RegionalDirection.get(1), "name"),
+    ],
+)
+def test_shared_instances_are_immutable(instance, attribute):
+    value = getattr(instance, attribute)
+    with pytest.raises(AttributeError):
+        setattr(instance, attribute, None)
+    with pytest.raises(AttributeError):
+        delattr(instance, attribute)
+    assert getattr(instance, attribute) == value
+
+
+def test_service_symbol_image_is_cached():
+    service = Service.get(40215)
+    assert service.symbol_image is service.symbol_image
+
+
+def test_extra_service_getter_returns_shared_instance():
+    extra_service = ExtraService.get(EXTRA_SERVICE_AR)
+    assert extra_service is ExtraService.get(EXTRA_SERVICE_AR)
+    assert hash(extra_service) == hash(EXTRA_SERVICE_AR)
+    assert extra_service in {EXTRA_SERVICE_AR}
+
+
+def test_regional_direction_getter_returns_shared_instance():
+    assert RegionalDirection.get(1) is RegionalDirection.get(1)
@@ -13,12 +13,24 @@
 # limitations under the License.
 
 
+import asyncio
+import threading
 from decimal import Decimal
 from unittest import mock
 
 import pytest
 
-from correios.utils import RangeSet, capitalize_phrase, get_resource_path, rreplace, to_decimal, to_integer
+from correios.utils import (
+    AsyncSingleFlight,
+    RangeMap,
+    RangeSet,
+    SingleFlight,
+    capitalize_phrase,
+    get_resource_path,
+    rreplace,
+    to_decimal,
+    to_integer,
+)
 
 phrase = "FOo bAr BAZ qux"
 
@@ -60,6 +72,45 @@ def test_rangeset_iter(rangeset):
     assert list(rangeset) == [1, 2, 4, 5, 7, 8]
 
 
+def test_rangeset_contain_overlapping_and_stepped_ranges():
+    rangeset = RangeSet((10, 20), (15, 30), (5, 8), range(40, 50, 3))
+    assert all(element in rangeset for element in range(10, 30))
+    assert all(element in rangeset for element in (5, 6, 7, 40, 43, 46, 49))
+    assert not any(element in rangeset for element in (4, 8, 9, 30, 41, 50))
+    assert 10.5 not in rangeset
+    assert "10" not in rangeset
+
+
+@pytest.fixture
+def rangemap():
+    return RangeMap([((1, 3), "a"), (RangeSet((4, 6), (10, 12)), "b"), (range(7, 9), "c")])
+
+
+@pytest.mark.parametrize("key, value", ((1, "a"), (2, "a"), (4, "b"), (5, "b"), (7, "c"), (8, "c"), (11, "b")))
+def test_rangemap_lookup(key, value, rangemap):
+    assert rangemap[key] == value
+    assert rangemap.get(key) == value
+    assert key in rangemap
+
+
+@pytest.mark.parametrize("key", (-1, 0, 3, 6, 9, 12, 10000))
+def test_rangemap_missing_key(key, rangemap):
+    assert key not in rangemap
+    assert rangemap.get(key) is None
+    assert rangemap.get(key, "z") == "z"
+    with pytest.raises(KeyError):
+        rangemap[key]
+
+
+def test_rangemap_len(rangemap):
+    assert len(rangemap) == 8
+
+
+def test_fail_rangemap_overlapping_ranges():
+    with pytest.raises(ValueError):
+        RangeMap([((1, 5), "a"), ((4, 8), "b")])
+
+
 @pytest.mark.parametrize("phrase", (phrase, phrase.upper(), phrase.lower()))
 def test_capitalize_phrase(phrase):
     assert capitalize_phrase(phrase) == "Foo Bar Baz Qux"
@@ -124,3 +175,69 @@ def test_should_use_pkg_resources_to_get_wsdl_files(mock_resource):
 
     mock_resource.assert_called_with("correios", "data/fake")
     assert str(path) == "/"
+
+
+def test_single_flight():
+    single_flight = SingleFlight()
+    release = threading.Event()
+    function = mock.Mock(side_effect=lambda key: release.wait() and key)
+    results = []
+
+    threads = [threading.Thread(target=lambda: results.append(single_flight.do("a", function, "a"))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    while single_flight.shared < 3:
+        pass
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert results == ["a"] * 4
+    assert function.call_count == 1
+    assert single_flight.calls == 1
+
+    assert single_flight.do("a", function, "a") == "a"  # finished calls are not reused
+    assert function.call_count == 2
+
+
+def test_single_flight_shares_exceptions():
+    single_flight = SingleFlight()
+    error = ValueError("error")
+    release = threading.Event()
+    errors = []
+
+    def fail():
+        release.wait()
+        raise error
+
+    def call():
+        try:
+            single_flight.do("a", fail)
+        except ValueError as exc:
+            errors.append(exc)
+
+    threads = [threading.Thread(target=call) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    while single_flight.shared < 1:
+        pass
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert errors == [error, error]
+
+
+def test_async_single_flight():
+    single_flight = AsyncSingleFlight()
+    function = mock.AsyncMock(side_effect=lambda key: key)
+
+    async def calls():
+        first = asyncio.ensure_future(single_flight.do("a", function, "a"))
+        await asyncio.sleep(0)
+        first.cancel()  # the shared call keeps running for the other callers
+        return await asyncio.gather(*(single_flight.do(key, function, key) for key in ("a", "a", "b")))
+
+    assert asyncio.run(calls()) == ["a", "a", "b"]
+    assert function.await_count == 2
+    assert (single_flight.calls, single_flight.shared) == (2, 2)